@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class EnvappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'backend.envapp'
+
+    def ready(self):
+        from django.conf import settings
+        from django.core.signals import request_started
+        from django.db.backends.signals import connection_created
+
+        from . import db, metrics, signals  # noqa: F401
+
+        connection_created.connect(db.apply_sqlite_pragmas, dispatch_uid="envapp.db.sqlite_pragmas")
+        request_started.connect(db.reset_read_your_writes, dispatch_uid="envapp.db.read_your_writes")
+        if settings.METRICS_ENABLED:
+            metrics.install_query_timer()
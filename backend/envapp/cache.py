@@ -0,0 +1,120 @@
+import hashlib
+import json
+import time
+
+from django.core.cache import cache, caches
+
+from .metrics import record_cache
+
+# Assembled story payloads are invalidated by the signals in signals.py; the
+# timeout only bounds staleness for other processes' local caches. Each
+# payload is stored with the ETag of the rows it was built from, and a lookup
+# with a different ETag is a miss, so a process that missed an invalidation
+# rebuilds the story rather than pair an old body with current validators.
+STORY_CACHE_TIMEOUT = 60 * 60
+
+
+STORY_LIBRARY_CACHE_KEY = "envapp:story-data:all"
+
+
+def story_cache_key(character_id):
+    return f"envapp:story-data:{character_id}"
+
+
+def _story_payload(entry, etag):
+    data = entry[1] if entry is not None and entry[0] == etag else None
+    record_cache("story", "miss" if data is None else "hit")
+    return data
+
+
+def get_story(character_id, etag):
+    return _story_payload(cache.get(story_cache_key(character_id)), etag)
+
+
+def set_story(character_id, etag, payload):
+    cache.set(story_cache_key(character_id), (etag, payload), STORY_CACHE_TIMEOUT)
+
+
+async def aget_story(character_id, etag):
+    return _story_payload(await cache.aget(story_cache_key(character_id)), etag)
+
+
+async def aset_story(character_id, etag, payload):
+    await cache.aset(story_cache_key(character_id), (etag, payload), STORY_CACHE_TIMEOUT)
+
+
+def get_story_library():
+    data = cache.get(STORY_LIBRARY_CACHE_KEY)
+    record_cache("story_library", "miss" if data is None else "hit")
+    return data
+
+
+def set_story_library(payload):
+    cache.set(STORY_LIBRARY_CACHE_KEY, payload, STORY_CACHE_TIMEOUT)
+
+
+def invalidate_story(character_id):
+    cache.delete_many([story_cache_key(character_id), STORY_LIBRARY_CACHE_KEY])
+
+
+# Personalised info-card responses live in their own cache alias (see CACHES
+# in settings) so its size, TTL and culling can be tuned separately. Keys
+# carry a generation that InfoCard writes replace, and the model version, so
+# both writes and model swaps make old entries unreachable.
+INFO_CARD_CACHE = "info_cards"
+INFO_CARD_GENERATION_KEY = "envapp:info-cards:generation"
+
+
+def _info_card_generation():
+    info_cards = caches[INFO_CARD_CACHE]
+    generation = info_cards.get(INFO_CARD_GENERATION_KEY)
+    if generation is None:
+        # Lost (culled or never set): start a fresh generation rather than reuse 0
+        info_cards.add(INFO_CARD_GENERATION_KEY, time.time_ns(), None)
+        generation = info_cards.get(INFO_CARD_GENERATION_KEY)
+    return generation
+
+
+async def _ainfo_card_generation():
+    info_cards = caches[INFO_CARD_CACHE]
+    generation = await info_cards.aget(INFO_CARD_GENERATION_KEY)
+    if generation is None:
+        await info_cards.aadd(INFO_CARD_GENERATION_KEY, time.time_ns(), None)
+        generation = await info_cards.aget(INFO_CARD_GENERATION_KEY)
+    return generation
+
+
+def _info_card_digest(params, model_version):
+    return hashlib.sha256(json.dumps([params, model_version], sort_keys=True).encode()).hexdigest()
+
+
+def info_card_cache_key(params, model_version):
+    return f"envapp:info-cards:{_info_card_generation()}:{_info_card_digest(params, model_version)}"
+
+
+async def ainfo_card_cache_key(params, model_version):
+    return f"envapp:info-cards:{await _ainfo_card_generation()}:{_info_card_digest(params, model_version)}"
+
+
+def get_info_cards(key):
+    entry = caches[INFO_CARD_CACHE].get(key)
+    record_cache(INFO_CARD_CACHE, "miss" if entry is None else "hit")
+    return entry
+
+
+async def aget_info_cards(key):
+    entry = await caches[INFO_CARD_CACHE].aget(key)
+    record_cache(INFO_CARD_CACHE, "miss" if entry is None else "hit")
+    return entry
+
+
+def set_info_cards(key, entry):
+    caches[INFO_CARD_CACHE].set(key, entry)
+
+
+async def aset_info_cards(key, entry):
+    await caches[INFO_CARD_CACHE].aset(key, entry)
+
+
+def invalidate_info_cards():
+    caches[INFO_CARD_CACHE].set(INFO_CARD_GENERATION_KEY, time.time_ns(), None)
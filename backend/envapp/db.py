@@ -0,0 +1,51 @@
+"""Database connection tuning and read/write routing; see DATABASES in settings."""
+import contextvars
+
+from django.conf import settings
+from django.db import connections
+
+# Set once a request writes, so its later reads see the write
+_wrote = contextvars.ContextVar("envapp_db_wrote", default=False)
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """connection_created receiver: apply SQLITE_PRAGMAS to each new SQLite connection."""
+    if connection.vendor != "sqlite":
+        return
+    # On the raw connection, so the pragmas are not counted as the request's queries
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f"PRAGMA {name}={value}")
+
+
+def reset_read_your_writes(**kwargs):
+    """request_started receiver: a new request starts reading from the replica again."""
+    _wrote.set(False)
+
+
+class PrimaryReplicaRouter:
+    """Reads from 'replica', writes to 'default'.
+
+    Once a request has written, the rest of its reads go to 'default' too,
+    so replication lag never hides the request's own write. Objects keep
+    reading related rows from the database they were loaded from.
+    """
+
+    replica = "replica"
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if _wrote.get() or self.replica not in connections:
+            return "default"
+        return self.replica
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # both aliases hold the same data
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
@@ -0,0 +1,203 @@
+"""In-process buffering of high-volume event rows (CardEvent) into batched inserts.
+
+Requests hand their rows to ``EventBuffer.add`` and return; a flusher
+thread writes them with ``bulk_create`` once ``batch_size`` rows are waiting
+or the oldest has waited ``flush_interval`` seconds, so a burst of events
+costs a few multi-row INSERTs instead of one statement each.
+
+Rows stay in the buffer until their batch is committed. A batch the
+database refuses outright (a value out of range, a broken constraint) is
+split in halves until the offending rows are found, and those are dropped
+so they cannot hold up the rows behind them; any other failed write is
+retried after ``flush_interval``, and while the buffer holds ``max_size``
+rows ``add`` blocks for up to ``block_timeout`` seconds and then raises
+EventBufferFull, so a slow or unavailable database pushes back on clients
+instead of growing memory without bound. ``close`` (registered with atexit
+when the flusher starts, so it runs on a graceful worker shutdown) stops the
+flusher and writes whatever is left; rows added after it are written
+directly. Buffered rows are lost only if the process is killed.
+"""
+import atexit
+import threading
+import time
+
+from django.db import DataError, IntegrityError, close_old_connections, transaction
+
+# Errors that retrying the same rows cannot fix
+REFUSED_ERRORS = (DataError, IntegrityError, OverflowError)
+
+
+class EventBufferFull(Exception):
+    pass
+
+
+class EventBuffer:
+    def __init__(self, model, max_size=20000, batch_size=1000, flush_interval=1.0, block_timeout=0.1):
+        self.model = model
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self._pending = []
+        self._oldest = None  # when the oldest pending row arrived
+        self._retry_at = 0.0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # one writer at a time, so the pending prefix is stable
+        self._worker = None
+        self._stats = {
+            "received": 0, "written": 0, "rejected": 0, "dropped": 0, "batches": 0, "failures": 0,
+            "flush_seconds": 0.0, "blocked_seconds": 0.0,
+        }
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, rows):
+        """Queue unsaved model instances for writing; raises EventBufferFull if no room frees up in time."""
+        rows = list(rows)
+        if not rows:
+            return
+        if len(rows) > self.max_size:
+            raise ValueError(f"At most {self.max_size} events at once")
+        with self._cond:
+            if self._closed:
+                closed = True
+            else:
+                closed = False
+                self._ensure_worker()
+                if len(self._pending) + len(rows) > self.max_size:
+                    self._wait_for_room(len(rows))
+                if not self._pending:
+                    self._oldest = time.monotonic()
+                self._pending.extend(rows)
+                self._stats["received"] += len(rows)
+                self._cond.notify_all()
+        if closed:
+            # Shutting down: nothing will flush these later
+            progress = {"done": 0, "dropped": 0}
+            try:
+                self._write_salvaging(rows, progress)
+            finally:
+                with self._cond:
+                    self._stats["received"] += len(rows)
+                    self._stats["written"] += progress["done"] - progress["dropped"]
+                    self._stats["dropped"] += progress["dropped"]
+
+    def _wait_for_room(self, n):
+        start = time.monotonic()
+        deadline = start + self.block_timeout
+        while len(self._pending) + n > self.max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._stats["blocked_seconds"] += time.monotonic() - start
+                self._stats["rejected"] += n
+                raise EventBufferFull(f"{len(self._pending)} events waiting to be written")
+            self._cond.wait(remaining)
+        self._stats["blocked_seconds"] += time.monotonic() - start
+
+    def flush(self):
+        """Write every pending row now, in the calling thread. Returns False if a write failed."""
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    batch = self._pending[:self.batch_size]
+                if not batch:
+                    return True
+                start = time.monotonic()
+                progress = {"done": 0, "dropped": 0}
+                try:
+                    self._write_salvaging(batch, progress)
+                    failed = None
+                except Exception as e:
+                    failed = e
+                with self._cond:
+                    # Rows written or dropped before a failure are settled either way
+                    del self._pending[:progress["done"]]
+                    self._oldest = time.monotonic() if self._pending else None
+                    self._stats["written"] += progress["done"] - progress["dropped"]
+                    self._stats["dropped"] += progress["dropped"]
+                    if failed is None:
+                        self._stats["batches"] += 1
+                        self._stats["flush_seconds"] += time.monotonic() - start
+                    else:
+                        self._stats["failures"] += 1
+                        self._retry_at = time.monotonic() + self.flush_interval
+                    self._cond.notify_all()  # room for blocked producers
+                if failed is not None:
+                    print(f"Could not write {len(batch) - progress['done']} events, keeping them for a retry: {failed}")
+                    close_old_connections()  # drop a broken connection before the retry
+                    return False
+
+    def _write_salvaging(self, rows, progress):
+        # Writes rows in order, bisecting a refused batch down to the rows at
+        # fault and dropping those. progress["done"] counts the leading rows
+        # written or dropped, so after any other error only the rest are retried.
+        try:
+            self._write(rows)
+        except REFUSED_ERRORS as e:
+            if len(rows) == 1:
+                print(f"Dropping an event the database refuses: {e}")
+                progress["done"] += 1
+                progress["dropped"] += 1
+                return
+            middle = len(rows) // 2
+            self._write_salvaging(rows[:middle], progress)
+            self._write_salvaging(rows[middle:], progress)
+            return
+        progress["done"] += len(rows)
+
+    def _write(self, rows):
+        with transaction.atomic():
+            self.model.objects.bulk_create(rows, batch_size=self.batch_size)
+
+    def close(self, timeout=10.0):
+        """Stop the flusher and write what is left. Returns False if rows could not be written."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            worker = self._worker
+        if worker is not None and worker is not threading.current_thread():
+            worker.join(timeout)
+        written = self.flush()
+        if not written:
+            print(f"{len(self._pending)} events could not be written before shutdown")
+        return written
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._pending)
+        return stats
+
+    def _ensure_worker(self):
+        # Called with self._cond held
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="event-flusher", daemon=True)
+            self._worker.start()
+            atexit.register(self.close)
+
+    def _due(self):
+        # Seconds until the pending rows should be flushed: 0 if now, None if there are none
+        if not self._pending:
+            return None
+        if len(self._pending) >= self.batch_size:
+            due = time.monotonic()
+        else:
+            due = self._oldest + self.flush_interval
+        return max(due, self._retry_at) - time.monotonic()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    wait = self._due()
+                    if wait is not None and wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
@@ -0,0 +1,211 @@
+"""Columnar store for the state-level pregnancy health indicators.
+
+Every CSV in INDICATOR_DIR is one indicator, named after its file (drop in
+``gestational_anaemia.csv`` and /api/indicators/gestational_anaemia/ exists).
+A file needs Year, State/Territory (or State) and Percent (or Value)
+columns, matched case-insensitively; other columns are ignored. When a
+year and state appear twice the first row wins, as gestational_diabetes
+lists 2022 both as a current and as a trend estimate. The "Total" rows are
+the national figure.
+
+Each indicator is held as NumPy columns (year, state code, percent) sorted
+by state and year. Trends, year-over-year deltas and national comparisons
+are computed once at load into a states x years matrix, and files are
+reloaded when they change.
+"""
+import csv
+import hashlib
+import os
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+INDICATOR_DIR = os.path.join(os.path.dirname(__file__), "data", "indicators")
+NATIONAL = "Total"
+COLUMNS = {
+    "year": "year",
+    "state/territory": "state",
+    "state": "state",
+    "percent": "percent",
+    "value": "percent",
+}
+
+
+def to_json_list(values, digits=2):
+    return [None if np.isnan(value) else round(float(value), digits) for value in values]
+
+
+class Indicator:
+    def __init__(self, name, rows, source_sha256="", modified=None):
+        """``rows`` is an iterable of (year, state, percent); see the module docstring."""
+        self.name = name
+        self.source_sha256 = source_sha256
+        self.modified = modified
+
+        seen = {}
+        for year, state, percent in rows:
+            seen.setdefault((state, int(year)), float(percent) if percent not in ("", None) else np.nan)
+        self.states = sorted({state for state, _ in seen}, key=lambda state: (state == NATIONAL, state))
+        self.years = np.array(sorted({year for _, year in seen}), dtype=np.int16)
+        code = {state: i for i, state in enumerate(self.states)}
+        keys = sorted(seen, key=lambda key: (code[key[0]], key[1]))
+
+        # The columns
+        self.state = np.array([code[state] for state, _ in keys], dtype=np.int8)
+        self.year = np.array([year for _, year in keys], dtype=np.int16)
+        self.percent = np.array([seen[key] for key in keys], dtype=np.float64)
+
+        # states x years, NaN where a state has no figure for a year
+        self.year_index = np.searchsorted(self.years, self.year)
+        self.matrix = np.full((len(self.states), len(self.years)), np.nan)
+        self.matrix[self.state, self.year_index] = self.percent
+
+        self.deltas = np.diff(self.matrix, axis=1)
+        self.national = self.matrix[code[NATIONAL]] if NATIONAL in code else None
+        self.trends = {state: self._trend(self.matrix[i]) for i, state in enumerate(self.states)}
+
+    @classmethod
+    def from_csv(cls, path):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, "rb") as f:
+            source_sha256 = hashlib.sha256(f.read()).hexdigest()
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            header = [COLUMNS.get(column.strip().lower()) for column in next(reader, [])]
+            missing = {"year", "state", "percent"} - set(header)
+            if missing:
+                raise ValueError(f"{path} has no {', '.join(sorted(missing))} column")
+            positions = [header.index(column) for column in ("year", "state", "percent")]
+            rows = [[row[i].strip() for i in positions] for row in reader if any(cell.strip() for cell in row)]
+        if not rows:
+            raise ValueError(f"{path} has no data rows")
+        modified = datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc)
+        return cls(name, rows, source_sha256, modified)
+
+    def _trend(self, values):
+        present = ~np.isnan(values)
+        years, values = self.years[present], values[present]
+        if not len(values):
+            return None
+        first, last = values[0], values[-1]
+        return {
+            "first": {"year": int(years[0]), "percent": round(float(first), 2)},
+            "last": {"year": int(years[-1]), "percent": round(float(last), 2)},
+            # Least-squares slope, in percentage points per year
+            "slope": round(float(np.polyfit(years, values, 1)[0]), 3) if len(values) > 1 else None,
+            "change_percent": round(float((last - first) / first * 100), 1) if len(values) > 1 and first else None,
+        }
+
+    def state_codes(self, names):
+        """Codes for ``names`` (case-insensitive); all states when ``names`` is empty."""
+        if not names:
+            return np.arange(len(self.states))
+        lookup = {state.lower(): i for i, state in enumerate(self.states)}
+        unknown = [name for name in names if name.lower() not in lookup]
+        if unknown:
+            raise ValueError(f"Unknown state: {', '.join(unknown)}")
+        return np.array([lookup[name.lower()] for name in names])
+
+    def series(self, states=None, year_from=None, year_to=None):
+        codes = self.state_codes(states)
+        lo = self.years[0] if year_from is None else year_from
+        hi = self.years[-1] if year_to is None else year_to
+        years = self.years[(self.years >= lo) & (self.years <= hi)]
+
+        # Filter the columns, then scatter into one row per requested state
+        selected = np.isin(self.state, codes) & (self.year >= lo) & (self.year <= hi)
+        row = np.empty(len(self.states), dtype=np.intp)
+        row[codes] = np.arange(len(codes))
+        values = np.full((len(codes), len(years)), np.nan)
+        values[row[self.state[selected]], np.searchsorted(years, self.year[selected])] = self.percent[selected]
+        return {
+            "indicator": self.name,
+            "years": years.tolist(),
+            "series": {self.states[code]: to_json_list(values[i]) for i, code in enumerate(codes)},
+        }
+
+    def year_over_year(self, states=None):
+        codes = self.state_codes(states)
+        return {
+            "indicator": self.name,
+            "years": self.years[1:].tolist(),
+            "deltas": {self.states[code]: to_json_list(self.deltas[code]) for code in codes},
+        }
+
+    def compare_national(self, year=None):
+        if self.national is None:
+            raise ValueError(f"{self.name} has no {NATIONAL} rows to compare against")
+        year = int(self.years[-1]) if year is None else year
+        columns = np.flatnonzero(self.years == year)
+        if not len(columns):
+            raise ValueError(f"No figures for {year}")
+        column = columns[0]
+        national = self.national[column]
+        states = {}
+        for code, state in enumerate(self.states):
+            value = self.matrix[code, column]
+            if state == NATIONAL or np.isnan(value):
+                continue
+            states[state] = {
+                "percent": round(float(value), 2),
+                "difference": None if np.isnan(national) else round(float(value - national), 2),
+                "ratio": None if np.isnan(national) or not national else round(float(value / national), 3),
+            }
+        return {
+            "indicator": self.name,
+            "year": int(self.years[column]),
+            "national": None if np.isnan(national) else round(float(national), 2),
+            "states": states,
+        }
+
+    def summary(self):
+        return {
+            "name": self.name,
+            "years": [int(self.years[0]), int(self.years[-1])] if len(self.years) else [],
+            "states": self.states,
+            "rows": len(self.percent),
+        }
+
+
+class IndicatorStore:
+    """Indicators loaded from ``directory``, reloaded when its CSVs change."""
+
+    def __init__(self, directory=INDICATOR_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._signature = None
+        self._indicators = {}
+
+    def _scan(self):
+        try:
+            entries = sorted(
+                (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+                for entry in os.scandir(self.directory) if entry.name.endswith(".csv")
+            )
+        except FileNotFoundError:
+            entries = []
+        return tuple(entries)
+
+    def indicators(self):
+        signature = self._scan()
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    indicators = {}
+                    for name, _, _ in signature:
+                        try:
+                            indicator = Indicator.from_csv(os.path.join(self.directory, name))
+                        except (OSError, ValueError, IndexError, csv.Error) as e:
+                            # One bad file must not take the others down; it is retried once it changes
+                            print(f"Skipping indicator file {name}: {e}")
+                            continue
+                        indicators[indicator.name] = indicator
+                    self._indicators, self._signature = indicators, signature
+        return self._indicators
+
+    def get(self, name):
+        return self.indicators().get(name)
+
+
+store = IndicatorStore()
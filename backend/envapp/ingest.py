@@ -0,0 +1,349 @@
+"""Streaming parsers and batched upserts for bulk content ingestion.
+
+Everything here works on iterators and holds at most one batch in memory,
+so input size does not affect memory use. Used by ``manage.py ingest_content``.
+"""
+import csv
+import itertools
+import json
+
+from django.db import connection, reset_queries, transaction
+from django.utils import timezone
+
+from .cache import invalidate_info_cards, invalidate_story
+from .models import Characters, InfoCard, Options, Scenes
+
+INFO_CARD_FIELDS = [
+    "title", "summary", "full_text", "source_name", "source_url",
+    "trimester", "age_group", "heat_sensitive", "pollution_sensitive",
+]
+BOOLEAN_FIELDS = {"heat_sensitive", "pollution_sensitive", "correct"}
+TRUE_STRINGS = {"1", "true", "t", "yes", "y"}
+
+
+
+# Parsing
+
+def iter_json_array(f, chunk_size=1 << 16):
+    """Yield the elements of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if not started:
+            if buffer:
+                if buffer[0] != "[":
+                    raise ValueError("Expected a JSON array")
+                buffer = buffer[1:]
+                started = True
+                continue
+        else:
+            if buffer.startswith(","):
+                buffer = buffer[1:]
+                continue
+            if buffer.startswith("]"):
+                return
+            if buffer:
+                try:
+                    item, end = decoder.raw_decode(buffer)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    # A number at the end of the buffer may still be incomplete
+                    if end < len(buffer) or eof:
+                        yield item
+                        buffer = buffer[end:]
+                        continue
+        if eof:
+            raise ValueError("Unexpected end of JSON array")
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+
+def iter_ndjson(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_csv(f):
+    yield from csv.DictReader(f)
+
+
+PARSERS = {"json": iter_json_array, "ndjson": iter_ndjson, "csv": iter_csv}
+
+
+def detect_format(path):
+    for extension, name in ((".ndjson", "ndjson"), (".jsonl", "ndjson"), (".json", "json"), (".csv", "csv")):
+        if path.lower().endswith(extension):
+            return name
+    raise ValueError(f"Cannot tell the format of {path}; pass --format")
+
+
+def iter_records(f, fmt):
+    return PARSERS[fmt](f)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def to_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_STRINGS
+
+
+def update_rows(model, objs, fields):
+    """UPDATE ``fields`` of ``objs`` with one statement run through executemany.
+
+    bulk_update compiles a CASE WHEN per row and field in Python, which for a
+    full batch costs far more than the writes themselves.
+    """
+    if not objs:
+        return
+    meta = model._meta
+    columns = [meta.get_field(name) for name in fields]
+    qn = connection.ops.quote_name
+    sql = "UPDATE %s SET %s WHERE %s = %%s" % (
+        qn(meta.db_table),
+        ", ".join(f"{qn(field.column)} = %s" for field in columns),
+        qn(meta.pk.column),
+    )
+    params = [
+        [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in columns] + [obj.pk]
+        for obj in objs
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+# Info cards
+
+def info_card_from_record(record):
+    values = {field: record.get(field, "") for field in INFO_CARD_FIELDS}
+    for field in BOOLEAN_FIELDS & set(values):
+        values[field] = to_bool(values[field])
+    values["trimester"] = str(values["trimester"])
+    if not values["source_url"]:
+        raise ValueError(f"Info card {values['title']!r} has no source_url")
+    return values
+
+
+@transaction.atomic
+def upsert_info_cards(records):
+    """Insert or update one batch of info cards, matched on ``source_url``."""
+    rows = {}
+    for record in records:
+        values = info_card_from_record(record)
+        rows[values["source_url"]] = values  # last one wins within a batch
+
+    existing = {card.source_url: card for card in InfoCard.objects.filter(source_url__in=list(rows))}
+    now = timezone.now()
+    to_create, to_update = [], []
+    for url, values in rows.items():
+        card = existing.get(url)
+        if card is None:
+            to_create.append(InfoCard(**values))
+            continue
+        if all(getattr(card, field) == value for field, value in values.items()):
+            continue  # re-ingesting unchanged content costs no writes
+        for field, value in values.items():
+            setattr(card, field, value)
+        card.updated_at = now
+        to_update.append(card)
+
+    InfoCard.objects.bulk_create(to_create)
+    update_rows(InfoCard, to_update, INFO_CARD_FIELDS + ["updated_at"])
+    return len(to_create), len(to_update)
+
+
+# Stories
+#
+# A story record follows frontend/src/data/stories.js: characterId, character,
+# trimester, location and scenes, each scene with id, text and choices that
+# carry label, consequence and babyStatus. They map to Characters (name, age
+# from trimester, location), Scenes (scene_key, question) and Options (text,
+# feedback, emotion; a "green" babyStatus is the correct choice). CSV input is
+# one row per choice with those keys as columns, scene_id/scene_text for the
+# scene.
+
+def stories_from_csv_rows(rows):
+    # Consecutive rows of the same character and scene fold into one story record
+    for (character_id, character), character_rows in itertools.groupby(
+        rows, key=lambda row: (row.get("characterId", ""), row.get("character", ""))
+    ):
+        character_rows = list(character_rows)
+        first = character_rows[0]
+        scenes = []
+        for scene_id, scene_rows in itertools.groupby(character_rows, key=lambda row: row["scene_id"]):
+            scene_rows = list(scene_rows)
+            scenes.append({
+                "id": scene_id,
+                "text": scene_rows[0]["scene_text"],
+                "choices": [
+                    {"label": row["label"], "consequence": row["consequence"], "babyStatus": row["babyStatus"]}
+                    for row in scene_rows
+                ],
+            })
+        yield {
+            "characterId": character_id or None,
+            "character": character,
+            "trimester": first.get("trimester", ""),
+            "location": first.get("location", ""),
+            "scenes": scenes,
+        }
+
+
+def option_values(choice):
+    emotion = choice.get("babyStatus", choice.get("emotion", ""))
+    correct = choice["correct"] if "correct" in choice else emotion == "green"
+    return {
+        "text": choice.get("label", choice.get("text", "")),
+        "feedback": choice.get("consequence", choice.get("feedback", "")),
+        "emotion": emotion,
+        "correct": to_bool(correct),
+    }
+
+
+@transaction.atomic
+def upsert_stories(stories):
+    """Insert or update one batch of stories. Returns the number of rows written.
+
+    Characters match on ``characterId`` (or name when there is none), scenes
+    on (character, scene_key) and options on their position within the scene,
+    so an edited choice label keeps its option id (and the pick counts and
+    saved progress that point at it). Options past the end of a scene's
+    choices are deleted. Rows are only written when their content changed,
+    so re-ingesting the same file leaves every story's ETag as it was.
+    """
+    now = timezone.now()
+    by_key = {}
+    for story in stories:
+        character = Characters(
+            name=story.get("character", ""),
+            age=story.get("trimester", story.get("age", "")),
+            location=story.get("location", ""),
+        )
+        if story.get("characterId"):
+            character.id = int(story["characterId"])
+        by_key[character.id or character.name] = (character, story.get("scenes", []))  # last one wins
+    characters = list(by_key.values())
+
+    # Characters
+    by_id = [c for c, _ in characters if c.id is not None]
+    existing = Characters.objects.in_bulk([c.id for c in by_id])
+    by_name = {c.name: c for c in Characters.objects.filter(name__in=[c.name for c, _ in characters if c.id is None])}
+    to_create, to_update = [], []
+    for character, _ in characters:
+        match = existing.get(character.id) if character.id is not None else by_name.get(character.name)
+        if match is None:
+            to_create.append(character)
+            continue
+        character.id = match.id
+        if any(getattr(character, field) != getattr(match, field) for field in ("name", "age", "location")):
+            character.updated_at = now
+            to_update.append(character)
+    Characters.objects.bulk_create(to_create)
+    if connection.features.can_return_rows_from_bulk_insert is False:
+        # Ids are needed below; look them up for backends that cannot return them
+        for character in to_create:
+            if character.id is None:
+                character.id = Characters.objects.filter(name=character.name).latest("id").id
+    update_rows(Characters, to_update, ["name", "age", "location", "updated_at"])
+
+    # Scenes, matched on (character, scene_key)
+    character_ids = [c.id for c, _ in characters]
+    questions = {
+        (character.id, scene["id"]): scene.get("text", scene.get("question", ""))
+        for character, story_scenes in characters for scene in story_scenes
+    }
+    existing_scenes = {
+        (scene.character_id, scene.scene_key): scene
+        for scene in Scenes.objects.filter(character_id__in=character_ids).only("id", "character_id", "scene_key", "question")
+    }
+    to_create, to_update = [], []
+    for (character_id, scene_key), question in questions.items():
+        scene = existing_scenes.get((character_id, scene_key))
+        if scene is None:
+            to_create.append(Scenes(character_id=character_id, scene_key=scene_key, question=question))
+        elif scene.question != question:
+            scene.question = question
+            scene.updated_at = now
+            to_update.append(scene)
+    Scenes.objects.bulk_create(to_create)
+    update_rows(Scenes, to_update, ["question", "updated_at"])
+    scene_ids = {
+        (scene.character_id, scene.scene_key): scene.id
+        for scene in Scenes.objects.filter(character_id__in=character_ids).only("id", "character_id", "scene_key")
+    }
+
+    # Options, matched on their position in the scene (options are listed in id order)
+    choices = {}
+    for character, story_scenes in characters:
+        for scene in story_scenes:
+            choices[scene_ids[(character.id, scene["id"])]] = [
+                option_values(choice) for choice in scene.get("choices", scene.get("options", []))
+            ]
+    existing_options = {}
+    for option in Options.objects.filter(scene_id__in=list(choices)).order_by("id"):
+        existing_options.setdefault(option.scene_id, []).append(option)
+    to_create, to_update, to_delete = [], [], []
+    for scene_id, scene_choices in choices.items():
+        current = existing_options.get(scene_id, [])
+        for position, values in enumerate(scene_choices):
+            if position >= len(current):
+                to_create.append(Options(scene_id=scene_id, **values))
+                continue
+            option = current[position]
+            if all(getattr(option, field) == value for field, value in values.items()):
+                continue
+            for field, value in values.items():
+                setattr(option, field, value)
+            option.updated_at = now
+            to_update.append(option)
+        to_delete.extend(option.id for option in current[len(scene_choices):])
+    Options.objects.bulk_create(to_create)
+    update_rows(Options, to_update, ["text", "feedback", "emotion", "correct", "updated_at"])
+    if to_delete:
+        Options.objects.filter(id__in=to_delete).delete()  # with the progress and pick counts that point at them
+
+    # Bulk writes send no signals, so drop the cached payloads here. This only
+    # reaches this process's caches; see the note in ingest().
+    transaction.on_commit(lambda: [invalidate_story(character.id) for character, _ in characters])
+    return len(characters) + len(questions) + sum(len(scene_choices) for scene_choices in choices.values())
+
+
+def ingest(records, kind, batch_size=1000, on_batch=None):
+    """Upsert ``records`` in batches of ``batch_size``, one transaction per batch.
+
+    ``on_batch(records_so_far)`` is called after each batch. Returns the number
+    of records read; unchanged records are read but not written.
+
+    The cache invalidation done here only reaches caches this process can
+    see. Story-data responses revalidate their cached payload against the
+    database on every request, but the story library and, unless
+    INFO_CARD_CACHE_BACKEND is a shared store such as Redis, the info-card
+    responses are cached in each server process: restart the servers after
+    an ingest, or they serve the old content until the cache timeouts pass.
+    """
+    total = 0
+    for batch in batched(records, batch_size):
+        if kind == "infocards":
+            upsert_info_cards(batch)
+        else:
+            upsert_stories(batch)
+        total += len(batch)
+        reset_queries()  # with DEBUG on, logged batch SQL would otherwise pile up
+        if on_batch is not None:
+            on_batch(total)
+    if kind == "infocards":
+        invalidate_info_cards()
+    return total
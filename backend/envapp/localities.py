@@ -0,0 +1,227 @@
+"""Prefix index over the bundled Australian locality list, for autocomplete.
+
+The index is a sorted array of normalised keys searched with bisect: each
+locality contributes its full name plus one key per later word, so "kilda"
+finds St Kilda. ``manage.py build_locality_index`` serialises it to a flat
+file that workers mmap, so start-up costs no parsing and the pages are
+shared between processes.
+
+File layout: MAGIC, a uint32 header length, a JSON header listing each
+section's offset, array typecode and count, then the sections themselves
+(8-byte aligned, native byte order, recorded in the header).
+"""
+import csv
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+from .ml_utils import file_sha256
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+LOCALITY_CSV = os.path.join(DATA_DIR, "au_localities.csv")
+LOCALITY_INDEX = os.path.join(DATA_DIR, "au_localities.idx")
+
+MAGIC = b"AULOCIX1"
+STATES = {
+    "ACT": "Australian Capital Territory",
+    "NSW": "New South Wales",
+    "NT": "Northern Territory",
+    "QLD": "Queensland",
+    "SA": "South Australia",
+    "TAS": "Tasmania",
+    "VIC": "Victoria",
+    "WA": "Western Australia",
+}
+STATE_CODES = sorted(STATES)
+# Keys sharing a prefix are adjacent, so a short prefix is ranked among its
+# first MAX_CANDIDATES keys rather than all of them
+MAX_CANDIDATES = 256
+
+
+def normalize(text):
+    # Case, accents, apostrophes and "-"/"." separators do not matter: "st. kilda" finds St Kilda
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = text.replace("'", "").replace("-", " ").replace(".", " ")
+    return " ".join(text.split())
+
+
+def read_localities(path=LOCALITY_CSV):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [
+            {"name": row["name"], "state": row["state"], "lat": float(row["lat"]), "lon": float(row["lon"])}
+            for row in csv.DictReader(f)
+        ]
+
+
+def build_index(localities, source_sha256=""):
+    """Serialise ``localities`` (dicts with name, state, lat, lon) to index bytes.
+
+    Rows earlier in the list rank first among otherwise equal matches.
+    """
+    keys = []
+    for locality_id, locality in enumerate(localities):
+        name = normalize(locality["name"])
+        keys.append((name.encode(), locality_id, 0))
+        for position, char in enumerate(name):
+            if char == " ":
+                keys.append((name[position + 1:].encode(), locality_id, 1))
+    keys.sort()
+
+    key_offsets, name_offsets = array("I", [0]), array("I", [0])
+    key_blob, name_blob = bytearray(), bytearray()
+    for key, _, _ in keys:
+        key_blob += key
+        key_offsets.append(len(key_blob))
+    for locality in localities:
+        name_blob += locality["name"].encode()
+        name_offsets.append(len(name_blob))
+
+    sections = {
+        "key_offsets": key_offsets,
+        "key_blob": array("B", key_blob),
+        "key_locality": array("I", (locality_id for _, locality_id, _ in keys)),
+        "key_word": array("B", (word for _, _, word in keys)),
+        "name_offsets": name_offsets,
+        "name_blob": array("B", name_blob),
+        "state": array("B", (STATE_CODES.index(locality["state"]) for locality in localities)),
+        "lat": array("f", (locality["lat"] for locality in localities)),
+        "lon": array("f", (locality["lon"] for locality in localities)),
+    }
+
+    body = io.BytesIO()
+    layout = {}
+    for name, values in sections.items():
+        body.write(b"\0" * (-body.tell() % 8))
+        layout[name] = [body.tell(), values.typecode, len(values)]
+        body.write(values.tobytes())
+    header = json.dumps({
+        "byteorder": sys.byteorder, "localities": len(localities), "keys": len(keys),
+        "source_sha256": source_sha256, "sections": layout,
+    }).encode()
+    header += b" " * (-(len(MAGIC) + 4 + len(header)) % 8)
+    return MAGIC + struct.pack("<I", len(header)) + header + body.getvalue()
+
+
+def write_index(source=LOCALITY_CSV, output=LOCALITY_INDEX):
+    data = build_index(read_localities(source), file_sha256(source))
+    tmp_path = f"{output}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, output)  # workers keep their mapping of the old file
+    return len(data)
+
+
+class _Keys:
+    """Sequence view over the sorted keys, for bisect."""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+
+
+class LocalityIndex:
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError("Not a locality index file")
+        (header_length,) = struct.unpack_from("<I", view, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = json.loads(bytes(view[start:start + header_length]))
+        if self.header["byteorder"] != sys.byteorder:
+            raise ValueError(f"Locality index was built on a {self.header['byteorder']}-endian machine")
+        body = start + header_length
+        for name, (offset, typecode, count) in self.header["sections"].items():
+            size = array(typecode).itemsize
+            section = view[body + offset:body + offset + count * size]
+            setattr(self, name, section.cast(typecode) if typecode != "B" else section)
+        self.keys = _Keys(self.key_offsets, self.key_blob)
+        self._buffer = buffer  # keeps the mapping alive
+
+    @classmethod
+    def load(cls, path=LOCALITY_INDEX):
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @classmethod
+    def from_csv(cls, path=LOCALITY_CSV):
+        return cls(build_index(read_localities(path), file_sha256(path)))
+
+    def __len__(self):
+        return self.header["localities"]
+
+    def locality(self, locality_id):
+        name = bytes(self.name_blob[self.name_offsets[locality_id]:self.name_offsets[locality_id + 1]]).decode()
+        state = STATE_CODES[self.state[locality_id]]
+        return {
+            "name": name,
+            "state": state,
+            "state_name": STATES[state],
+            "display": f"{name}, {state}",
+            "lat": round(self.lat[locality_id], 4),
+            "lon": round(self.lon[locality_id], 4),
+        }
+
+    def search(self, query, limit=10):
+        """Localities matching ``query`` as a prefix, best first.
+
+        A trailing ", <state>" (code or name prefix) narrows the results.
+        Exact names rank before name prefixes, which rank before matches on a
+        later word; shorter names and earlier rows break ties.
+        """
+        text, _, state = query.rpartition(",") if "," in query else (query, "", "")
+        prefix = normalize(text).encode()
+        if not prefix:
+            return []
+        states = None
+        if normalize(state):
+            states = {
+                STATE_CODES.index(code) for code, state_name in STATES.items()
+                if normalize(code) == normalize(state) or normalize(state_name).startswith(normalize(state))
+            }
+
+        ranks = {}
+        start = bisect_left(self.keys, prefix)
+        for i in range(start, min(start + MAX_CANDIDATES, len(self.keys))):
+            key = self.keys[i]
+            if not key.startswith(prefix):
+                break
+            locality_id = self.key_locality[i]
+            if states is not None and self.state[locality_id] not in states:
+                continue
+            name_length = self.name_offsets[locality_id + 1] - self.name_offsets[locality_id]
+            rank = (self.key_word[i], key != prefix, name_length, locality_id)
+            if rank < ranks.get(locality_id, (2,)):
+                ranks[locality_id] = rank
+        best = sorted(ranks, key=ranks.__getitem__)[:limit]
+        return [self.locality(locality_id) for locality_id in best]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_locality_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            if os.path.exists(LOCALITY_INDEX):
+                _index = LocalityIndex.load()
+            else:
+                print(f"{LOCALITY_INDEX} not found, building the locality index in memory. "
+                      f"Run manage.py build_locality_index to share it between workers.")
+                _index = LocalityIndex.from_csv()
+    return _index
@@ -0,0 +1,116 @@
+"""Shared helpers for the benchmark management commands."""
+import itertools
+import random
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+from backend.envapp.models import Characters, InfoCard, Options, Scenes
+
+AGE_GROUPS = ["20-25", "25–29", "26–30", "30-35"]
+TRIMESTERS = ["1", "2", "3"]
+BENCH_SOURCE = "Benchmark"
+BENCH_CHARACTER_PREFIX = "Benchmark character "
+EMOTIONS = ["calm", "worried", "relieved", "anxious", "confident"]
+LOCATIONS = ["Melbourne", "Sydney", "Brisbane", "Perth", "Adelaide", "Hobart", "Darwin", "Canberra"]
+TOPIC_WORDS = (
+    "heat pregnancy air quality smoke hydration rest trimester baby health "
+    "temperature pollution exposure symptoms doctor midwife advice safe indoors"
+).split()
+
+# Topic words plus a long tail of filler, drawn with Zipf-like frequencies so
+# that, as in real text, a few words are everywhere and most are rare
+WORDS = TOPIC_WORDS + [f"lex{i}" for i in range(20000)]
+WORD_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(WORDS))))
+
+
+@contextmanager
+def throwaway_database(test_name=None):
+    # Runs the benchmark against a fresh test database so the real one is
+    # untouched. SQLite test databases live in memory unless test_name gives
+    # a file path.
+    if test_name is not None:
+        connection.settings_dict.setdefault("TEST", {})["NAME"] = test_name
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def _text(rng, words):
+    return " ".join(rng.choices(WORDS, cum_weights=WORD_WEIGHTS, k=words))
+
+
+def seed_info_cards(count, seed=0, batch_size=5000, text_words=400):
+    rng = random.Random(seed)
+    cards = []
+    for i in range(count):
+        cards.append(InfoCard(
+            title=_text(rng, 6).capitalize(),
+            summary=_text(rng, 40),
+            full_text=_text(rng, text_words),
+            source_name=BENCH_SOURCE,
+            source_url=f"https://example.org/cards/{i}",
+            trimester=rng.choice(TRIMESTERS),
+            age_group=rng.choice(AGE_GROUPS),
+            heat_sensitive=rng.random() < 0.5,
+            pollution_sensitive=rng.random() < 0.5,
+        ))
+        if len(cards) >= batch_size:
+            InfoCard.objects.bulk_create(cards)
+            cards = []
+    if cards:
+        InfoCard.objects.bulk_create(cards)
+
+
+def seed_story_data(characters, scenes_per_character=12, options_per_scene=3, seed=0, batch_size=5000):
+    """Characters with scenes and options whose text lengths follow the shipped story content.
+
+    Questions run 15-40 words, option texts 8-20 and feedback 30-80.
+    Returns the ids of the new characters.
+    """
+    rng = random.Random(seed)
+    first = Characters.objects.count()
+    created = Characters.objects.bulk_create([
+        Characters(name=f"{BENCH_CHARACTER_PREFIX}{first + i}", age=str(rng.randint(19, 42)), location=rng.choice(LOCATIONS))
+        for i in range(characters)
+    ])
+    if not all(character.pk for character in created):  # backends without RETURNING
+        created = list(Characters.objects.order_by("-id")[:characters])[::-1]
+
+    scenes = [
+        Scenes(character=character, scene_key=f"scene_{i}", question=_text(rng, rng.randint(15, 40)).capitalize() + "?")
+        for character in created for i in range(scenes_per_character)
+    ]
+    Scenes.objects.bulk_create(scenes, batch_size=batch_size)
+    scene_ids = Scenes.objects.filter(character__in=created).values_list("id", flat=True)
+    options = []
+    for scene_id in scene_ids.iterator():
+        correct = rng.randrange(options_per_scene) if options_per_scene else None
+        for j in range(options_per_scene):
+            options.append(Options(
+                scene_id=scene_id,
+                text=_text(rng, rng.randint(8, 20)).capitalize(),
+                feedback=_text(rng, rng.randint(30, 80)).capitalize(),
+                emotion=rng.choice(EMOTIONS),
+                correct=j == correct,
+            ))
+        if len(options) >= batch_size:
+            Options.objects.bulk_create(options)
+            options = []
+    if options:
+        Options.objects.bulk_create(options)
+    return [character.pk for character in created]
+
+
+def time_call(fn, repeat):
+    # Returns the best and median wall time in milliseconds
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[0], timings[len(timings) // 2]
@@ -0,0 +1,318 @@
+import io
+import json
+import platform
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+
+from backend.envapp.models import Characters
+
+from ._bench import BENCH_CHARACTER_PREFIX, seed_info_cards, seed_story_data, throwaway_database
+
+ENDPOINTS = ["hello", "story-data", "info-cards"]
+# What PersonalizationHub sends: every trimester, age range and concern combination
+INFO_CARD_QUERIES = [
+    urlencode({"trimester": trimester, "age_range": age_range, "concern": concern})
+    for trimester in ("1", "2", "3")
+    for age_range in ("20-25", "26–30", "30-35")
+    for concern in ("heat", "air_pollution", "")
+]
+UNCACHED = {
+    "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    "info_cards": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+}
+
+
+def request_paths(endpoint, character_ids, count, seed):
+    # The same seed gives the same request sequence, so runs are comparable
+    rng = random.Random(f"{seed}:{endpoint}")
+    if endpoint == "hello":
+        return ["/api/hello/"] * count
+    if endpoint == "story-data":
+        return [f"/api/story-data/?character_id={rng.choice(character_ids)}" for _ in range(count)]
+    return [f"/api/info-cards/?{rng.choice(INFO_CARD_QUERIES)}" for _ in range(count)]
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class InProcessTarget:
+    """Calls the WSGI application directly; counts the queries each request runs."""
+
+    def __init__(self):
+        self.app = get_wsgi_application()
+        self._local = threading.local()
+        connection.execute_wrappers.append(self._count)
+        connection_created.connect(self._install, weak=False)
+
+    def _install(self, sender, connection, **kwargs):
+        connection.execute_wrappers.append(self._count)
+
+    def _count(self, execute, sql, params, many, context):
+        self._local.queries = getattr(self._local, "queries", 0) + 1
+        return execute(sql, params, many, context)
+
+    def close(self):
+        connection_created.disconnect(self._install)
+        if self._count in connection.execute_wrappers:
+            connection.execute_wrappers.remove(self._count)
+
+    def send(self, path):
+        path, _, query = path.partition("?")
+        environ = {
+            "REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": query, "SERVER_NAME": "localhost",
+            "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1", "HTTP_HOST": "localhost",
+            "wsgi.url_scheme": "http", "wsgi.input": io.BytesIO(),
+        }
+        status_line = []
+        self._local.queries = 0
+        body = self.app(environ, lambda status, headers: status_line.append(status))
+        try:
+            for _ in body:
+                pass
+        finally:
+            body.close()
+        return int(status_line[0].split()[0]), self._local.queries
+
+
+class HttpTarget:
+    """Sends requests to a running server, one pooled session per client thread."""
+
+    def __init__(self, base_url):
+        import requests
+
+        self.base_url = base_url.rstrip("/")
+        self._requests = requests
+        self._local = threading.local()
+
+    def close(self):
+        pass
+
+    def send(self, path):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        response = session.get(self.base_url + path, timeout=30)
+        return response.status_code, None
+
+
+def run_load(target, paths, concurrency):
+    """Closed loop: ``concurrency`` clients each send their next request as soon as the last returns."""
+    queue, queue_lock = iter(paths), threading.Lock()
+    latencies, queries, statuses, lock = [], [], {}, threading.Lock()
+
+    def client():
+        while True:
+            with queue_lock:
+                path = next(queue, None)
+            if path is None:
+                return
+            start = time.perf_counter()
+            try:
+                status, count = target.send(path)
+            except Exception as e:
+                status, count = type(e).__name__, None
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+                if count is not None:
+                    queries.append(count)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=client) for _ in range(concurrency)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+        "errors": sum(count for status, count in statuses.items() if status != 200),
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+        "max_queries": max(queries) if queries else None,
+    }
+
+
+def traced_peak_mb(target, paths):
+    # A separate, single-threaded pass: tracing slows every allocation down
+    tracemalloc.start()
+    try:
+        for path in paths:
+            target.send(path)
+        return round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+    finally:
+        tracemalloc.stop()
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test hello, story-data and info-cards, in-process against a freshly seeded database or over HTTP "
+        "against a running server, and report throughput, latency percentiles, query counts and peak memory as "
+        "JSON. Pass an earlier report as --baseline to compare commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=ENDPOINTS)
+        parser.add_argument("--requests", type=int, default=2000, help="Measured requests per endpoint.")
+        parser.add_argument("--warmup", type=int, default=50, help="Unmeasured requests per endpoint first.")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--base-url", help="Benchmark a running server (seed it with seed_bench_data) instead.")
+        parser.add_argument("--existing-db", action="store_true",
+                            help="In-process, use the configured database as it is instead of seeding a fresh one.")
+        parser.add_argument("--characters", type=int, default=50)
+        parser.add_argument("--scenes", type=int, default=12, help="Scenes per character.")
+        parser.add_argument("--options", type=int, default=3, help="Options per scene.")
+        parser.add_argument("--cards", type=int, default=5000)
+        parser.add_argument("--text-words", type=int, default=400)
+        parser.add_argument("--no-cache", action="store_true", help="In-process, swap the response caches for DummyCache.")
+        parser.add_argument("--memory-requests", type=int, default=20,
+                            help="In-process, requests per endpoint traced for peak Python heap use (0 to skip).")
+        parser.add_argument("--output", help="Write the JSON report here and print a summary table instead.")
+        parser.add_argument("--baseline", help="Earlier JSON report to compare against.")
+        parser.add_argument("--max-regression", type=float,
+                            help="With --baseline, fail if any endpoint's p95 grows by more than this percent.")
+
+    def handle(self, *args, **options):
+        if options["base_url"]:
+            report = self.run(options, HttpTarget(options["base_url"]), self.existing_character_ids(options["endpoints"]))
+        elif options["existing_db"]:
+            report = self.run_in_process(options, self.existing_character_ids(options["endpoints"]))
+        else:
+            with throwaway_database():
+                character_ids = seed_story_data(
+                    options["characters"], options["scenes"], options["options"], seed=options["seed"],
+                )
+                seed_info_cards(options["cards"], seed=options["seed"], text_words=options["text_words"])
+                report = self.run_in_process(options, character_ids)
+
+        text = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(text + "\n")
+            self.print_table(report)
+        else:
+            self.stdout.write(text)
+        if options["baseline"]:
+            self.compare(report, options["baseline"], options["max_regression"])
+
+    def existing_character_ids(self, endpoints):
+        character_ids = list(
+            Characters.objects.filter(name__startswith=BENCH_CHARACTER_PREFIX).values_list("id", flat=True)
+        ) or list(Characters.objects.values_list("id", flat=True))
+        if not character_ids and "story-data" in endpoints:
+            raise CommandError("No characters to request; run manage.py seed_bench_data first.")
+        return character_ids
+
+    def run_in_process(self, options, character_ids):
+        overrides = {"DEBUG": False}  # DEBUG keeps every query in memory
+        if options["no_cache"]:
+            overrides["CACHES"] = UNCACHED
+        with override_settings(**overrides):
+            return self.run(options, InProcessTarget(), character_ids)
+
+    def run(self, options, target, character_ids):
+        in_process = isinstance(target, InProcessTarget)
+        results = {}
+        try:
+            for endpoint in options["endpoints"]:
+                warmup = request_paths(endpoint, character_ids, options["warmup"], options["seed"] + 1)
+                run_load(target, warmup, options["concurrency"])
+                paths = request_paths(endpoint, character_ids, options["requests"], options["seed"])
+                result = run_load(target, paths, options["concurrency"])
+                if in_process and options["memory_requests"]:
+                    result["traced_peak_mb"] = traced_peak_mb(target, paths[:options["memory_requests"]])
+                results[endpoint] = result
+        finally:
+            target.close()
+
+        return {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "target": options["base_url"] or "in-process",
+            "database": connection.vendor if in_process else None,
+            "config": {
+                key: options[key] for key in (
+                    "requests", "warmup", "concurrency", "seed", "characters", "scenes", "options", "cards",
+                    "text_words", "no_cache", "existing_db",
+                )
+            },
+            # Process-wide high-water mark, so it covers seeding too when in-process
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+            if in_process and sys.platform != "darwin" else None,
+            "endpoints": results,
+        }
+
+    def print_table(self, report):
+        self.stdout.write(
+            f"{'endpoint':<12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'errors':>7}"
+        )
+        for endpoint, result in report["endpoints"].items():
+            queries = "-" if result["queries_per_request"] is None else f"{result['queries_per_request']:.1f}"
+            self.stdout.write(
+                f"{endpoint:<12} {result['rps']:>8.0f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+                f"{result['p99_ms']:>8.1f} {queries:>8} {result['errors']:>7}"
+            )
+
+    def compare(self, report, baseline_path, max_regression):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        self.stdout.write(f"\nAgainst {baseline_path} ({baseline.get('git', {}).get('commit')}):")
+        regressed = []
+        for endpoint, result in report["endpoints"].items():
+            before = baseline.get("endpoints", {}).get(endpoint)
+            if before is None:
+                continue
+            changes = {
+                metric: (result[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+                for metric in ("rps", "p50_ms", "p95_ms", "p99_ms")
+            }
+            self.stdout.write(f"{endpoint:<12} " + "  ".join(
+                f"{metric} {change:+.1f}%" for metric, change in changes.items()
+            ))
+            if before.get("queries_per_request") != result["queries_per_request"]:
+                self.stdout.write(
+                    f"{'':<12} queries/request {before.get('queries_per_request')} -> {result['queries_per_request']}"
+                )
+            if max_regression is not None and changes["p95_ms"] > max_regression:
+                regressed.append(endpoint)
+        if regressed:
+            raise CommandError(f"p95 regressed by more than {max_regression}% on {', '.join(regressed)}")
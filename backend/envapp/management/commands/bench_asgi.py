@@ -0,0 +1,200 @@
+import asyncio
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+
+from backend.envapp.models import Characters, Options, Scenes
+
+from ._bench import seed_info_cards, throwaway_database
+
+ENDPOINTS = {
+    "story-data": "/api{prefix}/story-data/?character_id={character_id}",
+    "info-cards": "/api{prefix}/info-cards/?trimester=2&age_range=26-30&concern=heat",
+}
+UNCACHED = {
+    "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    "info_cards": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+}
+
+
+def simulate_latency(seconds):
+    # Stands in for the network round trip to a database server, which the
+    # in-memory test database does not have
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        connection.execute_wrappers.append(wrapper)
+
+    connection.execute_wrappers.append(wrapper)
+    connection_created.connect(install, weak=False)
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(latencies, statuses, elapsed):
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "errors": sum(count for status, count in statuses.items() if status != 200),
+    }
+
+
+def run_wsgi(app, url, clients, requests_per_client, threads):
+    """Closed loop: each client thread sends its next request once the last returns.
+
+    Requests are served by a pool of ``threads``, the way a threaded WSGI
+    server would, so latency includes the wait for a free worker thread.
+    """
+    path, _, query = url.partition("?")
+    environ = {
+        "REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": query, "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1", "HTTP_HOST": "localhost", "wsgi.url_scheme": "http",
+    }
+    latencies, statuses, lock = [], {}, threading.Lock()
+
+    def serve():
+        status_line = []
+        body = app({**environ, "wsgi.input": io.BytesIO()}, lambda status, headers: status_line.append(status))
+        try:
+            for _ in body:
+                pass
+        finally:
+            body.close()
+        return int(status_line[0].split()[0])
+
+    def client(server):
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            status = server.submit(serve).result()
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    with ThreadPoolExecutor(max_workers=threads) as server:
+        start = time.perf_counter()
+        workers = [threading.Thread(target=client, args=(server,)) for _ in range(clients)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+    return summarize(latencies, statuses, elapsed)
+
+
+async def run_asgi(app, url, clients, requests_per_client):
+    """Closed loop over one event loop: ``clients`` tasks calling the ASGI app directly."""
+    parts = urlsplit(url)
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": parts.path, "raw_path": parts.path.encode(), "query_string": parts.query.encode(),
+        "root_path": "", "headers": [(b"host", b"localhost")], "client": ("127.0.0.1", 0),
+        "server": ("localhost", 80),
+    }
+    latencies, statuses = [], {}
+
+    async def serve():
+        done = asyncio.Event()
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+        status = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+            elif not message.get("more_body"):
+                done.set()
+
+        await app(dict(scope), receive, send)
+        return status[0]
+
+    async def client():
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            status = await serve()
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return summarize(latencies, statuses, time.perf_counter() - start)
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive story-data and info-cards with many concurrent clients through the WSGI handler (sync views on "
+        "a thread pool) and the ASGI handler (sync and async views), and compare throughput and tail latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=500)
+        parser.add_argument("--requests", type=int, default=4, help="Requests per client.")
+        parser.add_argument("--wsgi-threads", type=int, default=32, help="Worker threads of the simulated WSGI server.")
+        parser.add_argument("--cards", type=int, default=2000)
+        parser.add_argument("--scenes", type=int, default=20)
+        parser.add_argument("--endpoints", nargs="+", choices=sorted(ENDPOINTS), default=sorted(ENDPOINTS))
+        parser.add_argument("--cached", action="store_true", help="Keep the response caches on (default: off).")
+        parser.add_argument("--db-latency-ms", type=float, default=0, help="Added to every query, as for a remote database.")
+        parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        settings_override = override_settings() if options["cached"] else override_settings(CACHES=UNCACHED)
+        with throwaway_database(), settings_override:
+            seed_info_cards(options["cards"], text_words=200)
+            character = Characters.objects.create(name="Mia", age="28", location="Melbourne")
+            for i in range(options["scenes"]):
+                scene = Scenes.objects.create(character=character, scene_key=f"s{i}", question=f"Question {i}?")
+                Options.objects.bulk_create([
+                    Options(scene=scene, text=f"Choice {j}", feedback="Feedback " * 20, emotion="calm", correct=j == 0)
+                    for j in range(3)
+                ])
+
+            if options["db_latency_ms"]:
+                simulate_latency(options["db_latency_ms"] / 1000)
+            wsgi, asgi = get_wsgi_application(), get_asgi_application()
+            clients, per_client = options["clients"], options["requests"]
+            results = []
+            for endpoint in options["endpoints"]:
+                sync_url = ENDPOINTS[endpoint].format(prefix="", character_id=character.id)
+                async_url = ENDPOINTS[endpoint].format(prefix="/async", character_id=character.id)
+                runs = [
+                    ("wsgi, sync views", lambda: run_wsgi(wsgi, sync_url, clients, per_client, options["wsgi_threads"])),
+                    ("asgi, sync views", lambda: asyncio.run(run_asgi(asgi, sync_url, clients, per_client))),
+                    ("asgi, async views", lambda: asyncio.run(run_asgi(asgi, async_url, clients, per_client))),
+                ]
+                for server, run in runs:
+                    run_wsgi(wsgi, sync_url, 1, 3, 1)  # warm up the model and connections
+                    results.append({"endpoint": endpoint, "server": server, "clients": clients, **run()})
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'endpoint':<12} {'server':<18} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for result in results:
+            self.stdout.write(
+                f"{result['endpoint']:<12} {result['server']:<18} {result['rps']:>8.0f} {result['p50_ms']:>8.1f} "
+                f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['errors']:>7}"
+            )
@@ -0,0 +1,66 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from backend.envapp.ml_utils import ActiveModel, MicroBatcher
+from backend.envapp.views import registry
+
+
+def run(model, threads, requests_per_thread, rows):
+    user_inputs = {"age_group": "26–30", "trimester": "2", "concern": "Heatwave"}
+    articles = [SimpleNamespace(id=i, heat_sensitive=i % 2 == 0, pollution_sensitive=i % 3 == 0) for i in range(rows)]
+    latencies, lock = [], threading.Lock()
+
+    def client():
+        for _ in range(requests_per_thread):
+            start = time.perf_counter()
+            model.predict_live(user_inputs, articles)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=client) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+class Command(BaseCommand):
+    help = "Compare per-request live relevance inference with micro-batched inference under concurrent callers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=64)
+        parser.add_argument("--requests", type=int, default=200, help="Predictions per thread.")
+        parser.add_argument("--rows", type=int, default=4, help="Articles scored per prediction.")
+        parser.add_argument("--max-rows", type=int, default=256)
+        parser.add_argument("--max-wait-ms", type=float, default=2)
+
+    def handle(self, *args, **options):
+        active = registry.current()
+        args = options["threads"], options["requests"], options["rows"]
+        batcher = MicroBatcher(options["max_rows"], options["max_wait_ms"] / 1000)
+        results = {
+            "per request": run(ActiveModel(active.version, active.key, active.metadata, active.forest), *args),
+            "micro-batched": run(ActiveModel(active.version, active.key, active.metadata, active.forest, batcher), *args),
+        }
+        self.stdout.write(f"{'':<14} {'pred/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for name, result in results.items():
+            self.stdout.write(f"{name:<14} {result['rps']:>8.0f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}")
+        stats = batcher.stats()
+        self.stdout.write(
+            f"{stats['batches']} batches, mean {stats['mean_batch_requests']:.1f} requests / "
+            f"{stats['mean_batch_rows']:.1f} rows (max {stats['max_batch_rows']}), "
+            f"mean wait {stats['mean_wait_seconds'] * 1000:.2f} ms (max {stats['max_wait_seconds'] * 1000:.2f}), "
+            f"max queue depth {stats['max_queue_depth']}"
+        )
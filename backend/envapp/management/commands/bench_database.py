@@ -0,0 +1,177 @@
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection, connections, transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from backend.envapp.models import Characters, InfoCard
+from backend.envapp.serializers import StoryDataSerializer
+from backend.envapp.views import filter_info_cards
+
+from ._bench import seed_info_cards, seed_story_data, throwaway_database
+
+# What settings.py used before it was environment driven: Python's sqlite3
+# defaults and a new connection for every request
+SQLITE_DEFAULTS = {
+    "pragmas": {"journal_mode": "DELETE", "synchronous": "FULL"},
+    "options": {"timeout": 5},
+    "conn_max_age": 0,
+}
+
+
+def read(rng, character_ids):
+    # The reads behind story-data and info-cards
+    if rng.random() < 0.5:
+        queryset = filter_info_cards(
+            InfoCard.objects.all(), rng.choice(["1", "2", "3"]), rng.choice(["20-25", "26-30"]), rng.choice(["heat", ""]),
+        )
+        list(queryset.order_by("-updated_at")[:20])
+    else:
+        # Three queries: the character, then its scenes and their options prefetched
+        StoryDataSerializer.setup_eager_loading(Characters.objects.all()).get(id=rng.choice(character_ids))
+
+
+def write(rng, card_ids):
+    # Read-then-write in one transaction, as an edit through the admin or an ingest batch does
+    with transaction.atomic():
+        card_id = rng.choice(card_ids)
+        InfoCard.objects.filter(pk=card_id).values_list("summary", flat=True).first()
+        InfoCard.objects.filter(pk=card_id).update(summary=f"Edited {rng.random()}", updated_at=timezone.now())
+
+
+def run_workload(readers, writers, seconds, character_ids, card_ids, seed):
+    results = {"read": [], "write": []}
+    errors = {"read": {}, "write": {}}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(kind, worker_seed):
+        rng = random.Random(worker_seed)
+        latencies, failures = [], {}
+        try:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    if kind == "read":
+                        read(rng, character_ids)
+                    else:
+                        write(rng, card_ids)
+                    latencies.append(time.perf_counter() - start)
+                except Exception as e:
+                    message = f"{type(e).__name__}: {str(e)[:60]}"
+                    failures[message] = failures.get(message, 0) + 1
+                close_old_connections()  # the end of a request
+        finally:
+            connection.close()
+            with lock:
+                results[kind].extend(latencies)
+                for message, count in failures.items():
+                    errors[kind][message] = errors[kind].get(message, 0) + count
+
+    threads = [threading.Thread(target=worker, args=("read", seed + i)) for i in range(readers)]
+    threads += [threading.Thread(target=worker, args=("write", seed + 1000 + i)) for i in range(writers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    summary = {}
+    for kind, latencies in results.items():
+        latencies.sort()
+        summary[kind] = {
+            "ops": len(latencies),
+            "ops_per_s": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+            "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 2) if latencies else None,
+            "errors": errors[kind],
+        }
+    return summary
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent readers and writers against a throwaway copy of the configured database and compare "
+        "connection setups: for SQLite the old defaults against WAL and the tuned pragmas, for MySQL "
+        "reconnecting per request against persistent connections (with the replica router when configured)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument("--seconds", type=float, default=10)
+        parser.add_argument("--characters", type=int, default=20)
+        parser.add_argument("--cards", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+
+    def configurations(self):
+        default = connections.settings["default"]
+        if default["ENGINE"].endswith("sqlite3"):
+            return [
+                ("sqlite, old defaults", SQLITE_DEFAULTS),
+                ("sqlite, tuned", {
+                    "pragmas": settings.SQLITE_PRAGMAS,
+                    "options": default.get("OPTIONS", {}),
+                    "conn_max_age": default.get("CONN_MAX_AGE", 0),
+                }),
+            ]
+        router = "with replica router" if "replica" in connections.settings else "primary only"
+        return [
+            (f"{default['ENGINE'].rsplit('.', 1)[-1]}, reconnect per request", {"conn_max_age": 0}),
+            (f"{default['ENGINE'].rsplit('.', 1)[-1]}, persistent, {router}", {
+                "conn_max_age": default.get("CONN_MAX_AGE", 0),
+            }),
+        ]
+
+    def handle(self, *args, **options):
+        default = connections.settings["default"]
+        sqlite = default["ENGINE"].endswith("sqlite3")
+        original = {key: default.get(key) for key in ("OPTIONS", "CONN_MAX_AGE")}
+        results = []
+        with tempfile.TemporaryDirectory() as tmp:
+            for i, (name, config) in enumerate(self.configurations()):
+                default["CONN_MAX_AGE"] = config["conn_max_age"]
+                if "options" in config:
+                    default["OPTIONS"] = dict(config["options"])
+                pragmas = config.get("pragmas", settings.SQLITE_PRAGMAS)
+                # WAL is a property of the file, so every SQLite setup gets its own
+                test_name = os.path.join(tmp, f"bench{i}.sqlite3") if sqlite else None
+                try:
+                    with override_settings(SQLITE_PRAGMAS=pragmas), throwaway_database(test_name):
+                        character_ids = seed_story_data(options["characters"], seed=options["seed"])
+                        seed_info_cards(options["cards"], seed=options["seed"], text_words=100)
+                        card_ids = list(InfoCard.objects.values_list("id", flat=True))
+                        connection.close()
+                        summary = run_workload(
+                            options["readers"], options["writers"], options["seconds"], character_ids, card_ids,
+                            options["seed"],
+                        )
+                finally:
+                    default.update(original)
+                results.append({"setup": name, **summary})
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{options['readers']} readers, {options['writers']} writers, {options['seconds']:g}s each")
+        self.stdout.write(
+            f"{'setup':<40} {'reads/s':>8} {'p99 ms':>8} {'writes/s':>9} {'p99 ms':>8} {'errors':>7}"
+        )
+        for result in results:
+            read, write = result["read"], result["write"]
+            error_count = sum(read["errors"].values()) + sum(write["errors"].values())
+            self.stdout.write(
+                f"{result['setup']:<40} {read['ops_per_s']:>8.0f} {read['p99_ms'] or 0:>8.1f} "
+                f"{write['ops_per_s']:>9.0f} {write['p99_ms'] or 0:>8.1f} {error_count:>7}"
+            )
+            for message, count in {**read["errors"], **write["errors"]}.items():
+                self.stdout.write(f"{'':<4}{count} x {message}")
@@ -0,0 +1,67 @@
+import joblib
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from backend.envapp.ml_utils import build_feature_frame
+from backend.envapp.models import InfoCard
+from backend.envapp.serializers import InfoCardSerializer
+from backend.envapp.views import MODEL_PATH, InfoCardListAPIView
+
+from ._bench import seed_info_cards, throwaway_database, time_call
+
+USER_INPUT = {"age_group": "", "trimester": "", "concern": ""}
+
+
+def score_per_article(model, articles):
+    # The pre-batching request path: one serializer and one sklearn model.predict per article
+    results = []
+    for article in articles:
+        serialized = InfoCardSerializer(article).data
+        try:
+            score = float(model.predict(build_feature_frame(USER_INPUT, [article]))[0])
+        except Exception:
+            score = 0
+        serialized["relevance_score"] = round(score, 2)
+        results.append(serialized)
+    return sorted(results, key=lambda x: x["relevance_score"], reverse=True)
+
+
+class Command(BaseCommand):
+    help = "Benchmark /api/info-cards/ latency with per-article versus batched relevance scoring."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 50000])
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument(
+            "--legacy-sample", type=int, default=1000,
+            help="Time the per-article path on at most this many cards and extrapolate linearly.",
+        )
+
+    def handle(self, *args, **options):
+        model = joblib.load(MODEL_PATH)
+        view = InfoCardListAPIView.as_view()
+        factory = RequestFactory()
+
+        with throwaway_database():
+            seeded = 0
+            self.stdout.write(f"{'cards':>8} {'per-article ms':>16} {'batched ms':>12} {'speedup':>8}")
+            for size in sorted(options["sizes"]):
+                seed_info_cards(size - seeded, seed=seeded)
+                seeded = size
+
+                sample = min(size, options["legacy_sample"])
+                articles = list(InfoCard.objects.all()[:sample])
+                _, legacy_ms = time_call(lambda: score_per_article(model, articles), options["repeat"])
+                legacy_ms *= size / sample
+
+                def request_uncached():
+                    caches["info_cards"].clear()
+                    return view(factory.get("/api/info-cards/"))
+
+                _, batched_ms = time_call(request_uncached, options["repeat"])
+
+                note = " (extrapolated)" if sample < size else ""
+                self.stdout.write(
+                    f"{size:>8} {legacy_ms:>16.1f} {batched_ms:>12.1f} {legacy_ms / batched_ms:>7.1f}x{note}"
+                )
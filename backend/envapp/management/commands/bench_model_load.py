@@ -0,0 +1,65 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand
+
+from backend.envapp.views import MODEL_PATH, registry
+
+# Each snippet runs in a fresh interpreter, the way a new worker would
+SKLEARN_WORKER = """
+import joblib, pandas as pd
+model = joblib.load({path!r})
+model.predict(pd.DataFrame([{{"age_group": "20-25", "trimester": "1", "heat_sensitive": True,
+                              "pollution_sensitive": False, "concern": "Heatwave"}}]))
+"""
+
+COMPILED_WORKER = """
+from types import SimpleNamespace
+from backend.envapp.ml_utils import CompiledForest
+forest = CompiledForest.load({path!r})
+forest.predict({{"age_group": "20-25", "trimester": "1", "concern": "Heatwave"}},
+               [SimpleNamespace(heat_sensitive=True, pollution_sensitive=False)])
+"""
+
+MEASURE = """
+import json, resource, sys, time
+start = time.perf_counter()
+exec(compile({code!r}, "<worker>", "exec"))
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "load_ms": elapsed * 1000,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "sklearn_imported": "sklearn" in sys.modules,
+}}))
+"""
+
+
+class Command(BaseCommand):
+    help = "Measure model import time and peak memory of a fresh worker, pickled Pipeline versus compiled arrays."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def measure(self, code, repeat):
+        runs = []
+        for _ in range(repeat):
+            out = subprocess.run(
+                [sys.executable, "-c", MEASURE.format(code=code)],
+                check=True, capture_output=True, text=True,
+            )
+            runs.append(json.loads(out.stdout))
+        return min(runs, key=lambda run: run["load_ms"])
+
+    def handle(self, *args, **options):
+        compiled_path = os.path.join(registry.root, registry.active_version(), registry.ARTIFACT)
+        results = {
+            "sklearn pipeline": self.measure(SKLEARN_WORKER.format(path=MODEL_PATH), options["repeat"]),
+            "compiled arrays": self.measure(COMPILED_WORKER.format(path=compiled_path), options["repeat"]),
+        }
+        self.stdout.write(f"{'':<18} {'load + first predict ms':>24} {'peak RSS MB':>12} {'sklearn':>8}")
+        for name, run in results.items():
+            self.stdout.write(
+                f"{name:<18} {run['load_ms']:>24.1f} {run['max_rss_mb']:>12.1f} {str(run['sklearn_imported']):>8}"
+            )
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from backend.envapp.models import InfoCard
+from backend.envapp.search import naive_search_info_cards, search_info_cards
+from backend.envapp.views import annotate_relevance, registry
+
+from ._bench import seed_info_cards, throwaway_database, time_call
+
+# From words in most cards to words in a handful (seeded filler words are lexN,
+# rarer as N grows)
+QUERIES = ["heat", "smoke exposure", "midwife advice", "hydr", "lex300", "lex2000 heat", "lex9000"]
+USER_INPUT = {"age_group": "26–30", "trimester": "2", "concern": "heat"}
+
+
+class Command(BaseCommand):
+    help = "Compare the FTS5 info-card search with a naive icontains search on a seeded table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cards", type=int, default=100000)
+        parser.add_argument("--text-words", type=int, default=100)
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            self.stderr.write("FTS5 search is only available on SQLite.")
+            return
+
+        with throwaway_database():
+            seed_info_cards(options["cards"], text_words=options["text_words"])
+            queryset = annotate_relevance(InfoCard.objects.all(), USER_INPUT, registry.current())
+            limit, repeat = options["limit"], options["repeat"]
+
+            self.stdout.write(f"{'query':<28} {'fts5 ms':>10} {'icontains ms':>14} {'speedup':>8}")
+            for query in QUERIES:
+                _, fts_ms = time_call(lambda: search_info_cards(queryset, query, limit, 0), repeat)
+                _, naive_ms = time_call(lambda: naive_search_info_cards(queryset, query, limit, 0), repeat)
+                self.stdout.write(f"{query:<28} {fts_ms:>10.1f} {naive_ms:>14.1f} {naive_ms / fts_ms:>7.1f}x")
@@ -0,0 +1,139 @@
+import json
+import time
+from collections import defaultdict
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from backend.envapp import symptoms
+from backend.envapp.management.commands._bench import time_call
+
+
+def synthetic_logs(rows, sessions, days, seed=0):
+    # Mostly mild ratings with the odd bad day, as in real tracker use
+    rng = np.random.default_rng(seed)
+    ratings = np.minimum(rng.geometric(0.55, (rows, len(symptoms.SYMPTOMS))) - 1, symptoms.SEVERE)
+    return symptoms.SymptomBatch(
+        np.char.add("session-", rng.integers(0, sessions, rows).astype(str)),
+        np.datetime64("2026-01-01") + rng.integers(0, days, rows),
+        ratings,
+        np.round(rng.gamma(2.0, 4.0, rows), 1),
+        np.round(rng.normal(24, 6, rows), 1),
+    )
+
+
+def score_per_log(batch, window):
+    # The same rules one log at a time in plain Python, as a reference for speed and results
+    ratings = batch.ratings.tolist()
+    days = batch.dates.astype(np.int64).tolist()
+    by_session = defaultdict(list)
+    for i, session in enumerate(batch.sessions.tolist()):
+        by_session[session].append(i)
+    risk, worsening, streak = [0] * len(ratings), [False] * len(ratings), [0] * len(ratings)
+    for i, row in enumerate(ratings):
+        high = max(row) >= symptoms.HIGH
+        active = sum(rating >= symptoms.ACTIVE for rating in row)
+        headache, _, swelling, breathing, _, dizziness = row
+        warning = headache >= symptoms.ACTIVE and (swelling >= symptoms.ACTIVE or dizziness >= symptoms.ACTIVE)
+        if max(row) >= symptoms.SEVERE or warning or breathing >= symptoms.HIGH:
+            risk[i] = 2
+        elif high or active >= 2:
+            risk[i] = 1
+    for logs in by_session.values():
+        logs.sort(key=lambda i: days[i])
+        for position, i in enumerate(logs):
+            recent, previous = [], []
+            for j in logs:
+                age = days[i] - days[j]
+                if 0 <= age < window:
+                    recent.append(sum(ratings[j]) / len(symptoms.SYMPTOMS))
+                elif window <= age < 2 * window:
+                    previous.append(sum(ratings[j]) / len(symptoms.SYMPTOMS))
+            if previous:
+                worsening[i] = sum(recent) / len(recent) - sum(previous) / len(previous) >= symptoms.WORSENING - 1e-9
+            if max(ratings[i]) >= symptoms.HIGH:
+                before = logs[position - 1] if position else None
+                gap = days[i] - days[before] if before is not None and streak[before] else None
+                streak[i] = streak[before] + gap if gap in (0, 1) else 1
+    return risk, worsening, streak
+
+
+def request_body(batch, rows, columnar):
+    head = slice(0, rows)
+    columns = {
+        "session": batch.sessions[head].tolist(),
+        "date": batch.dates[head].astype(str).tolist(),
+        **{name: batch.ratings[head, j].tolist() for j, name in enumerate(symptoms.SYMPTOMS)},
+        "pm25": batch.pm25[head].tolist(),
+        "temperature": batch.temperature[head].tolist(),
+    }
+    if columnar:
+        return json.dumps({"columns": columns})
+    names = list(columns)
+    return json.dumps({"entries": [dict(zip(names, values)) for values in zip(*columns.values())]})
+
+
+class Command(BaseCommand):
+    help = (
+        "Time vectorised symptom risk scoring over a large synthetic batch, against the same rules applied "
+        "one log at a time, and time POST /api/symptoms/score/ with row and column bodies."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--sessions", type=int, default=20_000)
+        parser.add_argument("--days", type=int, default=270, help="Span of log dates.")
+        parser.add_argument("--window", type=int, default=7)
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--loop-rows", type=int, default=50_000, help="Logs scored by the per-log reference.")
+        parser.add_argument("--request-rows", type=int, default=50_000, help="Logs per timed API request.")
+
+    def handle(self, *args, **options):
+        rows, window = options["rows"], options["window"]
+        if rows < max(options["loop_rows"], options["request_rows"]):
+            raise CommandError("--rows must cover --loop-rows and --request-rows")
+        start = time.perf_counter()
+        batch = synthetic_logs(rows, options["sessions"], options["days"])
+        self.stdout.write(f"Generated {rows} logs for {options['sessions']} sessions in {time.perf_counter() - start:.1f}s")
+
+        def score_all(batch=batch):
+            batch._session_codes = None  # count the session encoding every time
+            symptoms.summarize(batch, symptoms.score(batch, window))
+
+        best, median = time_call(score_all, options["repeat"])
+        self.stdout.write(f"Vectorised: {rows} logs best {best:.0f} ms, median {median:.0f} ms "
+                          f"({rows / best * 1000:,.0f} logs/s)")
+
+        # As many logs per session as the full batch, so the trend windows are as full
+        sample_sessions = max(1, options["sessions"] * options["loop_rows"] // rows)
+        sample = synthetic_logs(options["loop_rows"], sample_sessions, options["days"], seed=1)
+        start = time.perf_counter()
+        risk, worsening, streak = score_per_log(sample, window)
+        loop_ms = (time.perf_counter() - start) * 1000
+        scores = symptoms.score(sample, window)
+        agree = (
+            scores["risk"].tolist() == risk and scores["worsening"].tolist() == worsening
+            and scores["high_streak"].tolist() == streak
+        )
+        if not agree:
+            raise CommandError("Vectorised scores differ from the per-log reference")
+        rate = len(sample) / loop_ms * 1000
+        self.stdout.write(f"Per log: {len(sample)} logs {loop_ms:.0f} ms ({rate:,.0f} logs/s, "
+                          f"~{rows / rate:.0f}s for {rows}); results match")
+
+        client = Client(HTTP_HOST="localhost")
+        for columnar in (False, True):
+            body = request_body(batch, options["request_rows"], columnar)
+
+            def post(body=body):
+                response = client.post("/api/symptoms/score/", body, content_type="application/json")
+                if response.status_code != 200:
+                    raise CommandError(f"Scoring request failed: {response.status_code} {response.content[:200]}")
+
+            best, median = time_call(post, options["repeat"])
+            shape = "columns" if columnar else "entries"
+            self.stdout.write(self.style.SUCCESS(
+                f"POST {shape}: {options['request_rows']} logs ({len(body) / 2 ** 20:.1f} MiB) best {best:.0f} ms, "
+                f"median {median:.0f} ms ({options['request_rows'] / best * 1000:,.0f} logs/s)"
+            ))
@@ -0,0 +1,39 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend.envapp.localities import LOCALITY_CSV, LOCALITY_INDEX, LocalityIndex, read_localities, write_index
+
+
+class Command(BaseCommand):
+    help = "Build the mmap-able locality autocomplete index from the bundled CSV and time lookups against it."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", default=LOCALITY_CSV)
+        parser.add_argument("--output", default=LOCALITY_INDEX)
+        parser.add_argument("--queries", type=int, default=2000, help="Prefix lookups to time afterwards.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        size = write_index(options["source"], options["output"])
+        self.stdout.write(f"Wrote {options['output']} ({size / 1024:.1f} KB) in {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        index = LocalityIndex.load(options["output"])
+        load_ms = (time.perf_counter() - start) * 1000
+
+        # Prefixes of real names, one to six characters long, as typed
+        rng = random.Random(0)
+        names = [locality["name"] for locality in read_localities(options["source"])]
+        queries = [name[:rng.randint(1, 6)] for name in rng.choices(names, k=options["queries"])]
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query)
+            timings.append((time.perf_counter() - start) * 1e6)
+        timings.sort()
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(index)} localities, {index.header['keys']} keys, load {load_ms:.2f} ms; "
+            f"lookup median {timings[len(timings) // 2]:.0f} us, p99 {timings[int(len(timings) * 0.99)]:.0f} us"
+        ))
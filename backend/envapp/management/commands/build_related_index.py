@@ -0,0 +1,58 @@
+import os
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.envapp.models import InfoCard
+from backend.envapp.related import RELATED_INDEX_DIR, RelatedIndex, build, current_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the TF-IDF related-cards index from every InfoCard and make it current, or with --update fold "
+        "the cards saved or deleted since the current snapshot into a new one. Then time lookups against it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=RELATED_INDEX_DIR)
+        parser.add_argument("--update", action="store_true", help="Re-vectorise changed cards only.")
+        parser.add_argument("--queries", type=int, default=500, help="Related-card lookups to time afterwards.")
+        parser.add_argument("--limit", type=int, default=5)
+
+    def handle(self, *args, **options):
+        root = options["output"]
+        start = time.perf_counter()
+        if options["update"]:
+            snapshot = current_snapshot(root)
+            if snapshot is None:
+                raise CommandError(f"No current snapshot in {root}; build one without --update first")
+            previous = RelatedIndex.load(os.path.join(root, snapshot))
+            changed = previous.refresh(InfoCard.objects.all())
+            index = previous.compacted(InfoCard.objects.values_list("id", flat=True))
+            summary = f"{changed} changed cards re-vectorised, {len(index) - len(previous):+d} cards"
+        else:
+            index = build(InfoCard.objects.all())
+            summary = f"{len(index)} cards vectorised"
+        name = index.save(root)
+        self.stdout.write(
+            f"{summary}; wrote {name} ({len(index)} cards, {len(index.terms)} terms, {index.rows.nnz} entries) "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+
+        start = time.perf_counter()
+        index = RelatedIndex.load(os.path.join(root, name))
+        load_ms = (time.perf_counter() - start) * 1000
+        if not len(index):
+            return
+        rng = random.Random(0)
+        timings = []
+        for card_id in rng.choices(index.ids.tolist(), k=options["queries"]):
+            start = time.perf_counter()
+            index.related(card_id, options["limit"])
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        self.stdout.write(self.style.SUCCESS(
+            f"Load {load_ms:.1f} ms; top-{options['limit']} lookup median {timings[len(timings) // 2]:.2f} ms, "
+            f"p99 {timings[int(len(timings) * 0.99)]:.2f} ms"
+        ))
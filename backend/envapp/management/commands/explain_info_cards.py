@@ -0,0 +1,55 @@
+import itertools
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from backend.envapp.models import InfoCard
+from backend.envapp.views import filter_info_cards
+
+from ._bench import seed_info_cards, throwaway_database, time_call
+
+TRIMESTERS = ["", "2"]
+AGE_RANGES = ["", "26–30"]
+CONCERNS = ["", "heat", "pollution"]
+
+
+class Command(BaseCommand):
+    help = "Print the query plan and timing of every /api/info-cards/ filter combination, with and without the InfoCard indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cards", type=int, default=100000)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def run_combinations(self, label, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        for trimester, age_range, concern in itertools.product(TRIMESTERS, AGE_RANGES, CONCERNS):
+            queryset = filter_info_cards(InfoCard.objects.all(), trimester, age_range, concern)
+            sql, params = queryset.query.sql_with_params()
+
+            def fetch():
+                # Raw rows only, so the timing is the database's and not the ORM's
+                with connection.cursor() as cursor:
+                    cursor.execute(sql, params)
+                    return cursor.fetchall()
+
+            best_ms, median_ms = time_call(fetch, repeat)
+            rows = len(fetch())
+            self.stdout.write(
+                f"trimester={trimester or '-':<2} age_range={age_range or '-':<6} concern={concern or '-':<10}"
+                f" rows={rows:<7} best={best_ms:.1f}ms median={median_ms:.1f}ms"
+            )
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f"    {line}")
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            seed_info_cards(options["cards"], text_words=50)
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(InfoCard._meta.db_table)}")
+
+            self.run_combinations("With indexes", options["repeat"])
+
+            with connection.schema_editor() as editor:
+                for index in InfoCard._meta.indexes:
+                    editor.remove_index(InfoCard, index)
+            self.run_combinations("Without indexes", options["repeat"])
@@ -0,0 +1,63 @@
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.envapp.cache import INFO_CARD_CACHE
+from backend.envapp.ingest import detect_format, ingest, iter_records, stories_from_csv_rows
+
+# Cache aliases whose entries live in each server process, out of this command's reach
+PROCESS_LOCAL_BACKENDS = ("LocMemCache",)
+
+
+class Command(BaseCommand):
+    help = "Stream InfoCards or stories from a JSON, NDJSON or CSV file into the database in batched upserts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--kind", choices=["infocards", "stories"], required=True)
+        parser.add_argument("--format", choices=["json", "ndjson", "csv"], help="Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--trace-memory", action="store_true", help="Report peak Python heap use (slower).")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        try:
+            fmt = options["format"] or detect_format(path)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options["trace_memory"]:
+            tracemalloc.start()
+        start = time.perf_counter()
+
+        def progress(count):
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"\r{count} records, {count / elapsed:,.0f} records/s", ending="")
+            self.stdout.flush()
+
+        with open(path, newline="", encoding="utf-8") as f:
+            records = iter_records(f, fmt)
+            if options["kind"] == "stories" and fmt == "csv":
+                records = stories_from_csv_rows(records)
+            try:
+                total = ingest(records, options["kind"], options["batch_size"], on_batch=progress)
+            except (ValueError, KeyError) as e:
+                raise CommandError(f"Invalid record: {e}")
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write("")
+        summary = f"Ingested {total} records in {elapsed:.2f}s ({total / max(elapsed, 1e-9):,.0f} records/s)"
+        if options["trace_memory"]:
+            _, peak = tracemalloc.get_traced_memory()
+            summary += f", peak Python heap {peak / 2**20:.1f} MB"
+        self.stdout.write(self.style.SUCCESS(summary))
+
+        alias = INFO_CARD_CACHE if options["kind"] == "infocards" else "default"
+        if settings.CACHES[alias]["BACKEND"].endswith(PROCESS_LOCAL_BACKENDS):
+            cached = "info-card responses" if options["kind"] == "infocards" else "the story library"
+            self.stdout.write(self.style.WARNING(
+                f"Running servers cache {cached} in process memory, which this command cannot clear: "
+                f"restart them to serve the new content before the cache timeout."
+            ))
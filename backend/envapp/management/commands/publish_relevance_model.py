@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.envapp.training import latency_violations
+from backend.envapp.views import MODEL_PATH, registry
+
+
+class Command(BaseCommand):
+    help = "Compile a pickled relevance Pipeline into a new registry version and (by default) activate it."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", default=MODEL_PATH)
+        parser.add_argument("--model-version", help="Defaults to a UTC timestamp plus the source hash.")
+        parser.add_argument("--no-activate", action="store_true")
+        parser.add_argument("--activate-only", metavar="VERSION", help="Switch to an existing version (rollback).")
+        parser.add_argument("--list", action="store_true", help="List versions and exit.")
+        parser.add_argument(
+            "--max-latency-ms", type=float,
+            help="With --activate-only, refuse a version whose recorded single-row p99 is above this.",
+        )
+        parser.add_argument(
+            "--max-batch-latency-ms", type=float,
+            help="With --activate-only, refuse a version whose recorded 1000-row batch p50 is above this.",
+        )
+
+    def handle(self, *args, **options):
+        if options["list"]:
+            active = registry.active_version()
+            for version in registry.versions():
+                marker = "*" if version == active else " "
+                self.stdout.write(f"{marker} {version}")
+            return
+
+        try:
+            if options["activate_only"]:
+                self.check_latency(options["activate_only"], options)
+                registry.activate(options["activate_only"])
+                self.stdout.write(self.style.SUCCESS(f"Activated {options['activate_only']}"))
+                return
+            version = registry.publish(
+                options["source"], version=options["model_version"], activate=not options["no_activate"],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        state = "published" if options["no_activate"] else "published and activated"
+        self.stdout.write(self.style.SUCCESS(f"{version} {state}"))
+
+    def check_latency(self, version, options):
+        if options["max_latency_ms"] is None and options["max_batch_latency_ms"] is None:
+            return
+        if version not in registry.versions():
+            return  # activate reports it
+        latency = registry.metadata(version).get("latency")
+        if latency is None:
+            raise CommandError(f"{version} has no recorded latency; train it with train_relevance_model")
+        violations = latency_violations(latency, options["max_latency_ms"], options["max_batch_latency_ms"])
+        if violations:
+            raise CommandError(f"{version} is too slow to serve: " + "; ".join(violations))
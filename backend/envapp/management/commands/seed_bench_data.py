@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from backend.envapp.cache import invalidate_info_cards, invalidate_story
+from backend.envapp.models import Characters, InfoCard
+
+from ._bench import BENCH_CHARACTER_PREFIX, BENCH_SOURCE, seed_info_cards, seed_story_data
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the configured database with synthetic characters, scenes, options and info cards for "
+        "benchmarking a running server (see bench_api --base-url). Rows are tagged so --clear removes only them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--characters", type=int, default=50)
+        parser.add_argument("--scenes", type=int, default=12, help="Scenes per character.")
+        parser.add_argument("--options", type=int, default=3, help="Options per scene.")
+        parser.add_argument("--cards", type=int, default=5000)
+        parser.add_argument("--text-words", type=int, default=400, help="Words of full_text per info card.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--clear", action="store_true", help="Delete earlier benchmark rows first.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        with transaction.atomic():
+            if options["clear"]:
+                Characters.objects.filter(name__startswith=BENCH_CHARACTER_PREFIX).delete()
+                InfoCard.objects.filter(source_name=BENCH_SOURCE).delete()
+            character_ids = seed_story_data(
+                options["characters"], options["scenes"], options["options"], seed=options["seed"],
+            )
+            seed_info_cards(options["cards"], seed=options["seed"], text_words=options["text_words"])
+
+        # bulk_create sends no signals
+        for character_id in character_ids:
+            invalidate_story(character_id)
+        invalidate_info_cards()
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(character_ids)} characters, {len(character_ids) * options['scenes']} scenes, "
+            f"{len(character_ids) * options['scenes'] * options['options']} options and {options['cards']} info cards "
+            f"in {time.perf_counter() - start:.1f}s"
+        ))
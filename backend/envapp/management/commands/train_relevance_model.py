@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.envapp.ingest import detect_format
+from backend.envapp.ml_utils import CompiledForest, compile_pipeline
+from backend.envapp.training import TrainingSet, file_chunks, fit, latency_violations, measure_latency, table_chunks
+from backend.envapp.views import registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Train the relevance model on rows streamed from a CSV/JSON/NDJSON file or a database table "
+        "(age_group, trimester, heat_sensitive, pollution_sensitive, concern, relevance), publish it as a "
+        "registry version with training and latency metadata and (unless it misses the latency budget) activate it."
+    )
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument("--input", metavar="PATH")
+        source.add_argument("--table", help="Read training rows from this database table.")
+        parser.add_argument("--format", choices=["json", "ndjson", "csv"], help="Defaults to the file extension.")
+        parser.add_argument("--chunk-size", type=int, default=50_000)
+        parser.add_argument("--max-rows", type=int, help="Train on a uniform sample of at most this many rows.")
+        parser.add_argument("--n-estimators", type=int, default=100)
+        parser.add_argument("--max-depth", type=int)
+        parser.add_argument("--min-samples-leaf", type=int, default=1)
+        parser.add_argument("--n-jobs", type=int, default=-1, help="Fitting processes; -1 uses every core.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--model-version", help="Defaults to a UTC timestamp plus the pipeline hash.")
+        parser.add_argument("--no-activate", action="store_true")
+        parser.add_argument("--save-pipeline", metavar="PATH", help="Also keep the fitted sklearn Pipeline here.")
+        parser.add_argument("--max-latency-ms", type=float, help="Reject the model if single-row p99 is above this.")
+        parser.add_argument(
+            "--max-batch-latency-ms", type=float, help="Reject the model if a 1000-row batch p50 is above this.",
+        )
+
+    def handle(self, *args, **options):
+        training_set = TrainingSet(max_rows=options["max_rows"], seed=options["seed"])
+        start = time.perf_counter()
+        try:
+            if options["input"]:
+                path = options["input"]
+                chunks = file_chunks(path, options["format"] or detect_format(path), options["chunk_size"])
+                source = os.path.basename(path)
+            else:
+                chunks = table_chunks(options["table"], options["chunk_size"])
+                source = f"table:{options['table']}"
+            for chunk in chunks:
+                training_set.add(chunk)
+                self.stdout.write(f"\r{training_set.rows_read} rows read", ending="")
+                self.stdout.flush()
+            self.stdout.write("")
+            read_seconds = time.perf_counter() - start
+            params = {
+                "n_estimators": options["n_estimators"],
+                "max_depth": options["max_depth"],
+                "min_samples_leaf": options["min_samples_leaf"],
+                "n_jobs": options["n_jobs"],
+                "random_state": options["seed"],
+            }
+            pipeline, fit_seconds = fit(training_set, **params)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"Fitted on {len(training_set)} rows in {fit_seconds:.2f}s")
+
+        forest = CompiledForest(compile_pipeline(pipeline))
+        latency = measure_latency(forest, training_set.categories())
+        violations = latency_violations(latency, options["max_latency_ms"], options["max_batch_latency_ms"])
+        labels = training_set.columns()["relevance"]
+        metadata = {
+            "training": {
+                "source": source,
+                "rows_read": training_set.rows_read,
+                "rows_skipped": training_set.skipped,
+                "rows_used": len(training_set),
+                "chunk_size": options["chunk_size"],
+                "read_seconds": round(read_seconds, 3),
+                "fit_seconds": round(fit_seconds, 3),
+                "params": params,
+                "label_mean": round(float(labels.mean()), 6),
+                "label_std": round(float(labels.std()), 6),
+            },
+            "latency": latency,
+        }
+
+        import joblib
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            pipeline_path = os.path.join(tmp_dir, "relevance_model.pkl")
+            joblib.dump(pipeline, pipeline_path)
+            metadata["pipeline_bytes"] = os.path.getsize(pipeline_path)
+            if options["save_pipeline"]:
+                shutil.copyfile(pipeline_path, options["save_pipeline"])
+            activate = not options["no_activate"] and not violations
+            try:
+                version = registry.publish(
+                    pipeline_path, version=options["model_version"], activate=activate, metadata=metadata,
+                )
+            except ValueError as e:
+                raise CommandError(str(e))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        published = registry.metadata(version)
+        self.stdout.write(
+            f"Single row p50 {latency['single_row_p50_ms']:.3f} ms, p99 {latency['single_row_p99_ms']:.3f} ms; "
+            f"{latency['batch_rows']}-row batch p50 {latency['batch_p50_ms']:.3f} ms; "
+            f"{published['artifact_bytes'] / 1024:.0f} KiB compiled, {metadata['pipeline_bytes'] / 1024:.0f} KiB pickled"
+        )
+        if violations:
+            raise CommandError(f"{version} published but not activated: " + "; ".join(violations))
+        state = "published and activated" if activate else "published"
+        self.stdout.write(self.style.SUCCESS(f"{version} {state}"))
@@ -0,0 +1,232 @@
+"""Per-request phase timings and the process-wide metrics built from them.
+
+ServerTimingMiddleware gives each request a RequestTimings, reachable from
+anywhere the request's context is (including sync_to_async threads) through
+``current()``. Views wrap their phases in ``phase("inference")`` and the
+like, queries are timed by the execute wrapper that ``install_query_timer``
+puts on every database connection, and caches report through
+``record_cache``. All of these do nothing outside a timed request.
+
+At the end of the request the timings go out as a Server-Timing header and
+into histograms, rendered at /api/metrics/ in the Prometheus text format.
+Phases may nest (a query run while serialising counts toward both db and
+serialize). Metrics are per process; with several workers, scrape each or
+aggregate them upstream.
+"""
+import contextvars
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.db.backends.signals import connection_created
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_current = contextvars.ContextVar("envapp_request_timings", default=None)
+
+
+class RequestTimings:
+    __slots__ = ("phases", "queries", "caches")
+
+    def __init__(self):
+        self.phases = {}
+        self.queries = 0
+        self.caches = []  # (cache, result) in lookup order
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+
+def current():
+    return _current.get()
+
+
+def start_request():
+    """Open timings for the running context; returns them and the token for ``end_request``."""
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+@contextmanager
+def phase(name):
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+def _time_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.add("db", time.perf_counter() - start)
+
+
+def _add_query_timer(sender, connection, **kwargs):
+    connection.execute_wrappers.append(_time_query)
+
+
+def install_query_timer():
+    connection_created.connect(_add_query_timer, dispatch_uid="envapp.metrics.query_timer")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels[name] for name in self.labelnames), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, buckets, labels=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labels)
+        self._lock = threading.Lock()
+        self._series = {}  # label values -> [bucket counts..., +Inf count], sum
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, **labels):
+        series = self._series.get(tuple(labels[name] for name in self.labelnames))
+        return sum(series[0]) if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _labels(self.labelnames, key, [("le", _number(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total!r}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+request_duration = Histogram(
+    "envapp_request_duration_seconds", "Time Django spent on the request, rendering included (streamed bodies are not).",
+    LATENCY_BUCKETS, labels=("route", "method", "status"),
+)
+request_phase = Histogram(
+    "envapp_request_phase_seconds", "Time spent per request in each phase (db, inference, serialize, render).",
+    LATENCY_BUCKETS, labels=("route", "phase"),
+)
+request_queries = Histogram(
+    "envapp_request_queries", "Database queries run per request.", QUERY_BUCKETS, labels=("route",),
+)
+cache_lookups = Counter("envapp_cache_lookups_total", "Response cache lookups by outcome.", labels=("cache", "result"))
+
+METRICS = [request_duration, request_phase, request_queries, cache_lookups]
+_collectors = []
+
+
+def register_collector(collect):
+    """Add ``collect()``, returning exposition lines, to be called on every scrape."""
+    _collectors.append(collect)
+
+
+def record_cache(cache, result):
+    """Count a lookup in ``cache``; ``result`` is "hit", "miss", or "stale" for the weather proxy."""
+    cache_lookups.inc(cache=cache, result=result)
+    timings = _current.get()
+    if timings is not None:
+        timings.caches.append((cache, result))
+
+
+def observe_request(route, method, status, seconds, timings):
+    request_duration.observe(seconds, route=route, method=method, status=str(status))
+    for name, phase_seconds in timings.phases.items():
+        request_phase.observe(phase_seconds, route=route, phase=name)
+    request_queries.observe(timings.queries, route=route)
+
+
+def server_timing(timings, seconds):
+    entries = []
+    for name, phase_seconds in timings.phases.items():
+        if name == "db":
+            entries.append(f'db;dur={phase_seconds * 1000:.1f};desc="{timings.queries} queries"')
+        else:
+            entries.append(f"{name};dur={phase_seconds * 1000:.1f}")
+    for cache, result in timings.caches:
+        entries.append(f'cache;desc="{cache} {result}"')
+    entries.append(f"total;dur={seconds * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def sample(name, help, kind, value, **labels):
+    """Exposition lines for one value read at scrape time, for collectors."""
+    return [f"# HELP {name} {help}", f"# TYPE {name} {kind}",
+            f"{name}{_labels(labels.keys(), labels.values())} {_number(value)}"]
+
+
+def render_metrics():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        lines.extend(collect())
+    return "\n".join(lines) + "\n"
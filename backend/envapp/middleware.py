@@ -0,0 +1,65 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import metrics
+
+
+class ServerTimingMiddleware:
+    """Times each request's phases; see metrics.py.
+
+    Adds a Server-Timing header (unless SERVER_TIMING_HEADER is off) and
+    feeds the /api/metrics/ histograms. Does nothing when METRICS_ENABLED is
+    off. Place it first so the other middleware is inside the total.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.METRICS_ENABLED
+        self.header = settings.SERVER_TIMING_HEADER
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        timings, token = metrics.start_request()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        timings, token = metrics.start_request()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    def process_template_response(self, request, response):
+        # DRF responses render after the view returns; time that as its own phase
+        timings = metrics.current()
+        if timings is not None:
+            start = time.perf_counter()
+            response.add_post_render_callback(lambda _: timings.add("render", time.perf_counter() - start))
+        return response
+
+    def finish(self, request, response, timings, seconds):
+        match = request.resolver_match
+        route = match.route if match is not None else "unmatched"
+        metrics.observe_request(route, request.method, response.status_code, seconds, timings)
+        if self.header:
+            response["Server-Timing"] = metrics.server_timing(timings, seconds)
+        return response
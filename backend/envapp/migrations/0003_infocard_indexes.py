@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 00:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('envapp', '0002_infocard'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='infocard',
+            index=models.Index(fields=['trimester', 'age_group'], name='infocard_trimester_age_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='infocard',
+            index=models.Index(fields=['age_group'], name='infocard_age_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='infocard',
+            index=models.Index(condition=models.Q(('heat_sensitive', True)), fields=['trimester', 'age_group'], name='infocard_heat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='infocard',
+            index=models.Index(condition=models.Q(('pollution_sensitive', True)), fields=['trimester', 'age_group'], name='infocard_pollution_idx'),
+        ),
+    ]
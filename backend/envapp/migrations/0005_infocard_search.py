@@ -0,0 +1,63 @@
+from django.db import migrations
+
+# SQLite FTS5 index over InfoCard text, kept in sync by triggers so bulk
+# writes and raw SQL are covered too. Other backends skip it and search.py
+# falls back to icontains.
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS InfoCardSearch USING fts5(
+        title, summary, full_text,
+        content='InfoCard', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS InfoCardSearch_insert AFTER INSERT ON InfoCard BEGIN
+        INSERT INTO InfoCardSearch(rowid, title, summary, full_text)
+        VALUES (new.id, new.title, new.summary, new.full_text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS InfoCardSearch_delete AFTER DELETE ON InfoCard BEGIN
+        INSERT INTO InfoCardSearch(InfoCardSearch, rowid, title, summary, full_text)
+        VALUES ('delete', old.id, old.title, old.summary, old.full_text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS InfoCardSearch_update AFTER UPDATE OF title, summary, full_text ON InfoCard BEGIN
+        INSERT INTO InfoCardSearch(InfoCardSearch, rowid, title, summary, full_text)
+        VALUES ('delete', old.id, old.title, old.summary, old.full_text);
+        INSERT INTO InfoCardSearch(rowid, title, summary, full_text)
+        VALUES (new.id, new.title, new.summary, new.full_text);
+    END
+    """,
+    "INSERT INTO InfoCardSearch(InfoCardSearch) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS InfoCardSearch_update",
+    "DROP TRIGGER IF EXISTS InfoCardSearch_delete",
+    "DROP TRIGGER IF EXISTS InfoCardSearch_insert",
+    "DROP TABLE IF EXISTS InfoCardSearch",
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('envapp', '0004_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE_SQL), run(DROP_SQL)),
+    ]
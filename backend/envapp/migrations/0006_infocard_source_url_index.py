@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 01:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('envapp', '0005_infocard_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='infocard',
+            index=models.Index(fields=['source_url'], name='infocard_source_url_idx'),
+        ),
+    ]
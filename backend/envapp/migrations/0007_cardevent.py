@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 01:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('envapp', '0006_infocard_source_url_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('impression', 'Impression'), ('click', 'Click')], max_length=10)),
+                ('position', models.PositiveIntegerField(blank=True, null=True)),
+                ('age_group', models.CharField(blank=True, max_length=50)),
+                ('trimester', models.CharField(blank=True, max_length=20)),
+                ('concern', models.CharField(blank=True, max_length=50)),
+                ('model_version', models.CharField(blank=True, max_length=100)),
+                ('session', models.CharField(blank=True, max_length=64)),
+                ('created_at', models.DateTimeField()),
+                ('card', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='envapp.infocard')),
+            ],
+            options={
+                'db_table': 'CardEvent',
+                'indexes': [models.Index(fields=['created_at'], name='cardevent_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 01:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('envapp', '0007_cardevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='infocard',
+            index=models.Index(fields=['updated_at'], name='infocard_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-18 01:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('envapp', '0008_infocard_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OptionStats',
+            fields=[
+                ('option', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='envapp.options')),
+                ('chosen', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'OptionStats',
+            },
+        ),
+        migrations.CreateModel(
+            name='StoryChoice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('player', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('character', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='envapp.characters')),
+                ('option', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='envapp.options')),
+                ('scene', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='envapp.scenes')),
+            ],
+            options={
+                'db_table': 'StoryChoice',
+                'indexes': [models.Index(fields=['player', 'character'], name='storychoice_player_char_idx')],
+                'constraints': [models.UniqueConstraint(fields=('player', 'scene'), name='storychoice_player_scene_uniq')],
+            },
+        ),
+    ]
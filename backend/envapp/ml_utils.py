@@ -0,0 +1,587 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Column order the pipeline was fitted with
+FEATURE_COLUMNS = ["age_group", "trimester", "heat_sensitive", "pollution_sensitive", "concern"]
+
+# Fed to the encoder to stand in for "any value it has not seen"
+UNKNOWN_PLACEHOLDER = "\0unknown"
+
+
+def feature_columns(user_inputs, articles):
+    # One value per article; the user inputs are the same for every row
+    n = len(articles)
+    return {
+        "age_group": [user_inputs.get("age_group", "")] * n,
+        "trimester": [user_inputs.get("trimester", "")] * n,
+        "heat_sensitive": [article.heat_sensitive for article in articles],
+        "pollution_sensitive": [article.pollution_sensitive for article in articles],
+        "concern": [user_inputs.get("concern", "")] * n,
+    }
+
+
+def build_feature_frame(user_inputs, articles):
+    # Input for the scikit-learn Pipeline, which selects columns by name
+    import pandas as pd
+
+    return pd.DataFrame(feature_columns(user_inputs, articles), columns=FEATURE_COLUMNS)
+
+
+def compile_pipeline(model):
+    """Flatten a fitted one-hot + RandomForestRegressor Pipeline into NumPy arrays.
+
+    The nodes of every tree are concatenated into ``feature``, ``threshold``,
+    ``left``, ``right`` and ``value``, with ``roots`` holding each tree's first
+    node. Leaves point to themselves, so walking ``depth`` steps from the roots
+    lands every row on its leaf. Needs scikit-learn; the result does not.
+    """
+    from sklearn.preprocessing import OneHotEncoder
+
+    preprocessor = model.named_steps["preprocessor"]
+    forest = model.named_steps["regressor"]
+
+    arrays = {}
+    categorical, categorical_offsets, passthrough, passthrough_offsets = [], [], [], []
+    ignore_unknown = True
+    offset = 0
+    for name, transformer, columns in preprocessor.transformers_:
+        if isinstance(transformer, OneHotEncoder):
+            if transformer.drop_idx_ is not None:
+                raise ValueError("OneHotEncoder(drop=...) is not supported")
+            ignore_unknown = ignore_unknown and transformer.handle_unknown == "ignore"
+            for column, categories in zip(columns, transformer.categories_):
+                arrays[f"categories_{len(categorical)}"] = np.asarray(categories, dtype=str)
+                categorical.append(column)
+                categorical_offsets.append(offset)
+                offset += len(categories)
+        elif transformer == "drop":
+            continue
+        elif transformer == "passthrough" or getattr(transformer, "func", False) is None:
+            for column in columns:
+                passthrough.append(column)
+                passthrough_offsets.append(offset)
+                offset += 1
+        else:
+            raise ValueError(f"Unsupported transformer {name!r}: {transformer!r}")
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    depth = 0
+    node_offset = 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        if tree.n_outputs != 1:
+            raise ValueError("Only single-output forests are supported")
+        nodes = np.arange(tree.node_count)
+        leaf = tree.children_left == -1
+        features.append(np.where(leaf, 0, tree.feature))
+        thresholds.append(np.where(leaf, np.inf, tree.threshold))
+        lefts.append(np.where(leaf, nodes, tree.children_left) + node_offset)
+        rights.append(np.where(leaf, nodes, tree.children_right) + node_offset)
+        values.append(tree.value[:, 0, 0])
+        roots.append(node_offset)
+        depth = max(depth, tree.max_depth)
+        node_offset += tree.node_count
+
+    arrays.update(
+        categorical_columns=np.asarray(categorical, dtype=str),
+        categorical_offsets=np.asarray(categorical_offsets, dtype=np.int32),
+        passthrough_columns=np.asarray(passthrough, dtype=str),
+        passthrough_offsets=np.asarray(passthrough_offsets, dtype=np.int32),
+        n_features=np.int32(offset),
+        ignore_unknown=np.bool_(ignore_unknown),
+        feature=np.concatenate(features).astype(np.int32),
+        threshold=np.concatenate(thresholds).astype(np.float64),
+        left=np.concatenate(lefts).astype(np.int32),
+        right=np.concatenate(rights).astype(np.int32),
+        value=np.concatenate(values).astype(np.float64),
+        roots=np.asarray(roots, dtype=np.int32),
+        depth=np.int32(depth),
+    )
+    return arrays
+
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class CompiledForest:
+    """Vectorized evaluator for the arrays written by ``compile_pipeline``."""
+
+    def __init__(self, arrays):
+        self.categorical_columns = [str(c) for c in arrays["categorical_columns"]]
+        self.categorical_offsets = [int(o) for o in arrays["categorical_offsets"]]
+        self.passthrough_columns = [str(c) for c in arrays["passthrough_columns"]]
+        self.passthrough_offsets = [int(o) for o in arrays["passthrough_offsets"]]
+        self.categories = {
+            column: {str(value): i for i, value in enumerate(arrays[f"categories_{n}"])}
+            for n, column in enumerate(self.categorical_columns)
+        }
+        self.n_features = int(arrays["n_features"])
+        self.ignore_unknown = bool(arrays["ignore_unknown"])
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.depth = int(arrays["depth"])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls({name: arrays[name] for name in arrays.files})
+
+    def encode(self, columns, n):
+        X = np.zeros((n, self.n_features), dtype=np.float32)
+        rows = np.arange(n)
+        for column, offset in zip(self.categorical_columns, self.categorical_offsets):
+            index = self.categories[column]
+            codes = np.fromiter((index.get(value, -1) for value in columns[column]), dtype=np.int64, count=n)
+            known = codes >= 0
+            if not self.ignore_unknown and not known.all():
+                raise ValueError(f"Found unknown categories in column {column!r}")
+            X[rows[known], offset + codes[known]] = 1
+        for column, offset in zip(self.passthrough_columns, self.passthrough_offsets):
+            X[:, offset] = np.asarray(columns[column], dtype=np.float32)
+        return X
+
+    def predict_encoded(self, X):
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes].mean(axis=1)
+
+    def predict(self, user_inputs, articles):
+        return self.predict_encoded(self.encode(feature_columns(user_inputs, articles), len(articles)))
+
+
+class ScoreTable:
+    """Every score the model can produce, computed once with a single evaluation.
+
+    The categorical columns take the categories learnt by the pipeline's
+    OneHotEncoder and the remaining columns are the two boolean flags, so the
+    whole input space is a small cross product. When the encoder ignores
+    unknown categories they all encode to the same all-zero vector, so each
+    categorical column gets one extra ``None`` slot standing for "unknown".
+    """
+
+    def __init__(self, forest):
+        self.categories = {column: set(index) for column, index in forest.categories.items()}
+        self.ignore_unknown = forest.ignore_unknown
+
+        slots = []
+        for column in FEATURE_COLUMNS:
+            if column in self.categories:
+                values = sorted(self.categories[column])
+                slots.append(values + [None] if self.ignore_unknown else values)
+            else:
+                slots.append([False, True])
+
+        keys = list(itertools.product(*slots))
+        columns = {
+            column: [UNKNOWN_PLACEHOLDER if key[i] is None else key[i] for key in keys]
+            for i, column in enumerate(FEATURE_COLUMNS)
+        }
+        scores = forest.predict_encoded(forest.encode(columns, len(keys)))
+        self.scores = dict(zip(keys, (float(score) for score in scores)))
+
+    def _slot(self, column, value):
+        # Returns (ok, slot); ok is False when the table cannot answer for this value
+        if value in self.categories[column]:
+            return True, value
+        return self.ignore_unknown, None
+
+    def user_key(self, user_inputs):
+        """Resolve the per-request part of the key, or ``None`` if it is not in the table."""
+        key = {}
+        for column in ("age_group", "trimester", "concern"):
+            ok, slot = self._slot(column, user_inputs.get(column, ""))
+            if not ok:
+                return None
+            key[column] = slot
+        return key
+
+    def lookup(self, user_key, article):
+        if user_key is None:
+            return None
+        return self.scores.get((
+            user_key["age_group"],
+            user_key["trimester"],
+            bool(article.heat_sensitive),
+            bool(article.pollution_sensitive),
+            user_key["concern"],
+        ))
+
+
+class ActiveModel:
+    """One loaded registry version: its metadata, compiled forest and score table.
+
+    Live inference goes through ``batcher`` (a MicroBatcher) when one is given.
+    """
+
+    def __init__(self, version, key, metadata, forest, batcher=None):
+        self.version = version
+        self.key = key
+        self.metadata = metadata
+        self.forest = forest
+        self.batcher = batcher
+        try:
+            self.table = ScoreTable(forest)
+        except Exception as e:
+            self.table = None
+            print(f"Could not build relevance score table for {version}, using live inference: {e}")
+
+    def match_category(self, column, value, normalize):
+        """The category the model knows that ``normalize`` maps to the same form as ``value``."""
+        normalized = normalize(value)
+        for category in self.forest.categories.get(column, ()):
+            if normalize(category) == normalized:
+                return category
+        return value
+
+    def predict(self, user_inputs, article):
+        return self.predict_batch(user_inputs, [article])[0]
+
+    def predict_live(self, user_inputs, articles):
+        if self.batcher is None:
+            return self.forest.predict(user_inputs, articles)
+        X = self.forest.encode(feature_columns(user_inputs, articles), len(articles))
+        return self.batcher.predict(self.forest, X)
+
+    def predict_batch(self, user_inputs, articles):
+        """Score articles from the table; only misses go to live inference, in one batch.
+
+        If the live batch fails, misses are retried one by one so a bad row
+        only costs its own score.
+        """
+        forest, table = self.forest, self.table
+        scores = [None] * len(articles)
+        if table is not None:
+            user_key = table.user_key(user_inputs)
+            scores = [table.lookup(user_key, article) for article in articles]
+
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if not missing:
+            return scores
+
+        try:
+            live = self.predict_live(user_inputs, [articles[i] for i in missing])
+            for i, score in zip(missing, live):
+                scores[i] = float(score)
+            return scores
+        except Exception as e:
+            print(f"Batch prediction failed, scoring articles individually: {e}")
+
+        for i in missing:
+            try:
+                scores[i] = float(forest.predict(user_inputs, [articles[i]])[0])
+            except Exception as e:
+                scores[i] = 0  # fallback score
+                print(f"Prediction failed for article {articles[i].id}: {e}")
+        return scores
+
+
+class ModelRegistry:
+    """Versioned relevance models on disk, loaded on first use and hot-swapped.
+
+    Each version is a directory ``<root>/<version>/`` holding the compiled
+    ``model.npz`` and a ``metadata.json``. The ``ACTIVE`` file names the
+    version to serve; without it the newest version wins. Versions are
+    written to a temporary directory and renamed into place, and ``ACTIVE``
+    is replaced atomically, so a reader never sees a half-written artifact.
+
+    ``current()`` checks for a new artifact at most every ``poll_interval``
+    seconds. Only one thread loads it; the others keep serving the previous
+    model until the new one is swapped in with a single reference
+    assignment. An artifact that fails to load is logged and the previous
+    model stays active.
+    """
+
+    ARTIFACT = "model.npz"
+    METADATA = "metadata.json"
+    ACTIVE = "ACTIVE"
+
+    def __init__(self, root, poll_interval=1.0, batcher=None):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.batcher = batcher
+        self._lock = threading.Lock()
+        self._active = None
+        self._next_check = 0.0
+
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isfile(os.path.join(self.root, name, self.ARTIFACT))
+        )
+
+    def metadata(self, version):
+        with open(os.path.join(self.root, version, self.METADATA)) as f:
+            return json.load(f)
+
+    def active_version(self):
+        try:
+            with open(os.path.join(self.root, self.ACTIVE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            versions = self.versions()
+            return versions[-1] if versions else None
+
+    def activate(self, version):
+        if version not in self.versions():
+            raise ValueError(f"Unknown relevance model version {version!r}")
+        tmp_path = os.path.join(self.root, f".{self.ACTIVE}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(version + "\n")
+        os.replace(tmp_path, os.path.join(self.root, self.ACTIVE))
+
+    def publish(self, source_path, version=None, activate=True, metadata=None):
+        """Compile a pickled Pipeline into a new version. Needs scikit-learn.
+
+        ``metadata`` (e.g. training details) is merged into metadata.json.
+        """
+        import joblib
+        import sklearn
+
+        source_sha256 = file_sha256(source_path)
+        created_at = datetime.now(timezone.utc)
+        version = version or f"{created_at:%Y%m%d%H%M%S}-{source_sha256[:8]}"
+        target = os.path.join(self.root, version)
+        if os.path.exists(target):
+            raise ValueError(f"Relevance model version {version!r} already exists")
+
+        arrays = compile_pipeline(joblib.load(source_path))
+        forest = CompiledForest(arrays)
+        metadata = {
+            **(metadata or {}),
+            "version": version,
+            "created_at": created_at.isoformat(),
+            "source": os.path.basename(source_path),
+            "source_sha256": source_sha256,
+            "sklearn_version": sklearn.__version__,
+            "n_estimators": len(forest.roots),
+            "n_nodes": len(forest.value),
+            "depth": forest.depth,
+            "categories": {column: sorted(index) for column, index in forest.categories.items()},
+        }
+
+        tmp_dir = os.path.join(self.root, f".{version}.{os.getpid()}.tmp")
+        os.makedirs(tmp_dir)
+        try:
+            with open(os.path.join(tmp_dir, self.ARTIFACT), "wb") as f:
+                np.savez(f, **arrays)
+            metadata["artifact_bytes"] = os.path.getsize(os.path.join(tmp_dir, self.ARTIFACT))
+            with open(os.path.join(tmp_dir, self.METADATA), "w") as f:
+                json.dump(metadata, f, indent=2)
+            os.rename(tmp_dir, target)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        if activate:
+            self.activate(version)
+        return version
+
+    def _artifact_key(self):
+        version = self.active_version()
+        if version is None:
+            return None
+        try:
+            return version, os.stat(os.path.join(self.root, version, self.ARTIFACT)).st_mtime_ns
+        except FileNotFoundError:
+            return version, None
+
+    def _load(self, key):
+        version = key[0]
+        forest = CompiledForest.load(os.path.join(self.root, version, self.ARTIFACT))
+        try:
+            metadata = self.metadata(version)
+        except (OSError, ValueError):
+            metadata = {"version": version}
+        return ActiveModel(version, key, metadata, forest, self.batcher)
+
+    def current(self):
+        """The active model, or ``None`` if no version has ever loaded."""
+        active = self._active
+        now = time.monotonic()
+        if active is not None and now < self._next_check:
+            return active
+
+        # Requests never wait behind a swap once a model is being served
+        if not self._lock.acquire(blocking=active is None):
+            return active
+        try:
+            active = self._active
+            if active is not None and now < self._next_check:
+                return active
+            self._next_check = now + self.poll_interval
+            key = self._artifact_key()
+            if key is not None and (active is None or key != active.key):
+                try:
+                    self._active = self._load(key)
+                except Exception as e:
+                    print(f"Could not load relevance model {key[0]}, keeping the previous one: {e}")
+            return self._active
+        finally:
+            self._lock.release()
+
+
+class InferenceBusy(Exception):
+    pass
+
+
+class InferencePool:
+    """Bounded thread pool for model work awaited from async views.
+
+    ``workers`` calls run at once and up to ``max_pending`` more wait; past
+    that ``run`` raises InferenceBusy rather than letting the queue, and with
+    it every request's latency, grow without bound.
+    """
+
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+
+    async def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise InferenceBusy("Inference queue is full")
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return await asyncio.wrap_future(future)
+
+
+class MicroBatcher:
+    """Merges live predictions from concurrent callers into one forest evaluation.
+
+    Callers block in ``predict`` while a single worker thread drains the
+    queue: it takes the oldest request, keeps collecting until ``max_batch``
+    rows are waiting or ``max_wait`` seconds have passed since that request
+    arrived, evaluates the rows of each forest in one ``predict_encoded``
+    call and hands every caller its own slice. The batch also goes out as
+    soon as every caller currently inside ``predict`` is in it, since nobody
+    else is there to wait for; so ``max_wait`` only bounds the latency added
+    while more callers are on their way.
+    """
+
+    def __init__(self, max_batch=256, max_wait=0.002):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._callers = 0
+        self._callers_lock = threading.Lock()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "batches": 0, "requests": 0, "rows": 0, "max_batch_rows": 0,
+            "wait_seconds": 0.0, "max_wait_seconds": 0.0, "max_queue_depth": 0,
+        }
+
+    def predict(self, forest, X):
+        """Scores for the encoded rows ``X``, evaluated together with other callers' rows."""
+        if not len(X):
+            return forest.predict_encoded(X)
+        self._ensure_worker()
+        future = Future()
+        with self._callers_lock:
+            self._callers += 1
+        try:
+            self._queue.put((forest, X, future, time.monotonic()))
+            depth = self._queue.qsize()
+            if depth > self._stats["max_queue_depth"]:
+                with self._stats_lock:
+                    self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], depth)
+            return future.result()
+        finally:
+            with self._callers_lock:
+                self._callers -= 1
+
+    def stats(self):
+        """Counters since start, plus the current queue depth; averages are derived from them."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        batches, requests = stats["batches"], stats["requests"]
+        stats["queue_depth"] = self._queue.qsize()
+        stats["mean_batch_rows"] = stats["rows"] / batches if batches else 0.0
+        stats["mean_batch_requests"] = requests / batches if batches else 0.0
+        stats["mean_wait_seconds"] = stats["wait_seconds"] / requests if requests else 0.0
+        return stats
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                worker = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+                worker.start()
+                self._worker = worker
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        rows = len(batch[0][1])
+        deadline = batch[0][3] + self.max_wait
+        while rows < self.max_batch and len(batch) < self._callers:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item[1])
+        return batch, rows
+
+    def _run(self):
+        while True:
+            batch, rows = self._collect()
+            started = time.monotonic()
+            waits = [started - enqueued for _, _, _, enqueued in batch]
+            with self._stats_lock:
+                stats = self._stats
+                stats["batches"] += 1
+                stats["requests"] += len(batch)
+                stats["rows"] += rows
+                stats["max_batch_rows"] = max(stats["max_batch_rows"], rows)
+                stats["wait_seconds"] += sum(waits)
+                stats["max_wait_seconds"] = max(stats["max_wait_seconds"], max(waits))
+
+            # Requests for different model versions can meet in one batch during a swap
+            by_forest = {}
+            for item in batch:
+                by_forest.setdefault(id(item[0]), []).append(item)
+            for items in by_forest.values():
+                self._evaluate(items)
+
+    @staticmethod
+    def _evaluate(items):
+        futures = [future for _, _, future, _ in items]
+        try:
+            scores = items[0][0].predict_encoded(np.concatenate([X for _, X, _, _ in items]))
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        start = 0
+        for (_, X, future, _) in items:
+            future.set_result(scores[start:start + len(X)])
+            start += len(X)
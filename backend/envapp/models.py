@@ -4,6 +4,7 @@ class Characters(models.Model):
     name = models.CharField(max_length=100)
     age = models.CharField(max_length=50)
     location = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'Characters'  # still works in SQLite
@@ -16,6 +17,7 @@ class Scenes(models.Model):
     character = models.ForeignKey(Characters, on_delete=models.CASCADE)
     scene_key = models.CharField(max_length=50)
     question = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'Scenes'
@@ -31,6 +33,7 @@ class Options(models.Model):
     feedback = models.TextField()
     emotion = models.CharField(max_length=50)
     correct = models.BooleanField()
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'Options'
@@ -51,9 +54,97 @@ class InfoCard(models.Model):
     pollution_sensitive = models.BooleanField(default=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'InfoCard'
+        # Match the filter combinations built by filter_info_cards in views.py.
+        # The partial indexes only cover the rows a heat or pollution concern
+        # can return (backends without partial indexes skip them).
+        indexes = [
+            models.Index(fields=['trimester', 'age_group'], name='infocard_trimester_age_idx'),
+            models.Index(fields=['age_group'], name='infocard_age_idx'),
+            models.Index(
+                fields=['trimester', 'age_group'], name='infocard_heat_idx',
+                condition=models.Q(heat_sensitive=True),
+            ),
+            models.Index(
+                fields=['trimester', 'age_group'], name='infocard_pollution_idx',
+                condition=models.Q(pollution_sensitive=True),
+            ),
+            # Bulk ingestion matches incoming cards on their source URL.
+            models.Index(fields=['source_url'], name='infocard_source_url_idx'),
+            # The related-cards index (related.py) picks up cards saved since its snapshot.
+            models.Index(fields=['updated_at'], name='infocard_updated_idx'),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class CardEvent(models.Model):
+    """An InfoCard shown (impression) or opened (click), with who it was ranked for.
+
+    Rows are only ever inserted, in batches by the event buffer (events.py).
+    The card is not a database constraint, so inserts never wait on InfoCard
+    and deleting a card keeps its history.
+    """
+    IMPRESSION = "impression"
+    CLICK = "click"
+    KINDS = [(IMPRESSION, "Impression"), (CLICK, "Click")]
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    card = models.ForeignKey(InfoCard, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    position = models.PositiveIntegerField(null=True, blank=True)  # rank in the list it was shown in
+    age_group = models.CharField(max_length=50, blank=True)
+    trimester = models.CharField(max_length=20, blank=True)
+    concern = models.CharField(max_length=50, blank=True)
+    model_version = models.CharField(max_length=100, blank=True)
+    session = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField()  # when the server received it, not when it was flushed
+
+    class Meta:
+        db_table = 'CardEvent'
+        indexes = [models.Index(fields=['created_at'], name='cardevent_created_idx')]
+
+    def __str__(self):
+        return f"{self.kind} {self.card_id}"
+
+
+class StoryChoice(models.Model):
+    """The option a player picked in a scene; a new pick replaces the old one.
+
+    ``player`` is an opaque id the client generates and keeps, so progress
+    can be resumed on any device that has it.
+    """
+    player = models.CharField(max_length=64)
+    character = models.ForeignKey(Characters, on_delete=models.CASCADE, related_name='+')
+    scene = models.ForeignKey(Scenes, on_delete=models.CASCADE, related_name='+')
+    option = models.ForeignKey(Options, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'StoryChoice'
+        constraints = [models.UniqueConstraint(fields=['player', 'scene'], name='storychoice_player_scene_uniq')]
+        # A player's progress through one story is read in one range scan
+        indexes = [models.Index(fields=['player', 'character'], name='storychoice_player_char_idx')]
+
+    def __str__(self):
+        return f"{self.player} - {self.scene_id}: {self.option_id}"
+
+
+class OptionStats(models.Model):
+    """How many players currently have this option picked.
+
+    Kept up to date with F() increments as choices are recorded (progress.py),
+    so reading a story's statistics never counts StoryChoice rows.
+    """
+    option = models.OneToOneField(Options, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    chosen = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'OptionStats'
+
+    def __str__(self):
+        return f"{self.option_id}: {self.chosen}"
@@ -0,0 +1,100 @@
+"""Players' story choices and the per-option counters kept alongside them.
+
+Recording a choice and adjusting OptionStats happen in one transaction, with
+``F()`` updates so concurrent players never overwrite each other's counts:
+a first pick in a scene adds one to its option, a changed pick moves one
+from the old option to the new, and repeating a pick changes nothing (so
+clients can safely retry). Statistics for a whole story are then read in
+one query over the Scenes/Options indexes, without counting choices.
+"""
+from django.db import IntegrityError, router, transaction
+from django.db.models import F
+
+from .models import Options, OptionStats, StoryChoice
+
+
+def _add(db, option_id, delta):
+    stats = OptionStats.objects.using(db)
+    if delta < 0:
+        stats.filter(option_id=option_id, chosen__gt=0).update(chosen=F("chosen") + delta)
+        return
+    if stats.filter(option_id=option_id).update(chosen=F("chosen") + delta):
+        return
+    try:
+        with transaction.atomic(using=db):
+            stats.create(option_id=option_id, chosen=delta)
+    except IntegrityError:
+        # Another player's first pick of this option created the row meanwhile
+        stats.filter(option_id=option_id).update(chosen=F("chosen") + delta)
+
+
+def record_choice(player, option_id):
+    """Record ``player`` picking ``option_id``; returns ``(scene_id, character_id, changed)``.
+
+    Raises Options.DoesNotExist for an unknown option.
+    """
+    option = Options.objects.values("scene_id", "scene__character_id").get(pk=option_id)
+    scene_id, character_id = option["scene_id"], option["scene__character_id"]
+    db = router.db_for_write(StoryChoice)  # the locking reads must not go to a replica
+    choices = StoryChoice.objects.using(db)
+    with transaction.atomic(using=db):
+        existing = choices.select_for_update().filter(player=player, scene_id=scene_id).first()
+        if existing is None:
+            try:
+                with transaction.atomic(using=db):
+                    choices.create(player=player, character_id=character_id, scene_id=scene_id, option_id=option_id)
+            except IntegrityError:
+                # The same player's concurrent request recorded this scene first
+                existing = choices.select_for_update().get(player=player, scene_id=scene_id)
+        if existing is not None:
+            if existing.option_id == option_id:
+                return scene_id, character_id, False
+            _add(db, existing.option_id, -1)
+            existing.option_id = option_id
+            existing.save(update_fields=["option", "updated_at"])
+        _add(db, option_id, 1)
+    return scene_id, character_id, True
+
+
+def clear_progress(player, character_id):
+    """Forget ``player``'s choices in one story, taking them back out of the counters. Returns how many there were."""
+    db = router.db_for_write(StoryChoice)
+    with transaction.atomic(using=db):
+        choices = list(
+            StoryChoice.objects.using(db).select_for_update().filter(player=player, character_id=character_id)
+            .values_list("id", "option_id")
+        )
+        for _, option_id in choices:
+            _add(db, option_id, -1)
+        StoryChoice.objects.using(db).filter(id__in=[choice_id for choice_id, _ in choices]).delete()
+    return len(choices)
+
+
+def player_progress(player, character_id):
+    """``{scene_key: option_id}`` for the scenes ``player`` has answered in one story."""
+    return dict(
+        StoryChoice.objects.filter(player=player, character_id=character_id)
+        .values_list("scene__scene_key", "option_id")
+    )
+
+
+def story_stats(character_id):
+    """Pick counts for every option of a story, from one query: ``{scene_key: {"total": n, "options": {...}}}``.
+
+    Each option maps its id to ``{"chosen": count, "percent": share of the
+    scene's picks}``. Empty if the character has no scenes.
+    """
+    rows = (
+        Options.objects.filter(scene__character_id=character_id)
+        .order_by("scene_id", "id")
+        .values_list("scene__scene_key", "id", "stats__chosen")
+    )
+    scenes = {}
+    for scene_key, option_id, chosen in rows:
+        scene = scenes.setdefault(scene_key, {"total": 0, "options": {}})
+        scene["options"][option_id] = {"chosen": chosen or 0}
+        scene["total"] += chosen or 0
+    for scene in scenes.values():
+        for option in scene["options"].values():
+            option["percent"] = round(100 * option["chosen"] / scene["total"], 1) if scene["total"] else 0.0
+    return scenes
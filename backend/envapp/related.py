@@ -0,0 +1,352 @@
+"""Content similarity between InfoCards, from precomputed TF-IDF vectors.
+
+Every card's title, summary and full_text (weighted 3:2:1) becomes an
+L2-normalised TF-IDF vector, so the dot product of two vectors is their
+cosine similarity. ``manage.py build_related_index`` writes the vectors as a
+snapshot of .npy arrays that workers open with ``mmap_mode="r"``, so they
+load instantly and share the pages:
+
+    <root>/<snapshot>/header.json       counts, built_at, synced_at
+    <root>/<snapshot>/vocabulary.json   the term of each column
+    <root>/<snapshot>/idf.npy, ids.npy  per-column idf, per-row card id (sorted)
+    <root>/<snapshot>/rows_*.npy        CSR: each card's vector
+    <root>/<snapshot>/postings_*.npy    CSC: each term's cards, the inverted index
+    <root>/CURRENT                      the snapshot to serve
+
+A lookup takes the card's vector, scores only the cards sharing one of its
+terms (a sparse dot product over those terms' postings, in the snapshot and
+in the overlay), partitions out the best few of each and merges them in a
+heap.
+
+The vocabulary and idf are fixed when the index is fully built, so a card
+can be vectorised on its own at any time. Cards saved after the snapshot
+(by updated_at) are re-vectorised into an in-memory overlay on the next
+poll, and ``build_related_index --update`` folds them, and deletions, into
+a new snapshot without touching the other rows. Terms new since the full
+build are ignored until the next one. Workers serve no related cards until
+a snapshot exists; nothing is built on the request path.
+"""
+import heapq
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import numpy as np
+
+RELATED_INDEX_DIR = os.path.join(os.path.dirname(__file__), "related_index")
+CURRENT = "CURRENT"
+
+TOKEN_RE = re.compile(r"\b(?!\d+\b)\w{2,}\b", re.UNICODE)  # words of two or more characters, not bare numbers
+FIELD_WEIGHTS = (("title", 3), ("summary", 2), ("full_text", 1))
+# A term must be shared to relate two cards, and one in most cards relates them all
+MIN_DF = 2
+MAX_DF = 0.5
+# Long articles are looked up by their strongest terms only
+MAX_QUERY_TERMS = 64
+CARD_FIELDS = ("id", "title", "summary", "full_text", "updated_at")
+
+
+def term_counts(title, summary, full_text):
+    counts = Counter()
+    for text, (_, weight) in zip((title, summary, full_text), FIELD_WEIGHTS):
+        for token in TOKEN_RE.findall((text or "").lower()):
+            counts[token] += weight
+    return counts
+
+
+def vectorize(counts, vocabulary, idf):
+    """(indices, values) of the normalised TF-IDF vector, with sublinear tf; unknown terms are dropped."""
+    pairs = sorted(
+        (vocabulary[term], (1 + math.log(count)) * idf[vocabulary[term]])
+        for term, count in counts.items() if term in vocabulary
+    )
+    indices = np.fromiter((column for column, _ in pairs), dtype=np.int32, count=len(pairs))
+    values = np.fromiter((value for _, value in pairs), dtype=np.float32, count=len(pairs))
+    norm = np.linalg.norm(values)
+    if norm:
+        values /= norm
+    return indices, values
+
+
+def _cards(queryset):
+    return queryset.order_by("id").values_list(*CARD_FIELDS).iterator(chunk_size=2000)
+
+
+def build(queryset):
+    """A RelatedIndex over every card in ``queryset``, built in two passes (document frequencies, then vectors)."""
+    from scipy.sparse import csr_matrix
+
+    df = Counter()
+    n_docs = 0
+    synced_at = None
+    for _, title, summary, full_text, updated_at in _cards(queryset):
+        df.update(term_counts(title, summary, full_text).keys())
+        n_docs += 1
+        synced_at = updated_at if synced_at is None else max(synced_at, updated_at)
+
+    max_df = max(MAX_DF * n_docs, MIN_DF)
+    terms = sorted(term for term, count in df.items() if MIN_DF <= count <= max_df)
+    vocabulary = {term: column for column, term in enumerate(terms)}
+    idf = np.array([math.log((1 + n_docs) / (1 + df[term])) + 1 for term in terms], dtype=np.float32)
+
+    ids, indptr, indices, values = [], [0], [], []
+    for card_id, title, summary, full_text, _ in _cards(queryset):
+        row_indices, row_values = vectorize(term_counts(title, summary, full_text), vocabulary, idf)
+        ids.append(card_id)
+        indices.append(row_indices)
+        values.append(row_values)
+        indptr.append(indptr[-1] + len(row_indices))
+    rows = csr_matrix((
+        np.concatenate(values) if values else np.zeros(0, np.float32),
+        np.concatenate(indices) if indices else np.zeros(0, np.int32),
+        np.array(indptr, dtype=np.int64),
+    ), shape=(len(ids), len(terms)))
+
+    now = datetime.now(timezone.utc).isoformat()
+    header = {"built_at": now, "synced_at": synced_at.isoformat() if synced_at else None, "updated_at": now}
+    return RelatedIndex(header, terms, idf, np.array(ids, dtype=np.int64), rows)
+
+
+class RelatedIndex:
+    """Snapshot vectors plus the overlay of cards changed since; lookups are thread-safe."""
+
+    def __init__(self, header, terms, idf, ids, rows, postings=None):
+        from scipy.sparse import csc_matrix, csr_matrix
+
+        self.header = header
+        self.terms = terms
+        self.vocabulary = {term: column for column, term in enumerate(terms)}
+        self.idf = idf
+        self.ids = ids
+        self.rows = rows if isinstance(rows, csr_matrix) else csr_matrix(rows)
+        self.postings = postings if postings is not None else csc_matrix(self.rows)
+        synced_at = header.get("synced_at")
+        self.synced_at = datetime.fromisoformat(synced_at) if synced_at else None
+        self._overlay = self._make_overlay({})
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _row(self, card_id):
+        row = int(np.searchsorted(self.ids, card_id))
+        return row if row < len(self.ids) and self.ids[row] == card_id else None
+
+    def _make_overlay(self, vectors):
+        """(vectors of cards changed since the snapshot by id, snapshot rows they replace, their ids, CSC postings)."""
+        from scipy.sparse import csc_matrix
+
+        ids = np.array(sorted(vectors), dtype=np.int64)
+        indptr = np.cumsum([0] + [len(vectors[card_id][0]) for card_id in ids.tolist()])
+        postings = csc_matrix(self._csr(vectors, ids.tolist(), indptr))
+        rows = np.searchsorted(self.ids, ids)
+        rows = rows[rows < len(self.ids)]
+        stale_rows = rows[np.isin(self.ids[rows], ids)]
+        return vectors, stale_rows, ids, postings
+
+    def _csr(self, vectors, card_ids, indptr):
+        from scipy.sparse import csr_matrix
+
+        return csr_matrix((
+            np.concatenate([vectors[card_id][1] for card_id in card_ids]) if card_ids else np.zeros(0, np.float32),
+            np.concatenate([vectors[card_id][0] for card_id in card_ids]) if card_ids else np.zeros(0, np.int32),
+            indptr,
+        ), shape=(len(card_ids), len(self.terms)))
+
+    def vector(self, card_id):
+        vectors = self._overlay[0]
+        if card_id in vectors:
+            return vectors[card_id]
+        row = self._row(card_id)
+        if row is None:
+            return None
+        start, stop = self.rows.indptr[row], self.rows.indptr[row + 1]
+        return self.rows.indices[start:stop], self.rows.data[start:stop]
+
+    def related(self, card_id, limit):
+        """``[(card_id, similarity), ...]`` best first, or ``None`` if the card has no vector."""
+        vector = self.vector(card_id)
+        if vector is None:
+            return None
+        indices, values = vector
+        if len(indices) > MAX_QUERY_TERMS:
+            strongest = np.argpartition(values, -MAX_QUERY_TERMS)[-MAX_QUERY_TERMS:]
+            indices, values = indices[strongest], values[strongest]
+        if not len(indices):
+            return []
+        _, stale_rows, overlay_ids, overlay_postings = self._overlay
+
+        def best(postings, ids, skip_rows):
+            # Only the postings of the card's own terms are read
+            scores = np.asarray(postings[:, indices] @ values).ravel()
+            scores[skip_rows] = 0
+            candidates = np.flatnonzero(scores)
+            if len(candidates) > limit:
+                # Common terms reach most cards; cut them down in C before the heap sees them
+                candidates = candidates[np.argpartition(scores[candidates], -limit)[-limit:]]
+            return heapq.nlargest(limit, zip(scores[candidates].tolist(), (-ids[candidates]).tolist()))
+
+        row = self._row(card_id)
+        skip = stale_rows if row is None else np.append(stale_rows, row)
+        overlay_row = int(np.searchsorted(overlay_ids, card_id))
+        overlay_skip = [overlay_row] if overlay_row < len(overlay_ids) and overlay_ids[overlay_row] == card_id else []
+        merged = best(self.postings, self.ids, skip) + best(overlay_postings, overlay_ids, overlay_skip)
+        return [(-negative_id, score) for score, negative_id in heapq.nlargest(limit, merged)]
+
+    def refresh(self, queryset):
+        """Re-vectorise the cards in ``queryset`` saved since the last refresh into the overlay."""
+        with self._refresh_lock:
+            if self.synced_at is None:
+                changed = queryset
+            else:
+                changed = queryset.filter(updated_at__gte=self.synced_at)  # >=: rows saved in the same tick
+            vectors = dict(self._overlay[0])
+            synced_at = self.synced_at
+            for card_id, title, summary, full_text, updated_at in _cards(changed):
+                vectors[card_id] = vectorize(term_counts(title, summary, full_text), self.vocabulary, self.idf)
+                synced_at = updated_at if synced_at is None else max(synced_at, updated_at)
+            if len(vectors) != len(self._overlay[0]) or synced_at != self.synced_at:
+                self._overlay = self._make_overlay(vectors)  # swapped in whole, for lookups running meanwhile
+                self.synced_at = synced_at
+            return len(vectors)
+
+    def compacted(self, live_ids):
+        """A new RelatedIndex with the overlay folded in and cards not in ``live_ids`` dropped."""
+        from scipy.sparse import vstack
+
+        vectors = self._overlay[0]
+        live_ids = set(live_ids)
+        keep = np.flatnonzero(np.isin(self.ids, list(live_ids)) & ~np.isin(self.ids, list(vectors)))
+        added = sorted(card_id for card_id in vectors if card_id in live_ids)
+        indptr = np.cumsum([0] + [len(vectors[card_id][0]) for card_id in added])
+        overlay_rows = self._csr(vectors, added, indptr)
+
+        ids = np.concatenate([self.ids[keep], np.array(added, dtype=np.int64)])
+        order = np.argsort(ids, kind="stable")
+        rows = vstack([self.rows[keep], overlay_rows], format="csr")[order]
+        header = {
+            **self.header,
+            "synced_at": self.synced_at.isoformat() if self.synced_at else None,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        return RelatedIndex(header, self.terms, self.idf, ids[order], rows)
+
+    def save(self, root=RELATED_INDEX_DIR, keep=2):
+        """Write a new snapshot under ``root``, make it current and prune all but the newest ``keep``."""
+        os.makedirs(root, exist_ok=True)
+        name = f"{datetime.now(timezone.utc):%Y%m%d%H%M%S%f}"
+        tmp_dir = os.path.join(root, f".{name}.{os.getpid()}.tmp")
+        os.makedirs(tmp_dir)
+        rows, postings = self.rows, self.postings.tocsc()
+        arrays = {
+            "idf": self.idf, "ids": self.ids,
+            "rows_data": rows.data, "rows_indices": rows.indices, "rows_indptr": rows.indptr,
+            "postings_data": postings.data, "postings_indices": postings.indices,
+            "postings_indptr": postings.indptr,
+        }
+        header = {**self.header, "cards": len(self.ids), "terms": len(self.terms), "nnz": int(rows.nnz)}
+        try:
+            for array_name, values in arrays.items():
+                np.save(os.path.join(tmp_dir, f"{array_name}.npy"), np.ascontiguousarray(values))
+            with open(os.path.join(tmp_dir, "vocabulary.json"), "w") as f:
+                json.dump(self.terms, f)
+            with open(os.path.join(tmp_dir, "header.json"), "w") as f:
+                json.dump(header, f, indent=2)
+            os.rename(tmp_dir, os.path.join(root, name))
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        tmp_path = os.path.join(root, f".{CURRENT}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(name + "\n")
+        os.replace(tmp_path, os.path.join(root, CURRENT))
+        # Workers still serving an older snapshot keep their mapping of the deleted files
+        for old in snapshots(root)[:-keep]:
+            shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+        return name
+
+    @classmethod
+    def load(cls, path):
+        from scipy.sparse import csc_matrix, csr_matrix
+
+        with open(os.path.join(path, "header.json")) as f:
+            header = json.load(f)
+        with open(os.path.join(path, "vocabulary.json")) as f:
+            terms = json.load(f)
+
+        def array(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+        shape = (header["cards"], header["terms"])
+        rows = csr_matrix((array("rows_data"), array("rows_indices"), array("rows_indptr")), shape=shape, copy=False)
+        postings = csc_matrix(
+            (array("postings_data"), array("postings_indices"), array("postings_indptr")), shape=shape, copy=False,
+        )
+        return cls(header, terms, array("idf"), array("ids"), rows, postings)
+
+
+def snapshots(root):
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root) if os.path.isfile(os.path.join(root, name, "header.json")))
+
+
+def current_snapshot(root):
+    try:
+        with open(os.path.join(root, CURRENT)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class RelatedIndexStore:
+    """The index to serve: the CURRENT snapshot, re-checked (with its overlay refreshed) every ``poll_interval``.
+
+    ``current()`` is ``None`` until ``manage.py build_related_index`` has
+    written a snapshot; building one takes a pass over every card, which no
+    request should wait for.
+    """
+
+    def __init__(self, root=RELATED_INDEX_DIR, poll_interval=5.0):
+        self.root = root
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._index = None
+        self._snapshot = None
+        self._next_check = 0.0
+        self._warned = False
+
+    def current(self):
+        index = self._index
+        now = time.monotonic()
+        if now < self._next_check:
+            return index
+        if not self._lock.acquire(blocking=index is None):
+            return index  # another request is refreshing; this one uses the index as it was
+        try:
+            from .models import InfoCard
+
+            if now < self._next_check:
+                return self._index
+            self._next_check = now + self.poll_interval
+            snapshot = current_snapshot(self.root)
+            if snapshot is None and self._index is None:
+                if not self._warned:
+                    print(f"No related-cards index in {self.root}; related cards are unavailable until "
+                          f"manage.py build_related_index has run.")
+                    self._warned = True
+                return None
+            if snapshot is not None and snapshot != self._snapshot:
+                self._index = RelatedIndex.load(os.path.join(self.root, snapshot))
+                self._snapshot = snapshot
+            self._index.refresh(InfoCard.objects.all())
+            return self._index
+        finally:
+            self._lock.release()
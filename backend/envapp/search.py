@@ -0,0 +1,82 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+SEARCH_TABLE = "InfoCardSearch"
+
+# bm25 column weights: a hit in the title counts more than one deep in full_text
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 query: every word must appear, the last as a prefix.
+
+    Words are quoted so user input can never be parsed as FTS5 syntax.
+    Returns ``None`` when the text has no searchable words.
+    """
+    tokens = TOKEN_RE.findall(query.lower())
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens[:-1]] + [f'"{tokens[-1]}"*']
+    return " ".join(terms)
+
+
+_fts_seen = set()  # database aliases known to have the index; it is never dropped at runtime
+
+
+def fts_available():
+    if connection.vendor != "sqlite":
+        return False
+    if connection.alias in _fts_seen:
+        return True
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [SEARCH_TABLE])
+        if cursor.fetchone() is None:
+            return False
+    _fts_seen.add(connection.alias)
+    return True
+
+
+def search_info_cards(queryset, query, limit, offset):
+    """Rank ``queryset`` (already filtered and annotated with ``relevance_score``) by ``query``.
+
+    The rank is the BM25 text score scaled by the personalised relevance
+    score, ``-bm25 * (1 + relevance_score / 100)``, so the model can at most
+    double a card's text rank. Returns ``[(id, rank), ...]`` for one page.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return []
+
+    inner_sql, inner_params = queryset.values("id", "relevance_score").query.sql_with_params()
+    weights = ", ".join(str(weight) for weight in BM25_WEIGHTS)
+    sql = f"""
+        SELECT cards.id, -bm25({SEARCH_TABLE}, {weights}) * (1 + cards.relevance_score / 100.0) AS search_rank
+        FROM {SEARCH_TABLE}
+        JOIN ({inner_sql}) AS cards ON cards.id = {SEARCH_TABLE}.rowid
+        WHERE {SEARCH_TABLE} MATCH %s
+        ORDER BY search_rank DESC, cards.id
+        LIMIT %s OFFSET %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*inner_params, expression, limit, offset])
+        return cursor.fetchall()
+
+
+def naive_search_info_cards(queryset, query, limit, offset):
+    """``icontains`` search over the same columns, ranked by relevance only.
+
+    Used where FTS5 is unavailable, and as the baseline in bench_search.
+    """
+    tokens = TOKEN_RE.findall(query.lower())
+    if not tokens:
+        return []
+    for token in tokens:
+        queryset = queryset.filter(
+            Q(title__icontains=token) | Q(summary__icontains=token) | Q(full_text__icontains=token)
+        )
+    rows = queryset.order_by("-relevance_score", "id").values_list("id", "relevance_score")
+    return list(rows[offset:offset + limit])
@@ -1,5 +1,6 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import Characters, Scenes, Options
+from .models import Scenes, Options
 from .models import InfoCard
 
 class OptionSerializer(serializers.ModelSerializer):
@@ -15,36 +16,56 @@ class SceneSerializer(serializers.ModelSerializer):
         fields = ['scene_key', 'question', 'options']
 
 class StoryDataSerializer(serializers.Serializer):
+    """A character's whole story: who they are and every scene with its options.
+
+    Works on Characters instances whose scenes and options are prefetched
+    (see ``setup_eager_loading``), so ``many=True`` exports any number of
+    characters in three queries.
+    """
+    id = serializers.IntegerField(read_only=True)
     character = serializers.SerializerMethodField()
     scenes = serializers.SerializerMethodField()
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.prefetch_related(
+            Prefetch('scenes_set', queryset=Scenes.objects.order_by('id')),
+            Prefetch('scenes_set__options_set', queryset=Options.objects.order_by('id')),
+        )
+
     def get_character(self, obj):
-        character = Characters.objects.first()
         return {
-            "name": character.name,
-            "age": character.age,
-            "location": character.location
+            "name": obj.name,
+            "age": obj.age,
+            "location": obj.location
         }
 
     def get_scenes(self, obj):
-        scenes = Scenes.objects.all()
         scene_map = {}
-        for scene in scenes:
-            options = Options.objects.filter(scene=scene)
+        for scene in obj.scenes_set.all():
             scene_map[scene.scene_key] = {
                 "question": scene.question,
                 "options": [
                     {
+                        "id": opt.id,
                         "text": opt.text,
                         "feedback": opt.feedback,
                         "emotion": opt.emotion,
                         "correct": opt.correct
-                    } for opt in options
+                    } for opt in scene.options_set.all()
                 ]
             }
         return scene_map
 
 class InfoCardSerializer(serializers.ModelSerializer):
+    """Pass ``fields=[...]`` to serialize only a subset of the fields."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = InfoCard
         fields = '__all__'
\ No newline at end of file
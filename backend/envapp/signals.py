@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_info_cards, invalidate_story
+from .models import Characters, InfoCard, Options, Scenes
+
+# Note: queryset.update() and bulk_create() do not send these signals, so code
+# that writes content in bulk has to call the invalidate_* helpers itself.
+
+
+@receiver([post_save, post_delete], sender=Characters)
+def character_changed(sender, instance, **kwargs):
+    invalidate_story(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Scenes)
+def scene_changed(sender, instance, **kwargs):
+    invalidate_story(instance.character_id)
+
+
+@receiver([post_save, post_delete], sender=Options)
+def option_changed(sender, instance, **kwargs):
+    # When the scene itself is being deleted it has already invalidated its character
+    character_id = Scenes.objects.filter(pk=instance.scene_id).values_list("character_id", flat=True).first()
+    if character_id is not None:
+        invalidate_story(character_id)
+
+
+@receiver([post_save, post_delete], sender=InfoCard)
+def info_card_changed(sender, instance, **kwargs):
+    invalidate_info_cards()
@@ -0,0 +1,298 @@
+"""Risk scoring for batches of symptom logs, as whole-array NumPy operations.
+
+A log is one session's ratings of the six symptoms the Symptom Tracker asks
+about (0 none to 5 severe) on one date, with optional notes and the day's
+PM2.5 and temperature. The rules are the tracker's own: a symptom rated 3 or
+more is active, a day with one rated 4 or more is high severity, and such a
+day is environment linked when PM2.5 was over 10 or it was over 30 degrees.
+On top of those, headache with swelling or dizziness (both active) and
+breathing issues rated 4 or more are warning signs, and a log with either,
+or any symptom at 5, is high risk.
+
+Trends are per session over calendar days: the mean burden (mean rating of
+the six) over the last ``window`` days against the ``window`` days before,
+and the run of consecutive high-severity days. Logs are sorted once by
+session and date, and every window bound is a ``searchsorted`` over that
+order, so nothing loops per log or per session in Python. Notes are carried
+through but not scored.
+"""
+import numpy as np
+
+SYMPTOMS = ("headache", "fatigue", "swelling", "breathing", "nausea", "dizziness")
+# The names the tracker shows, also accepted as keys
+SYMPTOM_LABELS = {
+    "Headache": "headache", "Fatigue": "fatigue", "Swelling": "swelling",
+    "Breathing Issues": "breathing", "Nausea": "nausea", "Dizziness": "dizziness",
+}
+ACTIVE = 3
+HIGH = 4
+SEVERE = 5
+PM25_HIGH = 10.0
+TEMPERATURE_HIGH = 30.0
+WORSENING = 0.5  # rise in mean burden between windows
+RISK_LEVELS = ("low", "elevated", "high")
+MAX_NOTES = 1000
+
+
+class SymptomBatch:
+    """Column arrays for ``n`` logs: sessions, dates (datetime64[D]), ratings (n x 6), pm25, temperature, notes."""
+
+    def __init__(self, sessions, dates, ratings, pm25=None, temperature=None, notes=None):
+        n = len(ratings)
+        self.sessions = np.asarray(sessions, dtype=object)
+        try:
+            self.dates = np.asarray(dates, dtype="datetime64[D]")
+        except ValueError as e:
+            raise ValueError(f"dates must be YYYY-MM-DD: {e}")
+        if np.isnat(self.dates).any():
+            raise ValueError("every log needs a date")
+        self.ratings = np.asarray(ratings, dtype=np.int8).reshape(n, len(SYMPTOMS))
+        if ((self.ratings < 0) | (self.ratings > SEVERE)).any():
+            raise ValueError(f"symptom ratings must be between 0 and {SEVERE}")
+        self.pm25 = _floats(pm25, n)
+        self.temperature = _floats(temperature, n)
+        self.notes = notes
+        if len(self.sessions) != n or len(self.dates) != n:
+            raise ValueError("every column must have one value per log")
+        self._session_codes = None
+
+    def __len__(self):
+        return len(self.ratings)
+
+    @property
+    def session_codes(self):
+        # Dense int codes for the sessions, so sorting and window keys work on integers
+        if self._session_codes is None:
+            self._session_codes = np.unique(self.sessions, return_inverse=True)[1].astype(np.int64)
+        return self._session_codes
+
+
+def _floats(values, n):
+    if values is None:
+        return np.full(n, np.nan)
+    if not isinstance(values, (list, np.ndarray)):
+        raise ValueError("pm25 and temperature must be lists of numbers")
+    if isinstance(values, list):
+        if not all(value is None or _is_number(value) for value in values):
+            raise ValueError("pm25 and temperature must be numbers")
+        values = [np.nan if value is None else value for value in values]
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) != n:
+        raise ValueError("every column must have one value per log")
+    return values
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _rating(value):
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError("symptom ratings must be integers")
+    if not 0 <= value <= SEVERE:
+        raise ValueError(f"symptom ratings must be between 0 and {SEVERE}")
+    return value
+
+
+def _dates(values):
+    # Dates as strings only: NumPy would read an integer as days since 1970
+    if not all(isinstance(value, str) for value in values):
+        raise ValueError("dates must be YYYY-MM-DD strings")
+    return values
+
+
+def batch_from_rows(entries):
+    """A SymptomBatch from log objects; symptom ratings may be top level or under "symptoms"."""
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("entries must be a non-empty list")
+    sessions, dates, ratings, pm25, temperature, notes = [], [], [], [], [], []
+    for i, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            raise ValueError(f"entries[{i}] must be an object")
+        symptoms = entry.get("symptoms", entry)
+        if isinstance(symptoms, list):  # the tracker's [{"name": ..., "severity": ...}, ...]
+            symptoms = {SYMPTOM_LABELS.get(s.get("name"), s.get("name")): s.get("severity", 0)
+                        for s in symptoms if isinstance(s, dict)}
+        elif not isinstance(symptoms, dict):
+            raise ValueError(f"entries[{i}].symptoms must be an object or a list")
+        try:
+            ratings.append([_rating(symptoms.get(name, 0)) for name in SYMPTOMS])
+        except ValueError as e:
+            raise ValueError(f"entries[{i}]: {e}")
+        sessions.append(str(entry.get("session", "")))
+        if not isinstance(entry.get("date"), str):
+            raise ValueError(f"entries[{i}].date must be a YYYY-MM-DD string")
+        dates.append(entry["date"])
+        pm25.append(entry.get("pm25"))
+        temperature.append(entry.get("temperature"))
+        note = entry.get("notes", "")
+        if not isinstance(note, str) or len(note) > MAX_NOTES:
+            raise ValueError(f"entries[{i}].notes must be a string of at most {MAX_NOTES} characters")
+        notes.append(note)
+    return SymptomBatch(sessions, dates, ratings, pm25, temperature, notes)
+
+
+def batch_from_columns(columns):
+    """A SymptomBatch from ``{"session": [...], "date": [...], "headache": [...], ...}``, parsed column at a time."""
+    if not isinstance(columns, dict) or not isinstance(columns.get("date"), list) or not columns["date"]:
+        raise ValueError("columns must hold a non-empty date list")
+    n = len(columns["date"])
+    ratings = np.zeros((n, len(SYMPTOMS)), dtype=np.int8)
+    for j, name in enumerate(SYMPTOMS):
+        values = columns.get(name)
+        if values is None:
+            continue
+        try:
+            column = np.asarray(values)
+        except ValueError:
+            raise ValueError(f"{name} must be a list of integers")
+        if column.shape != (n,) or column.dtype.kind not in "iu":
+            raise ValueError(f"{name} must be a list of {n} integers")
+        if ((column < 0) | (column > SEVERE)).any():
+            raise ValueError(f"symptom ratings must be between 0 and {SEVERE}")
+        ratings[:, j] = column
+    notes = columns.get("notes")
+    if notes is not None and (
+        not isinstance(notes, list) or not all(isinstance(note, str) and len(note) <= MAX_NOTES for note in notes)
+    ):
+        raise ValueError(f"notes must be strings of at most {MAX_NOTES} characters")
+    sessions = columns.get("session", [""] * n)
+    if not isinstance(sessions, list):
+        raise ValueError("session must be a list")
+    return SymptomBatch(
+        [str(session) for session in sessions], _dates(columns["date"]), ratings,
+        columns.get("pm25"), columns.get("temperature"), notes,
+    )
+
+
+def score(batch, window=7):
+    """Per-log risk flags and trend indicators for ``batch``, as arrays in input order."""
+    if window < 1:
+        raise ValueError("window must be at least 1")
+    ratings = batch.ratings
+    n = len(batch)
+    column = {name: ratings[:, j] for j, name in enumerate(SYMPTOMS)}
+
+    max_rating = ratings.max(axis=1)
+    active = ratings >= ACTIVE
+    active_count = active.sum(axis=1, dtype=np.int8)
+    total = ratings.sum(axis=1, dtype=np.int64)
+    burden = total / len(SYMPTOMS)
+    high_severity = max_rating >= HIGH
+    pm25_linked = high_severity & (batch.pm25 > PM25_HIGH)  # NaN compares False
+    heat_linked = high_severity & (batch.temperature > TEMPERATURE_HIGH)
+    warning_signs = (column["headache"] >= ACTIVE) & (
+        (column["swelling"] >= ACTIVE) | (column["dizziness"] >= ACTIVE)
+    )
+    breathing = column["breathing"] >= HIGH
+    risk = np.where(
+        (max_rating >= SEVERE) | warning_signs | breathing, 2,
+        np.where(high_severity | (active_count >= 2), 1, 0),
+    ).astype(np.int8)
+
+    # Trends: sort by (session, date) once; a window is a key range within one session
+    session_codes = batch.session_codes
+    days = batch.dates.astype(np.int64)
+    days -= days.min()
+    key = session_codes * (int(days.max()) + 2 * window + 1) + days
+    order = np.argsort(key, kind="stable")
+    sorted_key = key[order]
+    cumulative = np.concatenate([[0], np.cumsum(total[order])])  # integer, so window sums are exact
+
+    def window_totals(first_day_offset, last_day_offset):
+        # Summed ratings and log count over days [day - first_day_offset, day - last_day_offset] of the same session
+        start = np.searchsorted(sorted_key, sorted_key - first_day_offset, side="left")
+        stop = np.searchsorted(sorted_key, sorted_key - last_day_offset, side="right")
+        return cumulative[stop] - cumulative[start], stop - start
+
+    recent, recent_count = window_totals(window - 1, 0)
+    previous, previous_count = window_totals(2 * window - 1, window)
+    rolling = recent / (recent_count * len(SYMPTOMS))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        trend = np.where(previous_count > 0, rolling - previous / (previous_count * len(SYMPTOMS)), np.nan)
+    # recent/rc - previous/pc >= WORSENING (both per symptom), compared in integers
+    worsening = (previous_count > 0) & (
+        recent * previous_count - previous * recent_count
+        >= WORSENING * len(SYMPTOMS) * recent_count * previous_count
+    )
+
+    # Consecutive high-severity days: a run breaks at a new session, a skipped day or a milder log,
+    # and further logs on a day already in the run carry its count rather than add to it
+    sorted_days = days[order]
+    sorted_sessions = session_codes[order]
+    index = np.arange(n)
+    new_session = np.ones(n, dtype=bool)
+    new_session[1:] = sorted_sessions[1:] != sorted_sessions[:-1]
+    gap = np.zeros(n, dtype=np.int64)
+    gap[1:] = np.diff(sorted_days)
+    breaks = new_session | (gap > 1)
+    new_day = np.cumsum(new_session | (gap > 0))
+    sorted_high = high_severity[order]
+    run_start = np.maximum(
+        np.maximum.accumulate(np.where(~sorted_high, index + 1, 0)),
+        np.maximum.accumulate(np.where(breaks, index, 0)),
+    )
+    streak = np.where(sorted_high, new_day - new_day[np.minimum(run_start, n - 1)] + 1, 0)
+
+    unsorted = np.empty(n, dtype=np.int64)
+    unsorted[order] = index
+    return {
+        "risk": risk,
+        "burden": burden,
+        "max_severity": max_rating,
+        "active_symptoms": active_count,
+        "high_severity": high_severity,
+        "warning_signs": warning_signs,
+        "breathing": breathing,
+        "pm25_linked": pm25_linked,
+        "heat_linked": heat_linked,
+        "rolling_burden": rolling[unsorted],
+        "trend": trend[unsorted],
+        "worsening": worsening[unsorted],
+        "high_streak": streak[unsorted],
+    }
+
+
+def summarize(batch, scores):
+    """Population-level figures for the batch: risk mix, per-symptom means and the most common active pairs."""
+    active = (batch.ratings >= ACTIVE).astype(np.float64)  # float so the pair counts go through BLAS; still exact
+    together = active.T @ active
+    pairs = [
+        (int(together[i, j]), SYMPTOMS[i], SYMPTOMS[j])
+        for i in range(len(SYMPTOMS)) for j in range(i + 1, len(SYMPTOMS)) if together[i, j]
+    ]
+    pairs.sort(key=lambda pair: (-pair[0], pair[1], pair[2]))
+    high = scores["high_severity"]
+    high_count = int(high.sum())
+    return {
+        "logs": len(batch),
+        "sessions": int(batch.session_codes.max()) + 1,
+        "risk": dict(zip(RISK_LEVELS, np.bincount(scores["risk"], minlength=3).tolist())),
+        "mean_severity": dict(zip(SYMPTOMS, np.round(batch.ratings.mean(axis=0), 3).tolist())),
+        "active_share": dict(zip(SYMPTOMS, np.round(active.mean(axis=0), 4).tolist())),
+        "high_severity_logs": high_count,
+        "pm25_linked_share": round(int(scores["pm25_linked"].sum()) / high_count, 4) if high_count else None,
+        "heat_linked_share": round(int(scores["heat_linked"].sum()) / high_count, 4) if high_count else None,
+        "active_pairs": [{"symptoms": [a, b], "logs": count} for count, a, b in pairs[:5]],
+    }
+
+
+def columns_payload(scores):
+    """The scores as JSON-ready columns; NaN becomes None."""
+    payload = {}
+    for name, values in scores.items():
+        if name == "risk":
+            payload[name] = np.asarray(RISK_LEVELS, dtype=object)[values].tolist()
+        elif values.dtype.kind == "f":
+            rounded = np.round(values, 3).astype(object)
+            rounded[np.isnan(values)] = None
+            payload[name] = rounded.tolist()
+        else:
+            payload[name] = values.tolist()
+    return payload
+
+
+def rows_payload(scores):
+    columns = columns_payload(scores)
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
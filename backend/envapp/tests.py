@@ -1,6 +1,1497 @@
-from django.urls import path
-from .views import HelloAPI  # or whatever your view is called
+import asyncio
+import csv
+import io
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-urlpatterns = [
-    path('hello/', HelloAPI.as_view()),
-]
+import joblib
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Value
+from django.test import AsyncClient, Client, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .ml_utils import (
+    FEATURE_COLUMNS, ActiveModel, CompiledForest, InferencePool, MicroBatcher, ModelRegistry, ScoreTable,
+    build_feature_frame, compile_pipeline,
+)
+from .events import EventBuffer
+from .models import CardEvent, Characters, InfoCard, Options, Scenes, StoryChoice
+from .indicators import IndicatorStore
+from .ingest import batched, iter_json_array
+from .localities import LOCALITY_CSV, LOCALITY_INDEX, LocalityIndex, build_index, file_sha256
+from .search import match_expression, naive_search_info_cards
+from .serializers import StoryDataSerializer
+from .training import TrainingSet
+from . import db, metrics, related, symptoms, views, weather
+from .views import MODEL_PATH, predict_relevance, predict_relevance_batch, registry
+
+
+def make_card(**kwargs):
+    fields = {
+        "title": "Staying cool",
+        "summary": "Tips for hot days",
+        "source_name": "Test",
+        "source_url": "https://example.org/",
+        "trimester": "2",
+        "age_group": "26–30",
+    }
+    fields.update(kwargs)
+    return InfoCard.objects.create(**fields)
+
+
+class InfoCardScoringTests(TestCase):
+    def setUp(self):
+        self.cards = [
+            make_card(heat_sensitive=True),
+            make_card(pollution_sensitive=True),
+            make_card(heat_sensitive=True, pollution_sensitive=True),
+            make_card(trimester="1", age_group="20-25"),
+        ]
+        self.user_input = {"age_group": "26–30", "trimester": "2", "concern": "heat"}
+
+    def test_batch_matches_per_article_scores(self):
+        batch = predict_relevance_batch(self.user_input, self.cards)
+        single = [predict_relevance(self.user_input, card) for card in self.cards]
+        self.assertEqual(len(batch), len(self.cards))
+        for b, s in zip(batch, single):
+            self.assertAlmostEqual(b, s)
+
+    def test_batch_of_nothing(self):
+        self.assertEqual(predict_relevance_batch(self.user_input, []), [])
+
+    def test_info_cards_are_scored_and_sorted(self):
+        response = self.client.get("/api/info-cards/", {"trimester": "2", "age_range": "26–30"})
+        self.assertEqual(response.status_code, 200)
+        scores = [card["relevance_score"] for card in response.json()]
+        self.assertEqual(len(scores), 3)
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+
+class CompiledForestTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.pipeline = joblib.load(MODEL_PATH)
+        cls.forest = CompiledForest(compile_pipeline(cls.pipeline))
+
+    def test_matches_sklearn_predictions(self):
+        concerns = ["Heatwave", "Air Pollution", "heat", ""]
+        age_groups = ["20-25", "25–29", "26–30", "30-35", "41-45"]
+        for age_group, trimester, concern in itertools.product(age_groups, ["1", "2", "3", "4"], concerns):
+            user_inputs = {"age_group": age_group, "trimester": trimester, "concern": concern}
+            articles = [
+                SimpleNamespace(heat_sensitive=heat, pollution_sensitive=pollution)
+                for heat, pollution in itertools.product([False, True], repeat=2)
+            ]
+            expected = self.pipeline.predict(build_feature_frame(user_inputs, articles))
+            actual = self.forest.predict(user_inputs, articles)
+            for e, a in zip(expected, actual):
+                self.assertAlmostEqual(e, a)
+
+    def test_shipped_artifact_is_current(self):
+        shipped = registry.current().forest
+        user_inputs = {"age_group": "26–30", "trimester": "2", "concern": "Air Pollution"}
+        article = SimpleNamespace(heat_sensitive=False, pollution_sensitive=True)
+        self.assertAlmostEqual(
+            shipped.predict(user_inputs, [article])[0],
+            self.forest.predict(user_inputs, [article])[0],
+        )
+
+    def test_compiled_evaluator_does_not_import_sklearn(self):
+        code = (
+            "import sys\n"
+            "from types import SimpleNamespace\n"
+            "from backend.envapp.ml_utils import CompiledForest\n"
+            f"forest = CompiledForest.load({os.path.join(registry.root, registry.active_version(), 'model.npz')!r})\n"
+            "forest.predict({'trimester': '1'}, [SimpleNamespace(heat_sensitive=True, pollution_sensitive=False)])\n"
+            "assert 'sklearn' not in sys.modules and 'pandas' not in sys.modules\n"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)
+
+
+class ScoreTableTests(TestCase):
+    def setUp(self):
+        self.forest = CompiledForest(compile_pipeline(joblib.load(MODEL_PATH)))
+
+    def test_table_matches_live_inference(self):
+        table = ScoreTable(self.forest)
+        concerns = sorted(table.categories["concern"]) + ["heat", ""]
+        for concern in concerns:
+            for age_group in sorted(table.categories["age_group"]) + ["41-45"]:
+                for heat in (False, True):
+                    article = SimpleNamespace(heat_sensitive=heat, pollution_sensitive=not heat)
+                    user_inputs = {"age_group": age_group, "trimester": "2", "concern": concern}
+                    self.assertAlmostEqual(
+                        table.lookup(table.user_key(user_inputs), article),
+                        self.forest.predict(user_inputs, [article])[0],
+                    )
+
+    def test_batch_is_served_from_table(self):
+        articles = [SimpleNamespace(id=i, heat_sensitive=i % 2 == 0, pollution_sensitive=False) for i in range(4)]
+        user_inputs = {"age_group": "20-25", "trimester": "1", "concern": "Heatwave"}
+        model = registry.current()
+        model.forest.predict = None  # live inference would now fail
+        self.addCleanup(delattr, model.forest, "predict")
+        self.assertNotIn(0, model.predict_batch(user_inputs, articles))
+
+
+class ModelRegistryTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.registry = ModelRegistry(self.root, poll_interval=0)
+
+    def test_loads_lazily_and_records_metadata(self):
+        self.assertIsNone(self.registry.current())
+        version = self.registry.publish(MODEL_PATH, version="v1")
+        model = self.registry.current()
+        self.assertEqual(model.version, version)
+        self.assertEqual(model.metadata["n_estimators"], 100)
+        self.assertEqual(model.metadata["source_sha256"], self.registry.metadata("v1")["source_sha256"])
+
+    def test_swaps_to_newly_activated_version(self):
+        self.registry.publish(MODEL_PATH, version="v1")
+        first = self.registry.current()
+        self.registry.publish(MODEL_PATH, version="v2")
+        self.assertEqual(first.version, "v1")  # in-flight holders keep their model
+        self.assertEqual(self.registry.current().version, "v2")
+        self.registry.activate("v1")
+        self.assertEqual(self.registry.current().version, "v1")
+
+    def test_broken_artifact_keeps_previous_model(self):
+        self.registry.publish(MODEL_PATH, version="v1")
+        self.registry.current()
+        os.makedirs(os.path.join(self.root, "v2"))
+        with open(os.path.join(self.root, "v2", "model.npz"), "wb") as f:
+            f.write(b"not a model")
+        self.registry.activate("v2")
+        self.assertEqual(self.registry.current().version, "v1")
+
+    def test_table_rebuilt_when_artifact_changes(self):
+        self.registry.publish(MODEL_PATH, version="v1")
+        first = self.registry.current()
+        path = os.path.join(self.root, "v1", "model.npz")
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertIsNot(self.registry.current().table, first.table)
+
+    def test_info_cards_report_model_version(self):
+        make_card()
+        response = self.client.get("/api/info-cards/")
+        self.assertEqual(response["X-Model-Version"], registry.active_version())
+
+
+class MicroBatcherTests(TestCase):
+    def setUp(self):
+        self.model = registry.current()
+        self.user_inputs = {"age_group": "20-25", "trimester": "1", "concern": "Heatwave"}
+
+    def articles(self, n):
+        return [SimpleNamespace(id=i, heat_sensitive=i % 2 == 0, pollution_sensitive=i % 3 == 0) for i in range(n)]
+
+    def predict_concurrently(self, batcher, sizes):
+        # The worker starts once every request is queued, so batching does not depend on thread timing
+        model = ActiveModel(self.model.version, self.model.key, self.model.metadata, self.model.forest, batcher)
+        results = {}
+
+        def call(i, size):
+            results[i] = model.predict_live(self.user_inputs, self.articles(size))
+
+        threads = [threading.Thread(target=call, args=(i, size)) for i, size in enumerate(sizes)]
+        with mock.patch.object(batcher, "_ensure_worker"):
+            for thread in threads:
+                thread.start()
+            while batcher._queue.qsize() < len(sizes):
+                time.sleep(0.001)
+        batcher._ensure_worker()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_callers_share_a_batch_and_get_their_own_scores(self):
+        batcher = MicroBatcher(max_batch=1000, max_wait=1.0)
+        sizes = [1, 2, 3, 4, 5, 6]
+        results = self.predict_concurrently(batcher, sizes)
+
+        for i, size in enumerate(sizes):
+            expected = self.model.forest.predict(self.user_inputs, self.articles(size))
+            self.assertEqual(list(results[i]), list(expected))
+        stats = batcher.stats()
+        self.assertEqual(stats["requests"], len(sizes))
+        self.assertEqual(stats["rows"], sum(sizes))
+        self.assertEqual(stats["batches"], 1)
+        self.assertEqual(stats["queue_depth"], 0)
+
+    def test_batch_goes_out_at_max_rows(self):
+        batcher = MicroBatcher(max_batch=4, max_wait=60)
+        started = time.monotonic()
+        self.predict_concurrently(batcher, [4, 4, 4])
+        self.assertLess(time.monotonic() - started, 30)  # never waited for max_wait
+        self.assertEqual(batcher.stats()["batches"], 3)
+        self.assertEqual(batcher.stats()["max_batch_rows"], 4)
+
+    def test_lone_caller_does_not_wait(self):
+        batcher = MicroBatcher(max_batch=1000, max_wait=60)
+        model = ActiveModel(self.model.version, self.model.key, self.model.metadata, self.model.forest, batcher)
+        model.predict_live(self.user_inputs, self.articles(3))
+        self.assertLess(batcher.stats()["max_wait_seconds"], 30)
+
+    def test_errors_reach_every_caller(self):
+        forest = SimpleNamespace(predict_encoded=mock.Mock(side_effect=ValueError("bad batch")))
+        batcher = MicroBatcher(max_batch=1000, max_wait=0.01)
+        with self.assertRaisesMessage(ValueError, "bad batch"):
+            batcher.predict(forest, [[1.0]])
+
+    async def test_inference_pool_calls_share_a_batch(self):
+        # Async views score on inference_pool threads; their live predictions meet in the batcher
+        batcher = MicroBatcher(max_batch=1000, max_wait=1.0)
+        model = ActiveModel(self.model.version, self.model.key, self.model.metadata, self.model.forest, batcher)
+        model.table = None
+        sizes = [1, 2, 3, 4]
+        pool = InferencePool(workers=len(sizes), max_pending=0)
+        with mock.patch.object(batcher, "_ensure_worker"):
+            calls = [asyncio.ensure_future(pool.run(model.predict_batch, self.user_inputs, self.articles(size)))
+                     for size in sizes]
+            while batcher._queue.qsize() < len(sizes):
+                await asyncio.sleep(0.001)
+        batcher._ensure_worker()
+        results = await asyncio.gather(*calls)
+
+        for size, scores in zip(sizes, results):
+            self.assertEqual(scores, [float(s) for s in self.model.forest.predict(self.user_inputs, self.articles(size))])
+        stats = batcher.stats()
+        self.assertEqual((stats["batches"], stats["requests"], stats["rows"]), (1, len(sizes), sum(sizes)))
+        self.assertEqual(stats["mean_batch_rows"], sum(sizes))
+
+    def test_table_misses_go_through_the_batcher(self):
+        batcher = MicroBatcher(max_batch=1000, max_wait=0.01)
+        model = ActiveModel(self.model.version, self.model.key, self.model.metadata, self.model.forest, batcher)
+        model.table = None
+        scores = model.predict_batch(self.user_inputs, self.articles(4))
+        self.assertEqual(scores, [float(s) for s in self.model.forest.predict(self.user_inputs, self.articles(4))])
+        self.assertEqual(batcher.stats()["rows"], 4)
+
+
+class TrainingTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.registry = ModelRegistry(self.root, poll_interval=0)
+        patcher = mock.patch("backend.envapp.management.commands.train_relevance_model.registry", self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def rows(self, n):
+        for i in range(n):
+            yield {
+                "age_group": ["20-25", "26-30", "31-35"][i % 3], "trimester": str(i % 3 + 1),
+                "heat_sensitive": i % 2 == 0, "pollution_sensitive": i % 4 == 0,
+                "concern": ["heat", "pollution", ""][i % 3], "relevance": (i % 10) / 10,
+            }
+
+    def write_csv(self, n):
+        path = os.path.join(self.root, "training.csv")
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FEATURE_COLUMNS + ["relevance"])
+            writer.writeheader()
+            writer.writerows(self.rows(n))
+        return path
+
+    def train(self, *args):
+        call_command(
+            "train_relevance_model", "--n-estimators", "5", "--n-jobs", "1", "--chunk-size", "64", *args,
+            stdout=io.StringIO(),
+        )
+
+    def test_reservoir_keeps_a_fixed_size_sample(self):
+        training_set = TrainingSet(max_rows=50)
+        for chunk in batched(self.rows(1000), 64):
+            training_set.add(chunk)
+        training_set.add([{"age_group": "20-25", "relevance": "n/a"}])
+        self.assertEqual((training_set.rows_read, training_set.skipped, len(training_set)), (1000, 1, 50))
+        self.assertGreater(training_set.columns()["relevance"].std(), 0)
+
+    def test_trains_from_file_and_records_metadata(self):
+        self.train("--input", self.write_csv(300), "--model-version", "v1", "--save-pipeline",
+                   os.path.join(self.root, "model.pkl"))
+        self.assertEqual(self.registry.active_version(), "v1")
+        metadata = self.registry.metadata("v1")
+        self.assertEqual(metadata["training"]["rows_used"], 300)
+        self.assertEqual(metadata["training"]["params"]["n_estimators"], 5)
+        self.assertEqual(metadata["categories"]["concern"], ["", "heat", "pollution"])
+        self.assertGreater(metadata["artifact_bytes"], 0)
+        self.assertGreater(metadata["pipeline_bytes"], 0)
+        self.assertIn("single_row_p99_ms", metadata["latency"])
+
+        # The compiled version agrees with the sklearn Pipeline it came from
+        pipeline = joblib.load(os.path.join(self.root, "model.pkl"))
+        user_inputs = {"age_group": "26-30", "trimester": "2", "concern": "heat"}
+        articles = [SimpleNamespace(heat_sensitive=True, pollution_sensitive=False)]
+        expected = pipeline.predict(build_feature_frame(user_inputs, articles))
+        self.assertAlmostEqual(self.registry.current().predict(user_inputs, articles[0]), expected[0], places=5)
+
+    def test_trains_from_table(self):
+        from django.db import connection
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TABLE training_rows (age_group TEXT, trimester TEXT, heat_sensitive BOOL, "
+                "pollution_sensitive BOOL, concern TEXT, relevance REAL)"
+            )
+            cursor.executemany(
+                "INSERT INTO training_rows VALUES (%s, %s, %s, %s, %s, %s)",
+                [tuple(row.values()) for row in self.rows(200)],
+            )
+        self.train("--table", "training_rows", "--model-version", "v1")
+        self.assertEqual(self.registry.metadata("v1")["training"]["source"], "table:training_rows")
+        with self.assertRaises(CommandError):
+            self.train("--table", "no_such_table")
+
+    def test_too_slow_model_is_not_activated(self):
+        path = self.write_csv(100)
+        self.train("--input", path, "--model-version", "v1")
+        with self.assertRaisesMessage(CommandError, "v2 published but not activated"):
+            self.train("--input", path, "--model-version", "v2", "--max-latency-ms", "0")
+        self.assertEqual(self.registry.active_version(), "v1")
+        self.assertIn("v2", self.registry.versions())
+
+
+class RelatedCardsTests(TestCase):
+    def setUp(self):
+        texts = [
+            ("Heatwave hydration", "Drink water during a heatwave", "Hydration, water and cooling"),
+            ("Hydration in hot weather", "Water tips", "Heatwave water"),
+            ("Air quality and smoke", "Bushfire smoke masks", "Smoke masks and filters"),
+            ("Smoke filters at home", "Air purifier filters for smoke", ""),
+            ("Sleep positions", "Sleeping on your side", "Pillow support"),
+            ("Prenatal vitamins", "Folate and iron", "Folate"),
+        ]
+        self.cards = [make_card(title=title, summary=summary, full_text=full_text)
+                      for title, summary, full_text in texts]
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def ids(self, index, card, limit=5):
+        return [card_id for card_id, _ in index.related(card.id, limit)]
+
+    def test_most_similar_cards_first(self):
+        index = related.build(InfoCard.objects.all())
+        heat, hot, smoke, filters, sleep, _ = self.cards
+        self.assertEqual(self.ids(index, heat, 1), [hot.id])
+        self.assertEqual(self.ids(index, filters, 1), [smoke.id])
+        self.assertEqual(index.related(sleep.id, 5), [])
+        self.assertIsNone(index.related(10**6, 5))
+        similarity = dict(index.related(heat.id, 5))[hot.id]
+        self.assertTrue(0 < similarity <= 1)
+
+    def test_snapshot_is_memory_mapped(self):
+        name = related.build(InfoCard.objects.all()).save(self.root)
+        self.assertEqual(related.current_snapshot(self.root), name)
+        index = related.RelatedIndex.load(os.path.join(self.root, name))
+        self.assertIsInstance(index.ids, np.memmap)
+        self.assertEqual(self.ids(index, self.cards[0], 1), [self.cards[1].id])
+
+    def test_edits_and_new_cards_are_picked_up_incrementally(self):
+        index = related.build(InfoCard.objects.all())
+        heat, hot, smoke, filters, sleep, _ = self.cards
+        sleep.title, sleep.summary = "Smoke and sleep", "Masks and filters at night"
+        sleep.save()
+        added = make_card(title="Hydration and water", summary="Heatwave hydration", full_text="")
+        index.refresh(InfoCard.objects.all())
+        self.assertIn(sleep.id, self.ids(index, smoke))
+        self.assertIn(added.id, self.ids(index, heat))
+        self.assertIn(heat.id, self.ids(index, added))
+
+        # Folding the overlay into a snapshot re-vectorises nothing else and drops deleted cards
+        hot_id = hot.id
+        hot.delete()
+        compacted = index.compacted(InfoCard.objects.values_list("id", flat=True))
+        self.assertEqual(sorted(compacted.ids.tolist()), sorted(card.id for card in InfoCard.objects.all()))
+        self.assertIn(sleep.id, self.ids(compacted, smoke))
+        expected = [(card_id, score) for card_id, score in index.related(heat.id, 10) if card_id != hot_id]
+        self.assertEqual(compacted.related(heat.id, 10), expected)
+
+    def test_related_endpoint(self):
+        store = related.RelatedIndexStore(self.root, poll_interval=0)
+        with mock.patch.object(views, "related_index", store), mock.patch("builtins.print"):
+            heat, hot = self.cards[:2]
+            # Nothing is built on the request path: no snapshot, no related cards
+            response = self.client.get(f"/api/info-cards/{heat.id}/related/")
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response["Retry-After"], "60")
+
+            related.build(InfoCard.objects.all()).save(self.root)
+            response = self.client.get(f"/api/info-cards/{heat.id}/related/", {"limit": 1, "fields": "title,similarity"})
+            self.assertEqual(response.status_code, 200)
+            [result] = response.json()["results"]
+            self.assertEqual(set(result), {"title", "similarity"})
+            self.assertEqual(result["title"], hot.title)
+
+            hot.delete()  # still in the index until the next build, but never returned
+            results = self.client.get(f"/api/info-cards/{heat.id}/related/").json()["results"]
+            self.assertNotIn(hot.title, [card["title"] for card in results])
+            self.assertEqual(self.client.get("/api/info-cards/999999/related/").status_code, 404)
+            self.assertEqual(self.client.get(f"/api/info-cards/{heat.id}/related/", {"limit": 0}).status_code, 400)
+
+    def test_build_related_index_command(self):
+        out = io.StringIO()
+        call_command("build_related_index", output=self.root, queries=10, stdout=out)
+        make_card(title="Hydration", summary="Water in a heatwave")
+        call_command("build_related_index", output=self.root, update=True, queries=10, stdout=out)
+        index = related.RelatedIndex.load(os.path.join(self.root, related.current_snapshot(self.root)))
+        self.assertEqual(len(index), 7)
+        self.assertEqual(len(related.snapshots(self.root)), 2)
+
+
+class SymptomScoreTests(TestCase):
+    def score(self, body):
+        return self.client.post("/api/symptoms/score/", body, content_type="application/json")
+
+    def test_rules_and_trends(self):
+        entries = [
+            {"session": "a", "date": "2026-03-03", "nausea": 1},
+            {"session": "a", "date": "2026-03-01", "headache": 4},
+            {"session": "a", "date": "2026-03-02", "headache": 4, "swelling": 3, "pm25": 20, "notes": "ankles"},
+            {"session": "a", "date": "2026-03-04", "fatigue": 4, "nausea": 3, "temperature": 33},
+            {"session": "b", "date": "2026-03-02", "symptoms": [{"name": "Breathing Issues", "severity": 4}]},
+        ]
+        response = self.score({"window": 2, "entries": entries})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([r["risk"] for r in results], ["low", "elevated", "high", "elevated", "high"])
+        self.assertTrue(results[2]["warning_signs"] and results[2]["pm25_linked"])
+        self.assertTrue(results[3]["heat_linked"])
+        self.assertTrue(results[4]["breathing"])
+        self.assertEqual([r["high_streak"] for r in results], [0, 1, 2, 1, 1])
+        # Mar 3-4 against Mar 1-2 for session a; b has no earlier days
+        self.assertEqual(results[3]["rolling_burden"], 0.667)
+        self.assertEqual(results[3]["trend"], -0.25)
+        self.assertEqual(results[0]["trend"], 0.0)
+        self.assertIsNone(results[4]["trend"])
+        self.assertFalse(any(r["worsening"] for r in results))
+
+        summary = response.json()["summary"]
+        self.assertEqual(summary["sessions"], 2)
+        self.assertEqual(summary["risk"], {"low": 1, "elevated": 2, "high": 2})
+        self.assertEqual(summary["active_pairs"][0]["symptoms"], ["fatigue", "nausea"])
+
+    def test_same_day_logs_continue_streak(self):
+        entries = [
+            {"session": "a", "date": "2026-03-01", "headache": 4},
+            {"session": "a", "date": "2026-03-02", "fatigue": 4},
+            {"session": "a", "date": "2026-03-02", "nausea": 4},
+            {"session": "a", "date": "2026-03-03", "headache": 4},
+            {"session": "a", "date": "2026-03-03", "nausea": 1},
+            {"session": "a", "date": "2026-03-04", "headache": 4},
+        ]
+        results = self.score({"entries": entries}).json()["results"]
+        self.assertEqual([r["high_streak"] for r in results], [1, 2, 2, 3, 0, 1])
+
+    def test_columns_match_entries(self):
+        from .management.commands.bench_symptom_scoring import request_body, synthetic_logs
+
+        batch = synthetic_logs(300, 10, 30)
+        rows = self.score(request_body(batch, 300, columnar=False)).json()
+        columns = self.score(request_body(batch, 300, columnar=True)).json()
+        self.assertEqual(columns["summary"], rows["summary"])
+        self.assertEqual([dict(zip(columns["columns"], values)) for values in zip(*columns["columns"].values())],
+                         rows["results"])
+
+    def test_matches_per_log_reference(self):
+        from .management.commands.bench_symptom_scoring import score_per_log, synthetic_logs
+
+        batch = synthetic_logs(3000, 100, 60, seed=3)
+        for window in (1, 3, 7):
+            scores = symptoms.score(batch, window)
+            risk, worsening, streak = score_per_log(batch, window)
+            self.assertEqual(scores["risk"].tolist(), risk)
+            self.assertEqual(scores["worsening"].tolist(), worsening)
+            self.assertEqual(scores["high_streak"].tolist(), streak)
+            self.assertTrue(any(worsening) and max(streak) > 1)
+
+    def test_invalid_batches(self):
+        entry = {"session": "a", "date": "2026-03-01", "headache": 2}
+        for body in (
+            {}, {"entries": []}, {"entries": [entry], "columns": {}},
+            {"entries": [{**entry, "headache": 6}]}, {"entries": [{**entry, "headache": "2"}]},
+            {"entries": [{**entry, "date": "March 1"}]}, {"entries": [entry], "window": 0},
+            {"columns": {"date": ["2026-03-01"], "headache": [1, 2]}},
+            {"entries": [{**entry, "headache": 259}]}, {"entries": [{**entry, "symptoms": "x"}]},
+            {"entries": [{"session": "a", "headache": 2}]}, {"entries": [{**entry, "date": "NaT"}]},
+            {"entries": [{**entry, "date": 20240101}]}, {"columns": {"date": [20240101]}},
+            {"columns": {"date": ["2026-03-01", ""]}}, {"entries": [{**entry, "pm25": "12"}]},
+        ):
+            self.assertEqual(self.score(body).status_code, 400, body)
+        with override_settings(SYMPTOM_SCORE_MAX_LOGS=1):
+            self.assertEqual(self.score({"entries": [entry, entry]}).status_code, 400)
+        with override_settings(SYMPTOM_SCORE_MAX_BYTES=10):
+            self.assertEqual(self.score({"entries": [entry]}).status_code, 413)
+
+
+class StoryDataTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.character = Characters.objects.create(name="Mia", age="28", location="Melbourne")
+
+    def add_scenes(self, count, options=3, start=0):
+        for i in range(start, start + count):
+            scene = Scenes.objects.create(character=self.character, scene_key=f"s{i}", question=f"Q{i}?")
+            for j in range(options):
+                Options.objects.create(scene=scene, text=f"o{j}", feedback="fb", emotion="calm", correct=j == 0)
+
+    def get(self):
+        return self.client.get("/api/story-data/", {"character_id": self.character.id})
+
+    def test_query_count_does_not_grow_with_scenes(self):
+        self.add_scenes(1)
+        with self.assertNumQueries(4):
+            self.get()
+        self.add_scenes(39, start=1)
+        with self.assertNumQueries(4):
+            response = self.get()
+        self.assertEqual(len(response.json()["scenes"]), 40)
+        self.assertEqual(len(response.json()["scenes"]["s39"]["options"]), 3)
+
+    def test_payload_is_cached(self):
+        self.add_scenes(2)
+        first = self.get().json()
+        with self.assertNumQueries(1):  # only the conditional-GET validators
+            self.assertEqual(self.get().json(), first)
+
+    def test_cache_invalidated_on_writes(self):
+        self.add_scenes(2)
+        self.get()
+        option = Options.objects.filter(scene__scene_key="s1").first()
+        option.text = "changed"
+        option.save()
+        self.assertEqual(self.get().json()["scenes"]["s1"]["options"][0]["text"], "changed")
+
+        Scenes.objects.get(scene_key="s0").delete()
+        self.assertNotIn("s0", self.get().json()["scenes"])
+
+        self.character.name = "Ava"
+        self.character.save()
+        self.assertEqual(self.get().json()["character"]["name"], "Ava")
+
+    def test_missing_character(self):
+        self.assertEqual(self.client.get("/api/story-data/").status_code, 400)
+        self.assertEqual(self.client.get("/api/story-data/", {"character_id": 999}).status_code, 404)
+
+
+class StoryProgressTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.character = Characters.objects.create(name="Mia", age="28", location="Melbourne")
+        self.options = {}
+        for key in ("s0", "s1"):
+            scene = Scenes.objects.create(character=self.character, scene_key=key, question="Q?")
+            self.options[key] = [
+                Options.objects.create(scene=scene, text=f"o{j}", feedback="fb", emotion="calm", correct=j == 0)
+                for j in range(3)
+            ]
+
+    def choose(self, player, option):
+        return self.client.post("/api/story-progress/", {"player": player, "option_id": option.id},
+                                content_type="application/json")
+
+    def stats(self):
+        return self.client.get("/api/story-data/stats/", {"character_id": self.character.id})
+
+    def test_counters_follow_picks(self):
+        first, second, _ = self.options["s0"]
+        self.assertTrue(self.choose("player-one", first).json()["changed"])
+        self.assertTrue(self.choose("player-two", first).json()["changed"])
+        self.assertFalse(self.choose("player-two", first).json()["changed"])  # a retry counts once
+        self.assertTrue(self.choose("player-two", second).json()["changed"])  # a changed mind moves the count
+        self.choose("player-two", self.options["s1"][2])
+
+        with self.assertNumQueries(1):
+            scenes = self.stats().json()["scenes"]
+        self.assertEqual(scenes["s0"]["total"], 2)
+        self.assertEqual(scenes["s0"]["options"][str(first.id)], {"chosen": 1, "percent": 50.0})
+        self.assertEqual(scenes["s0"]["options"][str(second.id)], {"chosen": 1, "percent": 50.0})
+        self.assertEqual(scenes["s1"]["options"][str(self.options["s1"][0].id)], {"chosen": 0, "percent": 0.0})
+        self.assertEqual(StoryChoice.objects.count(), 3)
+
+    def test_progress_resumes_and_resets(self):
+        self.choose("player-one", self.options["s0"][1])
+        self.choose("player-one", self.options["s1"][0])
+        query = {"player": "player-one", "character_id": self.character.id}
+        progress = self.client.get("/api/story-progress/", query).json()
+        self.assertEqual(progress["choices"], {"s0": self.options["s0"][1].id, "s1": self.options["s1"][0].id})
+
+        response = self.client.delete(f"/api/story-progress/?player=player-one&character_id={self.character.id}")
+        self.assertEqual(response.json(), {"cleared": 2})
+        self.assertEqual(self.client.get("/api/story-progress/", query).json()["choices"], {})
+        self.assertEqual(self.stats().json()["scenes"]["s0"]["total"], 0)
+
+    def test_story_payload_carries_option_ids(self):
+        data = self.client.get("/api/story-data/", {"character_id": self.character.id}).json()
+        self.assertEqual([option["id"] for option in data["scenes"]["s0"]["options"]],
+                         [option.id for option in self.options["s0"]])
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.choose("short", self.options["s0"][0]).status_code, 400)
+        self.assertEqual(self.client.post("/api/story-progress/", {"player": "player-one", "option_id": 10**6},
+                                          content_type="application/json").status_code, 404)
+        self.assertEqual(self.client.get("/api/story-data/stats/", {"character_id": 10**6}).status_code, 404)
+        self.assertEqual(self.client.get("/api/story-data/stats/", {"character_id": "x"}).status_code, 400)
+
+
+class StoryLibraryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def add_character(self, name, scenes=3):
+        character = Characters.objects.create(name=name, age="30", location="Sydney")
+        for i in range(scenes):
+            scene = Scenes.objects.create(character=character, scene_key=f"s{i}", question="?")
+            Options.objects.create(scene=scene, text=f"{name} {i}", feedback="fb", emotion="calm", correct=True)
+        return character
+
+    def test_serializer_uses_given_character(self):
+        self.add_character("First")
+        second = self.add_character("Second", scenes=2)
+        data = StoryDataSerializer(second).data
+        self.assertEqual(data["character"]["name"], "Second")
+        self.assertEqual(sorted(data["scenes"]), ["s0", "s1"])
+        self.assertEqual(data["scenes"]["s1"]["options"][0]["text"], "Second 1")
+
+    def test_export_uses_fixed_number_of_queries(self):
+        self.add_character("One")
+        with self.assertNumQueries(3):
+            self.client.get("/api/story-data/all/")
+        cache.clear()
+        for n in range(5):
+            self.add_character(f"Extra {n}")
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/story-data/all/")
+        stories = response.json()
+        self.assertEqual([story["character"]["name"] for story in stories][:2], ["One", "Extra 0"])
+        self.assertEqual(len(stories), 6)
+
+    def test_export_invalidated_on_writes(self):
+        character = self.add_character("One")
+        self.client.get("/api/story-data/all/")
+        character.delete()
+        self.assertEqual(self.client.get("/api/story-data/all/").json(), [])
+
+
+class InfoCardPaginationTests(TestCase):
+    def setUp(self):
+        for i in range(7):
+            make_card(title=f"Card {i}", heat_sensitive=i % 2 == 0, pollution_sensitive=i % 3 == 0)
+
+    def test_pages_match_unpaginated_order(self):
+        everything = self.client.get("/api/info-cards/").json()
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 3}
+            if cursor:
+                params["cursor"] = cursor
+            page = self.client.get("/api/info-cards/", params).json()
+            seen.extend(page["results"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual([card["id"] for card in seen], [card["id"] for card in everything])
+        scores = [card["relevance_score"] for card in seen]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_fields_projection(self):
+        data = self.client.get("/api/info-cards/", {"fields": "id,title,relevance_score"}).json()
+        self.assertEqual(set(data[0]), {"id", "title", "relevance_score"})
+        self.assertEqual(self.client.get("/api/info-cards/", {"fields": "secret"}).status_code, 400)
+
+    def test_streaming_modes(self):
+        expected = self.client.get("/api/info-cards/", {"fields": "id,relevance_score"}).json()
+
+        response = self.client.get("/api/info-cards/", {"fields": "id,relevance_score", "stream": "json"})
+        self.assertEqual(json.loads(b"".join(response.streaming_content)), expected)
+
+        response = self.client.get("/api/info-cards/", {"fields": "id,relevance_score", "stream": "ndjson"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], expected)
+
+    def test_bad_parameters(self):
+        for params in ({"limit": 0}, {"limit": "x"}, {"cursor": "!!"}, {"stream": "xml"}):
+            self.assertEqual(self.client.get("/api/info-cards/", params).status_code, 400)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.character = Characters.objects.create(name="Mia", age="28", location="Melbourne")
+        scene = Scenes.objects.create(character=self.character, scene_key="s0", question="?")
+        self.option = Options.objects.create(scene=scene, text="a", feedback="b", emotion="calm", correct=True)
+        self.card = make_card()
+
+    def test_story_data_not_modified(self):
+        params = {"character_id": self.character.id}
+        first = self.client.get("/api/story-data/", params)
+        self.assertTrue(first["ETag"].startswith('"'))
+        with self.assertNumQueries(1):
+            again = self.client.get("/api/story-data/", params, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again["ETag"], first["ETag"])
+
+        since = self.client.get("/api/story-data/", params, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(since.status_code, 304)
+
+        self.option.delete()
+        changed = self.client.get("/api/story-data/", params, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], first["ETag"])
+
+    def test_story_cache_is_checked_against_validators(self):
+        params = {"character_id": self.character.id}
+        first = self.client.get("/api/story-data/", params)
+        # A write this process never hears about, as from another worker: update() sends no signals
+        Scenes.objects.filter(character=self.character).update(question="Changed?", updated_at=timezone.now())
+        for path in ("/api/story-data/", "/api/async/story-data/"):
+            response = self.client.get(path, params)
+            self.assertNotEqual(response["ETag"], first["ETag"])
+            self.assertEqual(response.json()["scenes"]["s0"]["question"], "Changed?")
+
+    def test_info_cards_not_modified(self):
+        first = self.client.get("/api/info-cards/", {"trimester": "2"})
+        with self.assertNumQueries(0):  # validators come from the response cache
+            again = self.client.get("/api/info-cards/", {"trimester": "2"}, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+        other = self.client.get("/api/info-cards/", {"trimester": "3"}, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(other.status_code, 200)
+
+        self.card.title = "Updated"
+        self.card.save()
+        changed = self.client.get("/api/info-cards/", {"trimester": "2"}, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.status_code, 200)
+
+    def test_info_cards_etag_tracks_model_version(self):
+        first = self.client.get("/api/info-cards/")
+        model = registry.current()
+        original = model.version
+        model.version = "other"
+        self.addCleanup(setattr, model, "version", original)
+        again = self.client.get("/api/info-cards/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(again.status_code, 200)
+
+
+class InfoCardCacheTests(TestCase):
+    def setUp(self):
+        caches["info_cards"].clear()
+        make_card(title="Hyphen", age_group="26-30", heat_sensitive=True)
+        make_card(title="En dash", age_group="26–30", heat_sensitive=True)
+        make_card(title="Other", age_group="31-35", heat_sensitive=True)
+
+    def get(self, **params):
+        return self.client.get("/api/info-cards/", params)
+
+    def test_equivalent_queries_share_an_entry(self):
+        first = self.get(trimester="2", age_range="26–30", concern="Heat")
+        self.assertEqual(first["X-Cache"], "miss")
+        self.assertEqual(sorted(card["title"] for card in first.json()), ["En dash", "Hyphen"])
+
+        before = metrics.cache_lookups.value(cache="info_cards", result="hit")
+        with self.assertNumQueries(0):
+            second = self.get(trimester=" 2", age_range="26 - 30", concern="heat ")
+        self.assertEqual(second["X-Cache"], "hit")
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(metrics.cache_lookups.value(cache="info_cards", result="hit"), before + 1)
+
+    def test_writes_invalidate(self):
+        self.get(age_range="26-30")
+        make_card(title="New", age_group="26-30")
+        response = self.get(age_range="26-30")
+        self.assertEqual(response["X-Cache"], "miss")
+        self.assertIn("New", [card["title"] for card in response.json()])
+
+    def test_model_swap_invalidates(self):
+        self.get()
+        model = registry.current()
+        original = model.version
+        model.version = "other"
+        self.addCleanup(setattr, model, "version", original)
+        self.assertEqual(self.get()["X-Cache"], "miss")
+
+    def test_streams_are_not_cached(self):
+        response = self.get(stream="ndjson")
+        self.assertNotIn("X-Cache", response)
+
+
+class InfoCardSearchTests(TestCase):
+    def setUp(self):
+        self.heat = make_card(title="Heatwave safety", summary="Stay cool and hydrated", full_text="Drink water.")
+        self.smoke = make_card(title="Bushfire smoke", summary="Air quality advice", full_text="Stay indoors during heat.")
+        for i in range(5):
+            make_card(title=f"Sleep {i}", summary="Resting well", full_text="Naps help.")
+
+    def search(self, **params):
+        return self.client.get("/api/info-cards/search/", params)
+
+    def test_ranks_title_matches_first(self):
+        results = self.search(q="heat").json()["results"]
+        self.assertEqual([card["id"] for card in results], [self.heat.id, self.smoke.id])
+        self.assertGreater(results[0]["search_rank"], results[1]["search_rank"])
+
+    def test_index_follows_writes(self):
+        self.smoke.full_text = "Stay indoors."
+        self.smoke.save()
+        self.heat.delete()
+        self.assertEqual(self.search(q="heat").json()["results"], [])
+        make_card(title="Heat rash")
+        self.assertEqual(len(self.search(q="heat").json()["results"]), 1)
+
+    def test_card_deleted_after_the_search_is_skipped(self):
+        search = views.search_info_cards if views.fts_available() else views.naive_search_info_cards
+        ranked = lambda *args: [(10 ** 6, 1.0)] + search(*args)  # a hit whose card is gone by the fetch
+        with mock.patch.object(views, search.__name__, ranked):
+            results = self.search(q="heat").json()["results"]
+        self.assertEqual([card["id"] for card in results], [self.heat.id, self.smoke.id])
+
+    def test_pagination_and_projection(self):
+        page = self.search(q="stay", limit=1, fields="id,search_rank").json()
+        self.assertEqual(set(page["results"][0]), {"id", "search_rank"})
+        self.assertEqual(page["next_offset"], 1)
+        rest = self.search(q="stay", limit=1, offset=1).json()
+        self.assertIsNone(rest["next_offset"])
+
+    def test_user_input_cannot_inject_fts_syntax(self):
+        self.assertEqual(match_expression('heat" OR *'), '"heat" "or"*')
+        self.assertEqual(self.search(q='heat" NEAR(').status_code, 200)
+        self.assertEqual(self.search(q="...").json()["results"], [])
+        self.assertEqual(self.search().status_code, 400)
+
+    def test_naive_fallback_finds_same_cards(self):
+        queryset = InfoCard.objects.annotate(relevance_score=Value(0.0))
+        ids = {card_id for card_id, _ in naive_search_info_cards(queryset, "heat", 10, 0)}
+        self.assertEqual(ids, {self.heat.id, self.smoke.id})
+
+
+class IngestContentTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp, name)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def ingest(self, path, kind, **options):
+        call_command("ingest_content", path, kind=kind, batch_size=2, stdout=io.StringIO(), **options)
+
+    def cards(self, n):
+        return [
+            {
+                "title": f"Card {i}", "summary": "s", "full_text": "f", "source_name": "n",
+                "source_url": f"https://example.org/{i}", "trimester": 2, "age_group": "26–30",
+                "heat_sensitive": i % 2 == 0, "pollution_sensitive": False,
+            }
+            for i in range(n)
+        ]
+
+    def test_json_array_is_streamed(self):
+        data = [{"a": i, "b": [1, {"c": "x]y"}]} for i in range(50)] + [1, 2.5, None]
+        self.assertEqual(list(iter_json_array(io.StringIO(json.dumps(data)), chunk_size=5)), data)
+
+    def test_info_cards_from_each_format_are_upserted(self):
+        cards = self.cards(5)
+        csv_text = io.StringIO()
+        writer = csv.DictWriter(csv_text, fieldnames=list(cards[0]))
+        writer.writeheader()
+        writer.writerows(cards)
+        paths = [
+            self.write("cards.json", json.dumps(cards)),
+            self.write("cards.ndjson", "\n".join(json.dumps(card) for card in cards)),
+            self.write("cards.csv", csv_text.getvalue()),
+        ]
+        for path in paths:
+            self.ingest(path, "infocards")
+        self.assertEqual(InfoCard.objects.count(), 5)
+        self.assertEqual(InfoCard.objects.filter(heat_sensitive=True).count(), 3)
+
+        cards[0]["title"] = "Renamed"
+        self.ingest(self.write("update.json", json.dumps(cards[:1])), "infocards")
+        self.assertEqual(InfoCard.objects.get(source_url="https://example.org/0").title, "Renamed")
+        self.assertEqual(InfoCard.objects.count(), 5)
+
+    def test_stories_map_to_story_models(self):
+        stories = [{
+            "characterId": 7, "character": "Sarah", "trimester": "28 weeks", "location": "Western Sydney",
+            "scenes": [
+                {"id": "scene1", "title": "Morning", "text": "You wake up.", "choices": [
+                    {"label": "Open windows", "consequence": "Smoke enters.", "babyStatus": "yellow"},
+                    {"label": "Use a fan", "consequence": "You feel calm.", "babyStatus": "green"},
+                ]},
+                {"id": "scene2", "text": "Lunch.", "choices": [
+                    {"label": "Go out", "consequence": "Hot.", "babyStatus": "red"},
+                ]},
+            ],
+        }]
+        path = self.write("stories.json", json.dumps(stories))
+        self.ingest(path, "stories")
+        option_ids = set(Options.objects.values_list("id", flat=True))
+
+        stories[0]["scenes"][0]["choices"][0]["consequence"] = "Smoke fills the room."
+        self.ingest(self.write("stories2.json", json.dumps(stories)), "stories")
+
+        data = self.client.get("/api/story-data/", {"character_id": 7}).json()
+        self.assertEqual(data["character"], {"name": "Sarah", "age": "28 weeks", "location": "Western Sydney"})
+        scene = data["scenes"]["scene1"]
+        self.assertEqual(scene["question"], "You wake up.")
+        self.assertEqual(scene["options"][0]["feedback"], "Smoke fills the room.")
+        self.assertEqual([option["correct"] for option in scene["options"]], [False, True])
+        self.assertEqual(set(Options.objects.values_list("id", flat=True)), option_ids)
+
+        # Unchanged content writes nothing, so validators stay put
+        etag = self.client.get("/api/story-data/", {"character_id": 7})["ETag"]
+        self.ingest(self.write("stories3.json", json.dumps(stories)), "stories")
+        self.assertEqual(self.client.get("/api/story-data/", {"character_id": 7})["ETag"], etag)
+
+        # A relabelled choice keeps its option; a dropped one is deleted
+        first, second = Options.objects.filter(scene__scene_key="scene1").order_by("id")
+        stories[0]["scenes"][0]["choices"] = [{**stories[0]["scenes"][0]["choices"][0], "label": "Open a window"}]
+        self.ingest(self.write("stories4.json", json.dumps(stories)), "stories")
+        options = list(Options.objects.filter(scene__scene_key="scene1").values_list("id", "text"))
+        self.assertEqual(options, [(first.id, "Open a window")])
+        self.assertFalse(Options.objects.filter(id=second.id).exists())
+
+    def test_story_csv_rows_are_grouped(self):
+        rows = [
+            "characterId,character,trimester,location,scene_id,scene_text,label,consequence,babyStatus",
+            "3,Mei,Third Trimester,Canberra,scene1,AQI is 180.,Walk,Coughing.,red",
+            "3,Mei,Third Trimester,Canberra,scene1,AQI is 180.,Reschedule,Safe.,green",
+        ]
+        self.ingest(self.write("stories.csv", "\n".join(rows)), "stories")
+        self.assertEqual(Scenes.objects.get(character_id=3).options_set.count(), 2)
+
+
+class StubWeatherUpstream:
+    """OpenWeatherMap stand-in on a local port that records every request."""
+
+    def __init__(self):
+        self.requests = []
+        self.delay = 0
+        self.fail = False
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                stub.requests.append((url.path, {k: v[0] for k, v in parse_qs(url.query).items()}))
+                time.sleep(stub.delay)
+                if stub.fail:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                body = json.dumps({"path": url.path, "served": len(stub.requests)}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class BenchmarkToolTests(TransactionTestCase):
+    def test_seed_bench_data(self):
+        out = io.StringIO()
+        call_command("seed_bench_data", characters=2, scenes=3, options=2, cards=5, stdout=out)
+        self.assertEqual(Characters.objects.count(), 2)
+        self.assertEqual(Scenes.objects.count(), 6)
+        self.assertEqual(Options.objects.filter(correct=True).count(), 6)
+        self.assertEqual(InfoCard.objects.count(), 5)
+
+        make_card()
+        call_command("seed_bench_data", characters=1, scenes=1, options=1, cards=1, clear=True, stdout=out)
+        self.assertEqual(Characters.objects.count(), 1)
+        self.assertEqual(InfoCard.objects.count(), 2)  # the card not made by the benchmark stays
+
+    def test_load_run_counts_requests_and_queries(self):
+        from .management.commands.bench_api import InProcessTarget, request_paths, run_load
+
+        character = Characters.objects.create(name="Mia", age="28", location="Melbourne")
+        paths = request_paths("story-data", [character.id], 6, seed=0)
+        self.assertEqual(paths, request_paths("story-data", [character.id], 6, seed=0))
+
+        target = InProcessTarget()
+        try:
+            result = run_load(target, paths, concurrency=1)
+        finally:
+            target.close()
+        self.assertEqual(result["requests"], 6)
+        self.assertEqual(result["errors"], 0)
+        self.assertGreater(result["queries_per_request"], 0)
+        self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        caches["info_cards"].clear()
+        for i in range(3):
+            make_card(title=f"Card {i}", heat_sensitive=i % 2 == 0)
+
+    def timing_entries(self, response):
+        return [entry.split(";")[0] for entry in response["Server-Timing"].split(", ")]
+
+    def test_server_timing_breaks_down_the_request(self):
+        response = self.client.get("/api/info-cards/")
+        for entry in ("db", "inference", "serialize", "render", "cache", "total"):
+            self.assertIn(entry, self.timing_entries(response))
+        self.assertIn('desc="2 queries"', response["Server-Timing"])
+        self.assertIn('cache;desc="info_cards miss"', response["Server-Timing"])
+
+        response = self.client.get("/api/info-cards/")
+        self.assertIn('cache;desc="info_cards hit"', response["Server-Timing"])
+        self.assertNotIn("db", self.timing_entries(response))
+
+    def test_async_views_are_timed(self):
+        response = self.client.get("/api/async/info-cards/")
+        for entry in ("db", "inference", "serialize", "total"):
+            self.assertIn(entry, self.timing_entries(response))
+
+    def test_metrics_endpoint(self):
+        before = metrics.request_duration.count(route="api/info-cards/", method="GET", status="200")
+        self.client.get("/api/info-cards/")
+        self.assertEqual(
+            metrics.request_duration.count(route="api/info-cards/", method="GET", status="200"), before + 1,
+        )
+
+        response = self.client.get("/api/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = response.content.decode()
+        self.assertIn('envapp_request_phase_seconds_bucket{route="api/info-cards/",phase="inference",le="+Inf"}', body)
+        self.assertIn('envapp_cache_lookups_total{cache="info_cards",result="miss"}', body)
+        self.assertIn("envapp_inference_queue_depth 0", body)
+        self.assertIn("envapp_events_pending ", body)
+
+        with override_settings(METRICS_TOKEN="secret"):
+            self.assertEqual(self.client.get("/api/metrics").status_code, 403)
+            self.assertEqual(self.client.get("/api/metrics", HTTP_AUTHORIZATION="Bearer secret").status_code, 200)
+
+    def test_disabled(self):
+        with override_settings(METRICS_ENABLED=False):
+            response = Client().get("/api/info-cards/")
+        self.assertNotIn("Server-Timing", response)
+
+    def test_histogram_exposition(self):
+        histogram = metrics.Histogram("h", "Help.", buckets=(1, 5), labels=("route",))
+        for value in (0.5, 3, 3, 9):
+            histogram.observe(value, route='a"b')
+        self.assertEqual(histogram.render()[2:], [
+            'h_bucket{route="a\\"b",le="1"} 1',
+            'h_bucket{route="a\\"b",le="5"} 3',
+            'h_bucket{route="a\\"b",le="+Inf"} 4',
+            'h_sum{route="a\\"b"} 15.5',
+            'h_count{route="a\\"b"} 4',
+        ])
+
+
+class EventCaptureTests(TransactionTestCase):
+    def setUp(self):
+        # A flush interval no test waits out, so rows are written only when a test says so
+        self.buffer = EventBuffer(CardEvent, max_size=10, batch_size=4, flush_interval=60, block_timeout=0.01)
+        self.addCleanup(self.buffer.close)
+        patcher = mock.patch.object(views, "event_buffer", self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, body):
+        return Client().post("/api/events/", body, content_type="application/json")
+
+    def events(self, n, kind="impression"):
+        return [CardEvent(kind=kind, card_id=i + 1, created_at=timezone.now()) for i in range(n)]
+
+    def test_capture_is_buffered_then_written_in_batches(self):
+        response = self.post({
+            "age_group": "26\u201330", "trimester": "2", "concern": "heat", "model_version": "v1",
+            "events": [{"type": "impression", "card": 3, "position": 0}, {"type": "click", "card": 3,
+                                                                            "session": "s1"}],
+        })
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json(), {"accepted": 2})
+        self.assertEqual((CardEvent.objects.count(), len(self.buffer)), (0, 2))
+
+        self.assertTrue(self.buffer.flush())
+        click = CardEvent.objects.get(kind="click")
+        self.assertEqual((click.card_id, click.age_group, click.session, click.position), (3, "26-30", "s1", None))
+        self.assertEqual(self.buffer.stats()["written"], 2)
+
+    def test_invalid_events_are_rejected(self):
+        for body in [{}, {"events": []}, {"events": [{"type": "view", "card": 1}]},
+                     {"events": [{"type": "click", "card": "1"}]}, {"events": [{"type": "click", "card": 1}],
+                                                                    "concern": "x" * 51}]:
+            self.assertEqual(self.post(body).status_code, 400, body)
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_full_buffer_pushes_back(self):
+        with mock.patch.object(CardEvent.objects, "bulk_create", side_effect=RuntimeError("database down")), \
+                mock.patch("builtins.print"):
+            self.buffer.add(self.events(10))
+            response = self.post({"events": [{"type": "click", "card": 1}]})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(self.buffer.stats()["rejected"], 1)
+
+        self.assertTrue(self.buffer.flush())
+        self.assertEqual(self.post({"events": [{"type": "click", "card": 1}]}).status_code, 202)
+
+    def test_failed_write_keeps_events_for_retry(self):
+        self.buffer.add(self.events(3))
+        with mock.patch.object(CardEvent.objects, "bulk_create", side_effect=RuntimeError("database down")), \
+                mock.patch("builtins.print"):
+            self.assertFalse(self.buffer.flush())
+        self.assertEqual((len(self.buffer), self.buffer.stats()["failures"]), (3, 1))
+        self.assertTrue(self.buffer.flush())
+        self.assertEqual(CardEvent.objects.count(), 3)
+
+    def test_refused_rows_are_dropped_not_retried(self):
+        self.assertEqual(self.post({"events": [{"type": "click", "card": 10 ** 30}]}).status_code, 400)
+        self.assertEqual(self.post({"events": [{"type": "click", "card": 1, "position": 2 ** 31}]}).status_code, 400)
+
+        # Rows that slip past validation: one the database cannot store, among good ones
+        rows = self.events(5)
+        rows[2].card_id = 10 ** 30
+        self.buffer.add(rows)
+        with mock.patch("builtins.print"):
+            self.assertTrue(self.buffer.flush())
+        self.assertEqual(sorted(CardEvent.objects.values_list("card_id", flat=True)), [1, 2, 4, 5])
+        stats = self.buffer.stats()
+        self.assertEqual((stats["written"], stats["dropped"], stats["pending"]), (4, 1, 0))
+
+    def wait_for_rows(self, n):
+        deadline = time.monotonic() + 5
+        while CardEvent.objects.count() < n and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return CardEvent.objects.count()
+
+    def test_flusher_writes_on_size_and_on_time(self):
+        self.buffer.add(self.events(3))
+        time.sleep(0.05)
+        self.assertEqual(CardEvent.objects.count(), 0)  # under a batch, and the interval has not passed
+        self.buffer.add(self.events(2))
+        self.assertEqual(self.wait_for_rows(5), 5)
+        self.assertEqual(self.buffer.stats()["batches"], 2)
+
+        self.buffer.flush_interval = 0.05
+        self.buffer.add(self.events(1))
+        self.assertEqual(self.wait_for_rows(6), 6)
+
+    def test_close_writes_pending_and_later_events(self):
+        self.buffer.add(self.events(3))
+        self.assertTrue(self.buffer.close())
+        self.assertEqual(CardEvent.objects.count(), 3)
+        self.buffer.add(self.events(2, kind="click"))
+        self.assertEqual(CardEvent.objects.filter(kind="click").count(), 2)
+
+
+class DatabaseConfigTests(TestCase):
+    def test_sqlite_pragmas_applied_to_new_connections(self):
+        from django.db import connection
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+
+        path = os.path.join(tempfile.mkdtemp(), "pragmas.sqlite3")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        wrapper = DatabaseWrapper({**connection.settings_dict, "NAME": path}, alias="pragmas")
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        pragma = lambda name: wrapper.connection.execute(f"PRAGMA {name}").fetchone()[0]
+        self.assertEqual(pragma("journal_mode"), "wal")
+        self.assertEqual(pragma("synchronous"), 1)  # NORMAL
+        self.assertEqual(pragma("mmap_size"), settings.SQLITE_PRAGMAS["mmap_size"])
+        self.assertEqual(pragma("cache_size"), settings.SQLITE_PRAGMAS["cache_size"])
+
+    def test_router_reads_from_replica_until_the_request_writes(self):
+        router = db.PrimaryReplicaRouter()
+        self.addCleanup(db.reset_read_your_writes)
+        with mock.patch.object(db, "connections", {"default": None, "replica": None}):
+            db.reset_read_your_writes()
+            self.assertEqual(router.db_for_read(InfoCard), "replica")
+            self.assertEqual(router.db_for_write(InfoCard), "default")
+            self.assertEqual(router.db_for_read(InfoCard), "default")
+            db.reset_read_your_writes()
+            self.assertEqual(router.db_for_read(InfoCard), "replica")
+
+            card = InfoCard(title="x")
+            card._state.db = "default"
+            self.assertEqual(router.db_for_read(Scenes, instance=card), "default")
+        self.assertEqual(router.db_for_read(InfoCard), "default")  # no replica configured
+        self.assertTrue(router.allow_migrate("default", "envapp"))
+        self.assertFalse(router.allow_migrate("replica", "envapp"))
+
+
+class WeatherProxyTests(TestCase):
+    def setUp(self):
+        self.upstream = StubWeatherUpstream()
+        self.addCleanup(self.upstream.close)
+        settings_override = override_settings(OPENWEATHER_BASE_URL=self.upstream.url, OPENWEATHER_API_KEY="secret")
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        caches[weather.WEATHER_CACHE].clear()
+
+    def test_repeat_lookup_is_served_from_cache(self):
+        first = self.client.get("/api/weather/air-pollution/", {"lat": "-37.8136", "lon": "144.9631"})
+        second = self.client.get("/api/weather/air-pollution/", {"lat": "-37.8141", "lon": "144.9629"})
+
+        self.assertEqual(first["X-Cache"], "miss")
+        self.assertEqual(second["X-Cache"], "hit")
+        self.assertEqual(second.json(), first.json())
+        self.assertIn("max-age=", second["Cache-Control"])
+        path, params = self.upstream.requests[0]
+        self.assertEqual(len(self.upstream.requests), 1)
+        self.assertEqual(path, "/data/2.5/air_pollution")
+        self.assertEqual(params, {"lat": "-37.81", "lon": "144.96", "appid": "secret"})
+        self.assertNotIn("secret", first.content.decode())
+
+    def test_place_names_are_normalized(self):
+        self.client.get("/api/weather/geocode/", {"q": "  Melbourne ,  AU", "limit": "1"})
+        response = self.client.get("/api/weather/geocode/", {"q": "melbourne,au", "limit": "1"})
+
+        self.assertEqual(response["X-Cache"], "hit")
+        self.assertEqual(self.upstream.requests, [("/geo/1.0/direct", {"q": "melbourne,au", "limit": "1", "appid": "secret"})])
+
+    def test_bad_parameters_are_rejected(self):
+        self.assertEqual(self.client.get("/api/weather/current/", {"lat": "-37.8"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/weather/current/", {"lat": "95", "lon": "0"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/weather/geocode/", {"q": " , "}).status_code, 400)
+        self.assertEqual(self.upstream.requests, [])
+
+    def test_concurrent_misses_share_one_upstream_call(self):
+        self.upstream.delay = 0.2
+        params = {"lat": -33.87, "lon": 151.21, "units": "metric"}
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(weather.fetch("weather", params)[0]))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.upstream.requests), 1)
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(result == results[0] for result in results))
+
+    def make_stale(self, name, params):
+        key = weather.cache_key(name, params)
+        entry = caches[weather.WEATHER_CACHE].get(key)
+        entry["fetched"] -= weather.ENDPOINTS[name]["fresh"] + 1
+        caches[weather.WEATHER_CACHE].set(key, entry)
+        return entry
+
+    def test_stale_entry_is_served_while_refreshing(self):
+        params = {"lat": -33.87, "lon": 151.21}
+        weather.fetch("air_pollution", params)
+        stale = self.make_stale("air_pollution", params)
+        key = weather.cache_key("air_pollution", params)
+
+        data, state, _ = weather.fetch("air_pollution", params)
+        self.assertEqual((data, state), (stale["data"], "stale"))
+        weather.refresh_in_background("air_pollution", key, params, stale).result()
+
+        data, state, _ = weather.fetch("air_pollution", params)
+        self.assertEqual(state, "hit")
+        self.assertEqual(data["served"], 2)
+
+    def test_stale_entry_survives_upstream_failure(self):
+        weather.fetch("air_pollution", {"lat": 1.0, "lon": 2.0})
+        stale = self.make_stale("air_pollution", {"lat": 1.0, "lon": 2.0})
+        self.upstream.fail = True
+
+        response = self.client.get("/api/weather/air-pollution/", {"lat": "1", "lon": "2"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Cache"], "stale")
+        self.assertEqual(response.json(), stale["data"])
+
+        # Once a refresh has failed, further requests back off instead of retrying
+        key = weather.cache_key("air_pollution", {"lat": 1.0, "lon": 2.0})
+        weather.refresh_in_background("air_pollution", key, {"lat": 1.0, "lon": 2.0}, stale).result()
+        attempts = len(self.upstream.requests)
+        self.client.get("/api/weather/air-pollution/", {"lat": "1", "lon": "2"})
+        self.assertEqual(len(self.upstream.requests), attempts)
+
+        missing = self.client.get("/api/weather/air-pollution/", {"lat": "3", "lon": "4"})
+        self.assertEqual(missing.status_code, 502)
+
+
+class LocalityIndexTests(TestCase):
+    localities = [
+        {"name": "Richmond", "state": "VIC", "lat": -37.82, "lon": 145.0},
+        {"name": "St Kilda", "state": "VIC", "lat": -37.86, "lon": 144.98},
+        {"name": "Richmond", "state": "TAS", "lat": -42.74, "lon": 147.44},
+        {"name": "Rich Hill", "state": "NSW", "lat": -33.0, "lon": 151.0},
+        {"name": "Richmond Hill", "state": "NSW", "lat": -33.1, "lon": 151.1},
+    ]
+
+    def setUp(self):
+        self.index = LocalityIndex(build_index(self.localities))
+
+    def displays(self, query, **kwargs):
+        return [result["display"] for result in self.index.search(query, **kwargs)]
+
+    def test_exact_names_rank_before_prefixes(self):
+        self.assertEqual(self.displays("richmond"), ["Richmond, VIC", "Richmond, TAS", "Richmond Hill, NSW"])
+        self.assertEqual(self.displays("Rich", limit=2), ["Richmond, VIC", "Richmond, TAS"])
+
+    def test_later_words_and_state_suffix(self):
+        self.assertEqual(self.displays("kil"), ["St Kilda, VIC"])
+        self.assertEqual(self.displays("st. kilda"), ["St Kilda, VIC"])
+        self.assertEqual(self.displays("hill"), ["Rich Hill, NSW", "Richmond Hill, NSW"])
+        self.assertEqual(self.displays("richmond, tas"), ["Richmond, TAS"])
+        self.assertEqual(self.displays("richmond, tasmania"), ["Richmond, TAS"])
+        self.assertEqual(self.displays(" , vic"), [])
+
+    def test_bundled_index_is_current_and_mappable(self):
+        index = LocalityIndex.load(LOCALITY_INDEX)
+        self.assertEqual(index.header["source_sha256"], file_sha256(LOCALITY_CSV))
+        melbourne = index.search("melbourne", limit=1)[0]
+        self.assertEqual((melbourne["state"], melbourne["lat"], melbourne["lon"]), ("VIC", -37.81, 144.96))
+
+    def test_endpoint(self):
+        response = self.client.get("/api/localities/", {"q": "Melb", "limit": "3"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]["display"], "Melbourne, VIC")
+        self.assertLessEqual(len(response.json()), 3)
+        self.assertEqual(self.client.get("/api/localities/", {"q": "Melb", "limit": "x"}).status_code, 400)
+
+
+class IndicatorTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.store = IndicatorStore(self.directory)
+
+    def write(self, name, text):
+        with open(os.path.join(self.directory, name), "w") as f:
+            f.write(text)
+
+    def test_new_csv_becomes_an_indicator(self):
+        self.assertEqual(self.store.indicators(), {})
+        self.write("anaemia.csv", "year,State,Value,Note\n2020,Vic,10,a\n2020,Vic,99,dup\n2021,Vic,12,\n"
+                                  "2020,Total,8,\n2021,Total,9,\n2021,NSW,,\n")
+        anaemia = self.store.get("anaemia")
+
+        self.assertEqual(anaemia.states, ["NSW", "Vic", "Total"])
+        self.assertEqual(anaemia.series(["vic"])["series"], {"Vic": [10.0, 12.0]})
+        self.assertEqual(anaemia.series(year_from=2021)["series"], {"NSW": [None], "Vic": [12.0], "Total": [9.0]})
+        self.assertEqual(anaemia.year_over_year(["Vic"])["deltas"], {"Vic": [2.0]})
+        self.assertEqual(anaemia.trends["Vic"]["slope"], 2.0)
+        self.assertEqual(anaemia.trends["NSW"], None)
+        self.assertEqual(anaemia.compare_national(2020)["states"], {"Vic": {"percent": 10.0, "difference": 2.0, "ratio": 1.25}})
+        with self.assertRaises(ValueError):
+            anaemia.series(["Qld"])
+
+    def test_malformed_csv_is_skipped(self):
+        self.write("anaemia.csv", "year,State,Value\n2020,Vic,10\n")
+        for name, text in (("broken.csv", "year,State,Value\n2020,Vic,lots\n"), ("short.csv", "year,State,Value\n2020\n"),
+                           ("empty.csv", ""), ("nocolumns.csv", "a,b\n1,2\n"),
+                           ("headeronly.csv", "year,State,Value\n")):
+            self.write(name, text)
+        with mock.patch("builtins.print") as printed:
+            self.assertEqual(list(self.store.indicators()), ["anaemia"])
+        self.assertEqual(printed.call_count, 5)
+
+    def test_endpoints(self):
+        series = self.client.get("/api/indicators/gestational_diabetes/", {"state": "NSW,Total", "from": "2021"})
+        self.assertEqual(series.json(), {
+            "indicator": "gestational_diabetes", "years": [2021, 2022],
+            "series": {"NSW": [14.8, 16.2], "Total": [15.2, 17.2]},
+        })
+        national = self.client.get("/api/indicators/gestational_diabetes/national/").json()
+        self.assertEqual((national["year"], national["national"]), (2022, 17.2))
+        self.assertEqual(national["states"]["NSW"]["difference"], -1.0)
+        trends = self.client.get("/api/indicators/gestational_hypertension/trends/", {"state": "Total"}).json()
+        self.assertEqual(list(trends["trends"]), ["Total"])
+        self.assertIn("gestational_hypertension", [i["name"] for i in self.client.get("/api/indicators/").json()])
+
+        self.assertEqual(self.client.get("/api/indicators/unknown/").status_code, 404)
+        self.assertEqual(self.client.get("/api/indicators/gestational_diabetes/", {"state": "XX"}).status_code, 400)
+        etag = series["ETag"]
+        cached = self.client.get(
+            "/api/indicators/gestational_diabetes/", {"state": "NSW,Total", "from": "2021"}, HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(cached.status_code, 304)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches["info_cards"].clear()
+        self.character = Characters.objects.create(name="Mia", age="28", location="Melbourne")
+        for i in range(3):
+            scene = Scenes.objects.create(character=self.character, scene_key=f"s{i}", question=f"Q{i}?")
+            Options.objects.create(scene=scene, text="a", feedback="b", emotion="calm", correct=True)
+        for i in range(5):
+            make_card(title=f"Card {i}", heat_sensitive=i % 2 == 0, pollution_sensitive=i % 3 == 0)
+
+    def test_story_data_matches_sync_view(self):
+        params = {"character_id": self.character.id}
+        expected = self.client.get("/api/story-data/", params)
+        cache.clear()
+        response = self.client.get("/api/async/story-data/", params)
+
+        self.assertEqual(response.json(), expected.json())
+        self.assertEqual(response["ETag"], expected["ETag"])
+        self.assertEqual(self.client.get("/api/async/story-data/", params, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        self.assertEqual(self.client.get("/api/async/story-data/", {"character_id": 999}).status_code, 404)
+
+    def test_info_cards_match_sync_view(self):
+        for params in ({}, {"limit": 2}, {"concern": "heat", "fields": "id,relevance_score"}):
+            expected = self.client.get("/api/info-cards/", params).json()
+            caches["info_cards"].clear()
+            response = self.client.get("/api/async/info-cards/", params)
+            self.assertEqual(response.json(), expected)
+            self.assertEqual(response["X-Cache"], "miss")
+            self.assertEqual(self.client.get("/api/async/info-cards/", params)["X-Cache"], "hit")
+
+        page = self.client.get("/api/async/info-cards/", {"limit": 2}).json()
+        rest = self.client.get("/api/async/info-cards/", {"limit": 10, "cursor": page["next_cursor"]}).json()
+        everything = self.client.get("/api/info-cards/").json()
+        self.assertEqual([c["id"] for c in page["results"] + rest["results"]], [c["id"] for c in everything])
+
+    async def test_streaming(self):
+        client = AsyncClient()
+        response = await client.get("/api/async/info-cards/", {"fields": "id", "stream": "ndjson"})
+        lines = b"".join([chunk async for chunk in response.streaming_content]).decode().splitlines()
+        self.assertEqual(len(lines), 5)
+
+        response = await client.get("/api/async/info-cards/", {"fields": "id", "stream": "json", "limit": 2})
+        self.assertEqual(len(json.loads(b"".join([chunk async for chunk in response.streaming_content]))), 2)
+        self.assertIn("X-Next-Cursor", response)
+
+    def test_full_inference_queue_turns_requests_away(self):
+        pool = InferencePool(workers=1, max_pending=0)
+        pool._slots.acquire()
+        with mock.patch.object(views, "inference_pool", pool):
+            response = self.client.get("/api/async/info-cards/")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
@@ -0,0 +1,226 @@
+"""Training for the relevance model from streamed rows.
+
+Rows carry the five feature columns plus a numeric ``relevance`` label and
+come from a CSV/JSON/NDJSON file or a database table, read ``chunk_size`` at
+a time. Each chunk is reduced to compact NumPy columns: categorical values
+become int32 codes into per-column vocabularies, flags become bools and the
+label a float32, so a row costs 15 bytes rather than a dict. With
+``max_rows`` the set is a uniform reservoir sample of the stream, so memory
+stays fixed however large the input.
+
+The fitted Pipeline has the shape of relevance_model.pkl (one-hot encoder
+plus RandomForestRegressor), so compile_pipeline and ModelRegistry.publish
+take it unchanged. The encoder is fitted on the vocabularies alone and the
+forest on a float32 matrix built chunk by chunk, which is what the encoder
+would produce from the full frame without ever materialising it.
+"""
+import time
+
+import numpy as np
+
+from .ingest import batched, iter_records, to_bool
+from .ml_utils import FEATURE_COLUMNS
+
+LABEL = "relevance"
+CATEGORICAL_COLUMNS = ["age_group", "trimester", "concern"]
+BOOLEAN_COLUMNS = ["heat_sensitive", "pollution_sensitive"]
+ENCODE_CHUNK = 100_000
+
+
+class TrainingSet:
+    def __init__(self, max_rows=None, seed=0):
+        self.max_rows = max_rows
+        self.rng = np.random.default_rng(seed)
+        self.vocabularies = {column: {} for column in CATEGORICAL_COLUMNS}
+        self.rows_read = 0
+        self.skipped = 0
+        self._chunks = []
+        self._columns = None  # the reservoir, once max_rows rows are held
+
+    def __len__(self):
+        if self._columns is not None:
+            return len(self._columns[LABEL])
+        return sum(len(chunk[LABEL]) for chunk in self._chunks)
+
+    def _code(self, column, value):
+        vocabulary = self.vocabularies[column]
+        value = "" if value is None else str(value).strip()
+        code = vocabulary.get(value)
+        if code is None:
+            code = vocabulary[value] = len(vocabulary)
+        return code
+
+    def add(self, records):
+        """Add one chunk of records (mappings); rows without a numeric label are skipped."""
+        rows = []
+        for record in records:
+            try:
+                label = float(record[LABEL])
+            except (KeyError, TypeError, ValueError):
+                self.skipped += 1
+                continue
+            if np.isnan(label):
+                self.skipped += 1
+                continue
+            rows.append((record, label))
+        if not rows:
+            return
+        n = len(rows)
+        chunk = {
+            column: np.fromiter((self._code(column, r.get(column)) for r, _ in rows), dtype=np.int32, count=n)
+            for column in CATEGORICAL_COLUMNS
+        }
+        for column in BOOLEAN_COLUMNS:
+            chunk[column] = np.fromiter((to_bool(r.get(column, False)) for r, _ in rows), dtype=np.bool_, count=n)
+        chunk[LABEL] = np.fromiter((label for _, label in rows), dtype=np.float32, count=n)
+        self._add_chunk(chunk, n)
+
+    def _add_chunk(self, chunk, n):
+        first = self.rows_read
+        self.rows_read += n
+        if self.max_rows is None:
+            self._chunks.append(chunk)
+            return
+
+        if self._columns is None:
+            held = len(self)
+            take = min(n, self.max_rows - held)
+            self._chunks.append({column: values[:take] for column, values in chunk.items()})
+            if held + take < self.max_rows:
+                return
+            self._columns = {column: np.concatenate([c[column] for c in self._chunks]) for column in chunk}
+            self._chunks = []
+            chunk = {column: values[take:] for column, values in chunk.items()}
+            first += take
+            n -= take
+            if not n:
+                return
+
+        # Reservoir sampling (algorithm R): row i replaces a random held row with probability max_rows / (i + 1)
+        slots = self.rng.integers(0, np.arange(first, first + n) + 1)
+        keep = slots < self.max_rows
+        for column, values in chunk.items():
+            self._columns[column][slots[keep]] = values[keep]
+
+    def columns(self):
+        if self._columns is not None:
+            return self._columns
+        if not self._chunks:
+            raise ValueError("No training rows with a relevance label")
+        self._columns = {column: np.concatenate([c[column] for c in self._chunks]) for column in self._chunks[0]}
+        self._chunks = []
+        return self._columns
+
+    def categories(self):
+        return {column: sorted(vocabulary) for column, vocabulary in self.vocabularies.items()}
+
+
+def file_chunks(path, fmt, chunk_size):
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from batched(iter_records(f, fmt), chunk_size)
+
+
+def table_chunks(table, chunk_size, using="default"):
+    """Rows of ``table`` (which must have the feature and label columns), fetched chunk_size at a time."""
+    from django.db import connections
+
+    connection = connections[using]
+    if table not in connection.introspection.table_names():
+        raise ValueError(f"No table named {table!r}")
+    columns = FEATURE_COLUMNS + [LABEL]
+    quote = connection.ops.quote_name
+    sql = f"SELECT {', '.join(quote(column) for column in columns)} FROM {quote(table)}"
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(sql)
+        while rows := cursor.fetchmany(chunk_size):
+            yield [dict(zip(columns, row)) for row in rows]
+
+
+def fit(training_set, n_estimators=100, max_depth=None, min_samples_leaf=1, n_jobs=-1, random_state=42):
+    """Fit the relevance Pipeline on ``training_set``; returns it and the fit time in seconds."""
+    import pandas as pd
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder
+
+    columns = training_set.columns()
+    vocabularies = {column: list(vocabulary) for column, vocabulary in training_set.vocabularies.items()}
+    preprocessor = ColumnTransformer(transformers=[
+        ("cat", OneHotEncoder(handle_unknown="ignore"), CATEGORICAL_COLUMNS),
+        ("bool", "passthrough", BOOLEAN_COLUMNS),
+    ], sparse_threshold=0)
+
+    def frame(start, stop):
+        data = {column: np.asarray(vocabularies[column], dtype=object)[columns[column][start:stop]]
+                for column in CATEGORICAL_COLUMNS}
+        data.update({column: columns[column][start:stop] for column in BOOLEAN_COLUMNS})
+        return pd.DataFrame(data, columns=FEATURE_COLUMNS)
+
+    # Every category once is all the encoder needs to learn its categories
+    widest = max(len(vocabulary) for vocabulary in vocabularies.values())
+    vocabulary_frame = pd.DataFrame({
+        **{column: [values[i % len(values)] for i in range(widest)] for column, values in vocabularies.items()},
+        **{column: [i % 2 == 0 for i in range(widest)] for column in BOOLEAN_COLUMNS},
+    }, columns=FEATURE_COLUMNS)
+    preprocessor.fit(vocabulary_frame)
+
+    n = len(columns[LABEL])
+    start_time = time.perf_counter()
+    X = np.vstack([
+        preprocessor.transform(frame(start, min(start + ENCODE_CHUNK, n))).astype(np.float32)
+        for start in range(0, n, ENCODE_CHUNK)
+    ])
+    regressor = RandomForestRegressor(
+        n_estimators=n_estimators, max_depth=max_depth, min_samples_leaf=min_samples_leaf,
+        n_jobs=n_jobs, random_state=random_state,
+    )
+    regressor.fit(X, columns[LABEL])
+    fit_seconds = time.perf_counter() - start_time
+    regressor.n_jobs = None  # serving predicts a handful of rows; worker processes would only cost
+    return Pipeline(steps=[("preprocessor", preprocessor), ("regressor", regressor)]), fit_seconds
+
+
+def measure_latency(forest, categories, repeat=200, batch_rows=1000, seed=0):
+    """Single-row and batch prediction times of a CompiledForest, in milliseconds."""
+    from types import SimpleNamespace
+
+    rng = np.random.default_rng(seed)
+    user_inputs = {column: (values[0] if values else "") for column, values in categories.items()}
+    article = SimpleNamespace(heat_sensitive=True, pollution_sensitive=False)
+    articles = [
+        SimpleNamespace(heat_sensitive=bool(heat), pollution_sensitive=bool(pollution))
+        for heat, pollution in rng.integers(0, 2, size=(batch_rows, 2))
+    ]
+    forest.predict(user_inputs, [article])  # warm up
+
+    single = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        forest.predict(user_inputs, [article])
+        single.append((time.perf_counter() - start) * 1000)
+    batch = []
+    for _ in range(max(3, repeat // 20)):
+        start = time.perf_counter()
+        forest.predict(user_inputs, articles)
+        batch.append((time.perf_counter() - start) * 1000)
+    single.sort()
+    batch.sort()
+    return {
+        "single_row_p50_ms": round(single[len(single) // 2], 4),
+        "single_row_p99_ms": round(single[int(len(single) * 0.99)], 4),
+        "batch_rows": batch_rows,
+        "batch_p50_ms": round(batch[len(batch) // 2], 4),
+    }
+
+
+def latency_violations(latency, max_single_row_ms=None, max_batch_ms=None):
+    """Why a model with ``latency`` (from measure_latency) is too slow to serve; empty when it is not."""
+    violations = []
+    if max_single_row_ms is not None and latency["single_row_p99_ms"] > max_single_row_ms:
+        violations.append(f"single-row p99 {latency['single_row_p99_ms']:.3f} ms > {max_single_row_ms} ms")
+    if max_batch_ms is not None and latency["batch_p50_ms"] > max_batch_ms:
+        violations.append(
+            f"{latency['batch_rows']}-row batch p50 {latency['batch_p50_ms']:.3f} ms > {max_batch_ms} ms"
+        )
+    return violations
@@ -1,9 +1,35 @@
 from django.urls import path
-from .views import homepage, HelloAPI, StoryDataAPIView, InfoCardListAPIView
+from .views import homepage, HelloAPI, StoryDataAPIView, StoryLibraryAPIView, InfoCardListAPIView, InfoCardSearchAPIView
+from .views import GeocodeAPIView, ReverseGeocodeAPIView, CurrentWeatherAPIView, AirPollutionAPIView
+from .views import LocalitySuggestAPIView, MetricsView, EventCaptureAPIView, RelatedInfoCardsAPIView
+from .views import AsyncStoryDataView, AsyncInfoCardListView, StoryProgressAPIView, StoryStatsAPIView, SymptomScoreAPIView
+from .views import IndicatorListAPIView, IndicatorSeriesAPIView, IndicatorTrendsAPIView, IndicatorDeltasAPIView, IndicatorNationalAPIView
 
 urlpatterns = [
     path('', homepage),
     path('hello/', HelloAPI.as_view()),
     path('story-data/', StoryDataAPIView.as_view()),
+    path('story-data/all/', StoryLibraryAPIView.as_view()),
+    path('story-data/stats/', StoryStatsAPIView.as_view()),
+    path('story-progress/', StoryProgressAPIView.as_view()),
     path('info-cards/', InfoCardListAPIView.as_view()), 
+    path('info-cards/search/', InfoCardSearchAPIView.as_view()),
+    path('info-cards/<int:pk>/related/', RelatedInfoCardsAPIView.as_view()),
+    path('events/', EventCaptureAPIView.as_view()),
+    path('symptoms/score/', SymptomScoreAPIView.as_view()),
+    # Async variants, for deployments on the ASGI entry point
+    path('async/story-data/', AsyncStoryDataView.as_view()),
+    path('async/info-cards/', AsyncInfoCardListView.as_view()),
+    path('weather/geocode/', GeocodeAPIView.as_view()),
+    path('weather/reverse/', ReverseGeocodeAPIView.as_view()),
+    path('weather/current/', CurrentWeatherAPIView.as_view()),
+    path('weather/air-pollution/', AirPollutionAPIView.as_view()),
+    path('localities/', LocalitySuggestAPIView.as_view()),
+    path('indicators/', IndicatorListAPIView.as_view()),
+    path('indicators/<str:name>/', IndicatorSeriesAPIView.as_view()),
+    path('indicators/<str:name>/trends/', IndicatorTrendsAPIView.as_view()),
+    path('indicators/<str:name>/deltas/', IndicatorDeltasAPIView.as_view()),
+    path('indicators/<str:name>/national/', IndicatorNationalAPIView.as_view()),
+    path('metrics/', MetricsView.as_view()),
+    path('metrics', MetricsView.as_view()),  # the usual Prometheus path, without the redirect
 ]
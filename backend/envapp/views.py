@@ -1,28 +1,105 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.http import HttpResponse
-from .models import Characters, Scenes, Options, InfoCard
+from rest_framework.utils.encoders import JSONEncoder
+from django.db.models import Case, Count, FloatField, Max, Q, Value, When
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views import View
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils import timezone
+from django.utils.http import http_date, quote_etag
+from .models import Characters, Options, InfoCard, CardEvent
 from .serializers import StoryDataSerializer, InfoCardSerializer
-import joblib
+from .cache import (
+    aget_info_cards, aget_story, ainfo_card_cache_key, aset_info_cards, aset_story, get_info_cards, get_story,
+    get_story_library, info_card_cache_key, set_info_cards, set_story, set_story_library,
+)
+from .events import EventBuffer, EventBufferFull
+from .ml_utils import InferenceBusy, InferencePool, MicroBatcher, ModelRegistry
+from .progress import clear_progress, player_progress, record_choice, story_stats
+from .related import RelatedIndexStore
+from . import symptoms
+from .search import fts_available, naive_search_info_cards, search_info_cards
+from . import metrics, weather
+from .metrics import phase
+from .localities import get_locality_index
+from .indicators import store as indicator_store
+from types import SimpleNamespace
+import base64
+import hashlib
+import json
 import os
+import re
 
-# Load ML model
+# Relevance models are served from a versioned registry of compiled artifacts.
+# Nothing is loaded until the first request, and publishing a new version
+# (manage.py publish_relevance_model) swaps it in without a restart.
 MODEL_PATH = os.path.join(os.path.dirname(__file__), 'relevance_model.pkl')
-model = joblib.load(MODEL_PATH)
+MODEL_REGISTRY_DIR = os.path.join(os.path.dirname(__file__), 'relevance_models')
+# Live predictions from all request threads are merged into batched evaluations
+batcher = MicroBatcher(settings.INFERENCE_BATCH_MAX_ROWS, settings.INFERENCE_BATCH_MAX_WAIT_MS / 1000)
+registry = ModelRegistry(MODEL_REGISTRY_DIR, batcher=batcher)
+inference_pool = InferencePool(settings.INFERENCE_WORKERS, settings.INFERENCE_MAX_PENDING)
+# TF-IDF vectors for related cards (manage.py build_related_index)
+related_index = RelatedIndexStore(poll_interval=settings.RELATED_INDEX_POLL_SECONDS)
+event_buffer = EventBuffer(
+    CardEvent, max_size=settings.EVENT_BUFFER_MAX_EVENTS, batch_size=settings.EVENT_FLUSH_BATCH,
+    flush_interval=settings.EVENT_FLUSH_INTERVAL_MS / 1000, block_timeout=settings.EVENT_BUFFER_BLOCK_MS / 1000,
+)
 
 # ML prediction utility
 def predict_relevance(user_inputs, article):
-    input_dict = {
-        "age_group": user_inputs.get("age_group", ""),
-        "trimester": user_inputs.get("trimester", ""),
-        "concern": user_inputs.get("concern", ""),
-        "heat_sensitive": article.heat_sensitive,
-        "pollution_sensitive": article.pollution_sensitive,
-    }
-    return model.predict([input_dict])[0]  # ✅ single dict wrapped in a list
+    return predict_relevance_batch(user_inputs, [article])[0]
+
+def predict_relevance_batch(user_inputs, articles, model=None):
+    model = model or registry.current()
+    if model is None:
+        print("No relevance model available, using fallback scores")
+        return [0] * len(articles)
+    return model.predict_batch(user_inputs, articles)
+
+# Conditional GET. Validators come from aggregate counts and max(updated_at),
+# never from the payload, so a 304 costs one query. Counts are part of the
+# ETag because a delete does not move max(updated_at); Last-Modified cannot
+# see deletes, but clients that send If-None-Match have it ignored.
+def make_etag(*parts):
+    return quote_etag(hashlib.sha256(repr(parts).encode()).hexdigest()[:32])
+
+def set_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+
+def conditional_get(request, etag, last_modified):
+    # Returns a 304 (or 412) response when the client's copy is current, else None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
 
-# Updated StoryData API – now supports character_id query param
+def story_stamps():
+    return dict(
+        character_count=Count('id'),
+        character_updated=Max('updated_at'),
+        scene_count=Count('scenes', distinct=True),
+        scenes_updated=Max('scenes__updated_at'),
+        option_count=Count('scenes__options', distinct=True),
+        options_updated=Max('scenes__options__updated_at'),
+    )
+
+def story_validators(character_id, stamps):
+    last_modified = max(
+        stamp for stamp in (stamps['character_updated'], stamps['scenes_updated'], stamps['options_updated'])
+        if stamp is not None
+    )
+    return make_etag('story-data', character_id, *sorted(stamps.items())), last_modified
+
+# Updated StoryData API – now supports character_id query param.
+# Three queries regardless of story length, and the assembled payload is
+# cached until the character, one of its scenes or options changes.
 class StoryDataAPIView(APIView):
     def get(self, request):
         character_id = request.GET.get('character_id')
@@ -30,75 +107,876 @@ class StoryDataAPIView(APIView):
         if not character_id:
             return Response({'error': 'character_id is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            character = Characters.objects.get(id=character_id)
-        except Characters.DoesNotExist:
+        stamps = Characters.objects.filter(id=character_id).aggregate(**story_stamps())
+        if not stamps['character_count']:
             return Response({'error': 'Character not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        scenes = Scenes.objects.filter(character=character)
-        data = {
-            "character": {
-                "name": character.name,
-                "age": character.age,
-                "location": character.location,
-            },
-            "scenes": {
-                scene.scene_key: {
-                    "question": scene.question,
-                    "options": [
-                        {
-                            "text": opt.text,
-                            "feedback": opt.feedback,
-                            "emotion": opt.emotion,
-                            "correct": opt.correct
-                        }
-                        for opt in Options.objects.filter(scene=scene)
-                    ]
-                }
-                for scene in scenes
-            }
-        }
+        etag, last_modified = story_validators(character_id, stamps)
+        not_modified = conditional_get(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        data = get_story(character_id, etag)
+        if data is None:
+            try:
+                character = StoryDataSerializer.setup_eager_loading(Characters.objects.all()).get(id=character_id)
+            except Characters.DoesNotExist:
+                return Response({'error': 'Character not found'}, status=status.HTTP_404_NOT_FOUND)
+
+            with phase("serialize"):
+                data = dict(StoryDataSerializer(character).data)
+            set_story(character_id, etag, data)
+
+        response = Response(data)
+        set_validators(response, etag, last_modified)
+        return response
 
+# Every character's story in one response, for clients that preload the
+# whole library. Same three queries however many characters there are.
+class StoryLibraryAPIView(APIView):
+    def get(self, request):
+        data = get_story_library()
+        if data is None:
+            characters = StoryDataSerializer.setup_eager_loading(Characters.objects.order_by('id'))
+            with phase("serialize"):
+                data = [dict(story) for story in StoryDataSerializer(characters, many=True).data]
+            set_story_library(data)
         return Response(data)
 
+# Story progress kept on the server (progress.py). A player is an opaque id
+# the client generates once and keeps, e.g. in localStorage, so any device
+# with it can resume. POST {"player", "option_id"} records a pick, GET
+# ?player=&character_id= returns the picks so far, DELETE with the same
+# parameters starts the story over.
+PLAYER_ID_RE = re.compile(r"[A-Za-z0-9_-]{8,64}")
+
+def parse_player(value):
+    if not isinstance(value, str) or not PLAYER_ID_RE.fullmatch(value):
+        raise ValueError("player must be 8-64 letters, digits, '-' or '_'")
+    return value
+
+def parse_character_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError("character_id must be an integer")
+
+class StoryProgressAPIView(APIView):
+    def get(self, request):
+        try:
+            player = parse_player(request.GET.get('player'))
+            character_id = parse_character_id(request.GET.get('character_id'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"character_id": character_id, "choices": player_progress(player, character_id)})
+
+    def post(self, request):
+        data = request.data if isinstance(request.data, dict) else {}
+        try:
+            player = parse_player(data.get('player'))
+            option_id = data.get('option_id')
+            if not isinstance(option_id, int) or isinstance(option_id, bool):
+                raise ValueError("option_id must be an integer")
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            scene_id, character_id, changed = record_choice(player, option_id)
+        except Options.DoesNotExist:
+            return Response({'error': 'Option not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"character_id": character_id, "scene_id": scene_id, "option_id": option_id,
+                         "changed": changed})
+
+    def delete(self, request):
+        try:
+            player = parse_player(request.GET.get('player'))
+            character_id = parse_character_id(request.GET.get('character_id'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"cleared": clear_progress(player, character_id)})
+
+# How players chose in every scene of a story ("X% chose this"), from the
+# counters progress.py keeps: one query, however many players there are
+class StoryStatsAPIView(APIView):
+    def get(self, request):
+        try:
+            character_id = parse_character_id(request.GET.get('character_id'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        scenes = story_stats(character_id)
+        if not scenes and not Characters.objects.filter(id=character_id).exists():
+            return Response({'error': 'Character not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"character_id": character_id, "scenes": scenes})
+
+# Age ranges arrive (and are stored) with a mix of hyphens and en dashes
+AGE_RANGE_DASHES = "-\u2010\u2011\u2012\u2013\u2014\u2015\u2212"
+
+def normalize_age_range(value):
+    value = "".join("-" if char in AGE_RANGE_DASHES else char for char in value)
+    return "-".join(part.strip() for part in value.split("-")).strip()
+
+def age_range_variants(age_range):
+    # The spellings of a normalized age range that may be stored in the database
+    return sorted({age_range.replace("-", dash) for dash in "-\u2013\u2014"})
+
+# The personalisation filters; the InfoCard indexes are built around these combinations
+def filter_info_cards(queryset, trimester, age_range, concern):
+    if trimester:
+        queryset = queryset.filter(trimester=trimester)
+
+    if age_range:
+        queryset = queryset.filter(age_group__in=age_range_variants(normalize_age_range(age_range)))
+
+    if concern in ['heat', 'heatwave']:
+        queryset = queryset.filter(heat_sensitive=True)
+    if concern in ['pollution', 'air_pollution']:
+        queryset = queryset.filter(pollution_sensitive=True)
+
+    return queryset
+
+INFO_CARD_MAX_LIMIT = 200
+INFO_CARD_STREAM_CHUNK = 500
+
+# The model only sees the user inputs and the article's two flags, so within
+# one request there are at most four distinct scores. Scoring those four and
+# attaching them as a CASE expression lets the database do the ordering and
+# keyset pagination instead of Python.
+def annotate_relevance(queryset, user_input, model):
+    flag_values = [(heat, pollution) for heat in (False, True) for pollution in (False, True)]
+    prototypes = [
+        SimpleNamespace(id=None, heat_sensitive=heat, pollution_sensitive=pollution)
+        for heat, pollution in flag_values
+    ]
+    with phase("inference"):
+        scores = predict_relevance_batch(user_input, prototypes, model)
+    return queryset.annotate(relevance_score=Case(
+        *[
+            When(heat_sensitive=heat, pollution_sensitive=pollution, then=Value(round(score, 2)))
+            for (heat, pollution), score in zip(flag_values, scores)
+        ],
+        default=Value(0.0),
+        output_field=FloatField(),
+    ))
+
+def encode_cursor(article):
+    raw = json.dumps([article.relevance_score, article.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        score, article_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return float(score), int(article_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+def parse_limit(value):
+    if value is None:
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if not 1 <= limit <= INFO_CARD_MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {INFO_CARD_MAX_LIMIT}")
+    return limit
+
+def parse_fields(value, extra=("relevance_score", "search_rank")):
+    if not value:
+        return None
+    fields = [field.strip() for field in value.split(",") if field.strip()]
+    allowed = set(InfoCardSerializer().fields) | set(extra)
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def stream_items(items, stream):
+    if stream == 'ndjson':
+        for item in items:
+            yield json.dumps(item, cls=JSONEncoder, ensure_ascii=False) + "\n"
+        return
+
+    yield "["
+    for i, item in enumerate(items):
+        yield ("," if i else "") + json.dumps(item, cls=JSONEncoder, ensure_ascii=False)
+    yield "]"
+
+def parse_info_card_query(query):
+    # The validated, normalized parameters of an info-card list request; raises ValueError
+    stream = query.get('stream', '')
+    if stream not in ('', 'json', 'ndjson'):
+        raise ValueError("stream must be json or ndjson")
+    cursor = query.get('cursor')
+    params = SimpleNamespace(
+        trimester=query.get('trimester', '').strip(),
+        age_range=normalize_age_range(query.get('age_range', '')),
+        concern=query.get('concern', '').strip().lower(),
+        stream=stream,
+        fields=parse_fields(query.get('fields'), extra=("relevance_score",)),
+        limit=parse_limit(query.get('limit')),
+        after=decode_cursor(cursor) if cursor else None,
+    )
+    params.paginated = params.limit is not None or params.after is not None
+    if params.paginated and params.limit is None:
+        params.limit = INFO_CARD_MAX_LIMIT
+    return params
+
+def info_card_cache_params(params):
+    return {
+        "trimester": params.trimester,
+        "age_range": params.age_range,
+        "concern": params.concern,
+        "fields": sorted(params.fields) if params.fields is not None else None,
+        "limit": params.limit,
+        "cursor": params.after,
+    }
+
+def rank_info_cards(queryset, params, model):
+    # Scores, orders, applies the keyset cursor and projects; no query runs yet
+    user_input = {
+        "age_group": model.match_category("age_group", params.age_range, normalize_age_range) if model else params.age_range,
+        "trimester": params.trimester,
+        "concern": params.concern
+    }
+    queryset = annotate_relevance(queryset, user_input, model).order_by('-relevance_score', 'id')
+    if params.after is not None:
+        score, article_id = params.after
+        queryset = queryset.filter(Q(relevance_score__lt=score) | Q(relevance_score=score, id__gt=article_id))
+    if params.fields is not None:
+        queryset = queryset.only('id', *model_fields(params))
+    return queryset
+
+def model_fields(params):
+    if params.fields is None:
+        return None
+    return [field for field in params.fields if field != "relevance_score"]
+
+def serialize_info_cards(articles, params):
+    with phase("serialize"):
+        data = InfoCardSerializer(articles, many=True, fields=model_fields(params)).data
+        for serialized, article in zip(data, articles):
+            if params.fields is None or "relevance_score" in params.fields:
+                serialized["relevance_score"] = article.relevance_score
+    return data
+
+def page_info_cards(articles, params):
+    # articles holds up to limit + 1 rows; returns the page and its next cursor
+    if len(articles) > params.limit:
+        articles = articles[:params.limit]
+        return articles, encode_cursor(articles[-1])
+    return articles, None
+
+# Without limit/cursor the response is the full array, as before. With them
+# it is a page ordered by (relevance_score desc, id asc) plus a next_cursor.
+# stream=json|ndjson streams the same rows; fields= selects the keys returned.
+# Non-streamed responses are cached under their normalized parameters.
 class InfoCardListAPIView(APIView):
     def get(self, request):
-        trimester = request.GET.get('trimester', '')
-        age_range = request.GET.get('age_range', '')
-        concern = request.GET.get('concern', '').lower()
+        try:
+            params = parse_info_card_query(request.GET)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        model = registry.current()
+        model_version = model.version if model is not None else None
+        cache_params = info_card_cache_params(params)
+
+        cache_key = None
+        if not params.stream:
+            cache_key = info_card_cache_key(cache_params, model_version)
+            cached = get_info_cards(cache_key)
+            if cached is not None:
+                data, etag, last_modified = cached
+                response = conditional_get(request, etag, last_modified) or Response(data)
+                set_validators(response, etag, last_modified)
+                response["X-Cache"] = "hit"
+                if model is not None:
+                    response["X-Model-Version"] = model.version
+                return response
+
+        queryset = filter_info_cards(InfoCard.objects.all(), params.trimester, params.age_range, params.concern)
+
+        stamps = queryset.aggregate(count=Count('id'), updated=Max('updated_at'))
+        etag = make_etag('info-cards', sorted(cache_params.items()), stamps['count'], stamps['updated'], model_version)
+        not_modified = conditional_get(request, etag, stamps['updated'])
+        if not_modified is not None:
+            return not_modified
+
+        queryset = rank_info_cards(queryset, params, model)
+
+        next_cursor = None
+        if params.paginated:
+            articles, next_cursor = page_info_cards(list(queryset[:params.limit + 1]), params)
+            chunks = [articles]
+        else:
+            chunks = chunked(queryset.iterator(chunk_size=INFO_CARD_STREAM_CHUNK), INFO_CARD_STREAM_CHUNK)
+
+        if params.stream:
+            response = StreamingHttpResponse(
+                stream_items((item for chunk in chunks for item in serialize_info_cards(chunk, params)), params.stream),
+                content_type='application/x-ndjson' if params.stream == 'ndjson' else 'application/json',
+            )
+            if next_cursor:
+                response["X-Next-Cursor"] = next_cursor
+        else:
+            data = [dict(item) for chunk in chunks for item in serialize_info_cards(chunk, params)]
+            if params.paginated:
+                data = {"results": data, "next_cursor": next_cursor}
+            set_info_cards(cache_key, (data, etag, stamps['updated']))
+            response = Response(data)
+            response["X-Cache"] = "miss"
+
+        set_validators(response, etag, stamps['updated'])
+        if model is not None:
+            response["X-Model-Version"] = model.version
+        return response
+
+# Async versions of story-data and info-cards for the ASGI entry point
+# (asgi.py), with the same parameters, payloads and headers as the APIViews
+# above. Queries go through the async ORM, and model loading and scoring run
+# on inference_pool, so no request holds a thread or blocks the event loop
+# while it waits.
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder, json_dumps_params={"ensure_ascii": False})
+
+def busy_response():
+    response = json_response({'error': 'Server busy, retry shortly'}, status=503)
+    response["Retry-After"] = "1"
+    return response
+
+async def astream_items(items, stream):
+    if stream == 'ndjson':
+        async for item in items:
+            yield json.dumps(item, cls=JSONEncoder, ensure_ascii=False) + "\n"
+        return
+
+    yield "["
+    first = True
+    async for item in items:
+        yield ("" if first else ",") + json.dumps(item, cls=JSONEncoder, ensure_ascii=False)
+        first = False
+    yield "]"
+
+async def aserialized_info_cards(queryset, params):
+    chunk = []
+    async for article in queryset.aiterator(chunk_size=INFO_CARD_STREAM_CHUNK):
+        chunk.append(article)
+        if len(chunk) == INFO_CARD_STREAM_CHUNK:
+            for item in serialize_info_cards(chunk, params):
+                yield item
+            chunk = []
+    for item in serialize_info_cards(chunk, params):
+        yield item
+
+class AsyncStoryDataView(View):
+    async def get(self, request):
+        character_id = request.GET.get('character_id')
+
+        if not character_id:
+            return json_response({'error': 'character_id is required'}, status=400)
+
+        stamps = await Characters.objects.filter(id=character_id).aaggregate(**story_stamps())
+        if not stamps['character_count']:
+            return json_response({'error': 'Character not found'}, status=404)
+
+        etag, last_modified = story_validators(character_id, stamps)
+        not_modified = conditional_get(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        data = await aget_story(character_id, etag)
+        if data is None:
+            try:
+                character = await StoryDataSerializer.setup_eager_loading(Characters.objects.all()).aget(id=character_id)
+            except Characters.DoesNotExist:
+                return json_response({'error': 'Character not found'}, status=404)
+
+            with phase("serialize"):
+                data = dict(StoryDataSerializer(character).data)
+            await aset_story(character_id, etag, data)
+
+        response = json_response(data)
+        set_validators(response, etag, last_modified)
+        return response
+
+class AsyncInfoCardListView(View):
+    async def get(self, request):
+        try:
+            params = parse_info_card_query(request.GET)
+        except ValueError as e:
+            return json_response({'error': str(e)}, status=400)
 
+        try:
+            model = await inference_pool.run(registry.current)
+        except InferenceBusy:
+            return busy_response()
+        model_version = model.version if model is not None else None
+        cache_params = info_card_cache_params(params)
+
+        cache_key = None
+        if not params.stream:
+            cache_key = await ainfo_card_cache_key(cache_params, model_version)
+            cached = await aget_info_cards(cache_key)
+            if cached is not None:
+                data, etag, last_modified = cached
+                response = conditional_get(request, etag, last_modified) or json_response(data)
+                set_validators(response, etag, last_modified)
+                response["X-Cache"] = "hit"
+                if model is not None:
+                    response["X-Model-Version"] = model.version
+                return response
+
+        queryset = filter_info_cards(InfoCard.objects.all(), params.trimester, params.age_range, params.concern)
+
+        stamps = await queryset.aaggregate(count=Count('id'), updated=Max('updated_at'))
+        etag = make_etag('info-cards', sorted(cache_params.items()), stamps['count'], stamps['updated'], model_version)
+        not_modified = conditional_get(request, etag, stamps['updated'])
+        if not_modified is not None:
+            return not_modified
+
+        try:
+            with phase("inference"):  # includes the wait for a pool thread
+                queryset = await inference_pool.run(rank_info_cards, queryset, params, model)
+        except InferenceBusy:
+            return busy_response()
+
+        next_cursor = None
+        if params.paginated:
+            articles, next_cursor = page_info_cards([a async for a in queryset[:params.limit + 1]], params)
+
+        if params.stream:
+            items = aserialized_info_cards(queryset, params)
+            if params.paginated:
+                async def page():
+                    for item in serialize_info_cards(articles, params):
+                        yield item
+                items = page()
+            response = StreamingHttpResponse(
+                astream_items(items, params.stream),
+                content_type='application/x-ndjson' if params.stream == 'ndjson' else 'application/json',
+            )
+            if next_cursor:
+                response["X-Next-Cursor"] = next_cursor
+        else:
+            if params.paginated:
+                data = {"results": [dict(item) for item in serialize_info_cards(articles, params)], "next_cursor": next_cursor}
+            else:
+                data = [dict(item) async for item in aserialized_info_cards(queryset, params)]
+            await aset_info_cards(cache_key, (data, etag, stamps['updated']))
+            response = json_response(data)
+            response["X-Cache"] = "miss"
+
+        set_validators(response, etag, stamps['updated'])
+        if model is not None:
+            response["X-Model-Version"] = model.version
+        return response
+
+# Full-text search over title, summary and full_text, within the same
+# personalisation filters as the list endpoint. Uses the FTS5 index where
+# available (SQLite) and icontains elsewhere.
+class InfoCardSearchAPIView(APIView):
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        trimester = request.GET.get('trimester', '').strip()
+        age_range = normalize_age_range(request.GET.get('age_range', ''))
+        concern = request.GET.get('concern', '').strip().lower()
+
+        try:
+            if not query:
+                raise ValueError("q is required")
+            fields = parse_fields(request.GET.get('fields'))
+            limit = parse_limit(request.GET.get('limit')) or 20
+            offset = int(request.GET.get('offset', 0))
+            if offset < 0:
+                raise ValueError("offset must not be negative")
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        model = registry.current()
         user_input = {
-            "age_group": age_range,
+            "age_group": model.match_category("age_group", age_range, normalize_age_range) if model else age_range,
             "trimester": trimester,
             "concern": concern
         }
+        queryset = filter_info_cards(InfoCard.objects.all(), trimester, age_range, concern)
+        queryset = annotate_relevance(queryset, user_input, model)
 
-        queryset = InfoCard.objects.all()
+        search = search_info_cards if fts_available() else naive_search_info_cards
+        ranked = search(queryset, query, limit + 1, offset)
+        has_more = len(ranked) > limit
+        ranked = ranked[:limit]
 
-        if trimester:
-            queryset = queryset.filter(trimester=trimester)
+        model_fields = None
+        if fields is not None:
+            model_fields = [field for field in fields if field not in ("relevance_score", "search_rank")]
+        cards = queryset.only('id', *model_fields) if model_fields is not None else queryset
+        cards = cards.in_bulk([card_id for card_id, _ in ranked])
 
-        if age_range:
-            queryset = queryset.filter(age_group=age_range)
+        results = []
+        for card_id, rank in ranked:
+            card = cards.get(card_id)
+            if card is None:
+                continue  # deleted since the search ran
+            serialized = dict(InfoCardSerializer(card, fields=model_fields).data)
+            if fields is None or "relevance_score" in fields:
+                serialized["relevance_score"] = card.relevance_score
+            if fields is None or "search_rank" in fields:
+                serialized["search_rank"] = rank
+            results.append(serialized)
 
-        if concern in ['heat', 'heatwave']:
-            queryset = queryset.filter(heat_sensitive=True)
-        if concern in ['pollution', 'air_pollution']:
-            queryset = queryset.filter(pollution_sensitive=True)
+        response = Response({"results": results, "next_offset": offset + limit if has_more else None})
+        if model is not None:
+            response["X-Model-Version"] = model.version
+        return response
 
-        articles_with_scores = []
-        for article in queryset:
-            serialized = InfoCardSerializer(article).data
-            try:
-                score = predict_relevance(user_input, article)
-            except Exception as e:
-                score = 0  # fallback score
-                print(f"Prediction failed for article {article.id}: {e}")
-            serialized["relevance_score"] = round(score, 2)
-            articles_with_scores.append(serialized)
-
-        sorted_data = sorted(articles_with_scores, key=lambda x: x["relevance_score"], reverse=True)
-        return Response(sorted_data)
+RELATED_MAX_LIMIT = 50
+
+# Cards most similar in content to one card, by cosine similarity of their
+# precomputed TF-IDF vectors (related.py). A few extra are looked up in case
+# some were deleted since the index last saw them.
+class RelatedInfoCardsAPIView(APIView):
+    def get(self, request, pk):
+        try:
+            fields = parse_fields(request.GET.get('fields'), extra=("similarity",))
+            limit = int(request.GET.get('limit', 5))
+            if not 1 <= limit <= RELATED_MAX_LIMIT:
+                raise ValueError(f"limit must be between 1 and {RELATED_MAX_LIMIT}")
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        index = related_index.current()
+        if index is None:
+            response = Response({'error': 'Related cards are not available yet, retry later'},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response["Retry-After"] = "60"
+            return response
+        with phase("related"):
+            related = index.related(pk, limit + 5)
+        if related is None and not InfoCard.objects.filter(pk=pk).exists():
+            return Response({'error': 'InfoCard not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        model_fields = [field for field in fields if field != "similarity"] if fields is not None else None
+        cards = InfoCard.objects.all()
+        if model_fields is not None:
+            cards = cards.only('id', *model_fields)
+        cards = cards.in_bulk([card_id for card_id, _ in related or []])
+        results = []
+        for card_id, similarity in related or []:
+            if card_id not in cards:
+                continue
+            serialized = dict(InfoCardSerializer(cards[card_id], fields=model_fields).data)
+            if fields is None or "similarity" in fields:
+                serialized["similarity"] = round(similarity, 6)
+            results.append(serialized)
+            if len(results) == limit:
+                break
+        return Response({"results": results})
+
+# OpenWeatherMap proxy – keeps the API key on the server and answers repeated
+# lookups from the cache in weather.py. Bodies are upstream's JSON unchanged.
+class WeatherProxyAPIView(APIView):
+    endpoint = None
+
+    def get_params(self, query):
+        raise NotImplementedError
+
+    def get(self, request):
+        try:
+            params = self.get_params(request.GET)
+        except KeyError as e:
+            return Response({'error': f'{e.args[0]} is required'}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            data, state, max_age = weather.fetch(self.endpoint, params)
+        except weather.UpstreamError as e:
+            print(f"Weather lookup failed: {e}")
+            return Response({'error': 'Weather service unavailable'}, status=status.HTTP_502_BAD_GATEWAY)
+
+        response = Response(data)
+        response["X-Cache"] = state
+        patch_cache_control(response, public=True, max_age=max_age)
+        return response
+
+
+def parse_coordinates(query):
+    return {
+        "lat": weather.round_coordinate(query["lat"], 90),
+        "lon": weather.round_coordinate(query["lon"], 180),
+    }
+
+
+def parse_geocode_limit(value, default):
+    limit = int(value) if value else default
+    return min(max(limit, 1), 10)  # upstream caps at 5 but accepts up to 10
+
+
+class GeocodeAPIView(WeatherProxyAPIView):
+    endpoint = "geocode"
+
+    def get_params(self, query):
+        place = weather.normalize_place(query["q"])
+        if not place:
+            raise KeyError("q")
+        return {"q": place, "limit": parse_geocode_limit(query.get("limit"), 5)}
+
+
+class ReverseGeocodeAPIView(WeatherProxyAPIView):
+    endpoint = "reverse"
+
+    def get_params(self, query):
+        return {**parse_coordinates(query), "limit": parse_geocode_limit(query.get("limit"), 1)}
+
+
+class CurrentWeatherAPIView(WeatherProxyAPIView):
+    endpoint = "weather"
+
+    def get_params(self, query):
+        units = query.get("units", "metric")
+        if units not in ("standard", "metric", "imperial"):
+            raise ValueError("units must be standard, metric or imperial")
+        return {**parse_coordinates(query), "units": units}
+
+
+class AirPollutionAPIView(WeatherProxyAPIView):
+    endpoint = "air_pollution"
+
+    def get_params(self, query):
+        return parse_coordinates(query)
+
+# Suburb autocomplete from the bundled locality index (localities.py), so
+# typing a location no longer costs a geocoding call per keystroke.
+class LocalitySuggestAPIView(APIView):
+    def get(self, request):
+        try:
+            limit = min(max(int(request.GET.get('limit') or 10), 1), 20)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = Response(get_locality_index().search(request.GET.get('q', ''), limit))
+        patch_cache_control(response, public=True, max_age=24 * 60 * 60)
+        return response
+
+# State-level pregnancy health indicators (indicators.py). Figures change only
+# when a CSV does, so validators come from the file hash and mtime.
+class IndicatorListAPIView(APIView):
+    def get(self, request):
+        return Response([indicator.summary() for indicator in indicator_store.indicators().values()])
+
+class IndicatorAPIView(APIView):
+    def get_payload(self, indicator, query):
+        raise NotImplementedError
+
+    def get(self, request, name):
+        indicator = indicator_store.get(name)
+        if indicator is None:
+            return Response({'error': 'Indicator not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        etag = make_etag('indicator', name, indicator.source_sha256, type(self).__name__, sorted(request.GET.lists()))
+        not_modified = conditional_get(request, etag, indicator.modified)
+        if not_modified is not None:
+            return not_modified
+
+        try:
+            payload = self.get_payload(indicator, request.GET)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        response = Response(payload)
+        set_validators(response, etag, indicator.modified)
+        return response
+
+def parse_states(query):
+    return [state.strip() for state in query.get('state', '').split(',') if state.strip()]
+
+def parse_year(value):
+    return int(value) if value else None
+
+class IndicatorSeriesAPIView(IndicatorAPIView):
+    def get_payload(self, indicator, query):
+        return indicator.series(parse_states(query), parse_year(query.get('from')), parse_year(query.get('to')))
+
+class IndicatorTrendsAPIView(IndicatorAPIView):
+    def get_payload(self, indicator, query):
+        codes = indicator.state_codes(parse_states(query))
+        trends = {indicator.states[code]: indicator.trends[indicator.states[code]] for code in codes}
+        return {"indicator": indicator.name, "trends": trends}
+
+class IndicatorDeltasAPIView(IndicatorAPIView):
+    def get_payload(self, indicator, query):
+        return indicator.year_over_year(parse_states(query))
+
+class IndicatorNationalAPIView(IndicatorAPIView):
+    def get_payload(self, indicator, query):
+        return indicator.compare_national(parse_year(query.get('year')))
+
+# Impressions and clicks on InfoCards, posted by the client once per shown
+# list and per opened card:
+#   {"age_group": ..., "trimester": ..., "concern": ..., "model_version": ..., "session": ...,
+#    "events": [{"type": "impression" | "click", "card": <id>, "position": <rank>}, ...]}
+# The shared fields may also be given per event. Events are buffered and
+# written in batches (events.py), so the response only confirms they were queued.
+EVENT_KINDS = {kind for kind, _ in CardEvent.KINDS}
+EVENT_CONTEXT_FIELDS = ("age_group", "trimester", "concern", "model_version", "session")
+# The narrowest ranges any supported backend stores in CardEvent's columns
+# (card is a BigAutoField key, position a PositiveIntegerField)
+EVENT_MAX_CARD = 2 ** 63 - 1
+EVENT_MAX_POSITION = 2 ** 31 - 1
+
+def parse_events(data):
+    # Unsaved CardEvents for an event-capture body; raises ValueError
+    if not isinstance(data, dict) or not isinstance(data.get("events"), list):
+        raise ValueError("Expected an object with an events list")
+    events = data["events"]
+    if not events:
+        raise ValueError("events must not be empty")
+    if len(events) > settings.EVENT_MAX_PER_REQUEST:
+        raise ValueError(f"At most {settings.EVENT_MAX_PER_REQUEST} events per request")
+
+    def text(source, field, default=""):
+        value = source.get(field, default)
+        max_length = CardEvent._meta.get_field(field).max_length
+        if not isinstance(value, str) or len(value) > max_length:
+            raise ValueError(f"{field} must be a string of at most {max_length} characters")
+        return value.strip()
+
+    context = {field: text(data, field) for field in EVENT_CONTEXT_FIELDS}
+    context["age_group"] = normalize_age_range(context["age_group"])
+    received = timezone.now()
+    rows = []
+    for i, event in enumerate(events):
+        if not isinstance(event, dict):
+            raise ValueError(f"events[{i}] must be an object")
+        if event.get("type") not in EVENT_KINDS:
+            raise ValueError(f"events[{i}].type must be one of {', '.join(sorted(EVENT_KINDS))}")
+        card, position = event.get("card"), event.get("position")
+        if not isinstance(card, int) or isinstance(card, bool) or not 1 <= card <= EVENT_MAX_CARD:
+            raise ValueError(f"events[{i}].card must be a card id")
+        if position is not None and (
+            not isinstance(position, int) or isinstance(position, bool) or not 0 <= position <= EVENT_MAX_POSITION
+        ):
+            raise ValueError(f"events[{i}].position must be an integer between 0 and {EVENT_MAX_POSITION}")
+        fields = {field: text(event, field, context[field]) for field in EVENT_CONTEXT_FIELDS}
+        fields["age_group"] = normalize_age_range(fields["age_group"])
+        rows.append(CardEvent(kind=event["type"], card_id=card, position=position, created_at=received, **fields))
+    return rows
+
+class EventCaptureAPIView(APIView):
+    def post(self, request):
+        try:
+            rows = parse_events(request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            event_buffer.add(rows)
+        except EventBufferFull:
+            response = Response({'error': 'Too many events waiting to be written, retry shortly'},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response["Retry-After"] = "1"
+            return response
+        return Response({'accepted': len(rows)}, status=status.HTTP_202_ACCEPTED)
+
+# Risk flags and rolling trends for a batch of symptom logs, scored as arrays
+# (symptoms.py). The body is either
+#   {"window": 7, "entries": [{"session": ..., "date": "YYYY-MM-DD", "headache": 0-5, ...,
+#                              "notes": ..., "pm25": ..., "temperature": ...}, ...]}
+# or the same fields as parallel lists under "columns", which parses much
+# faster for large batches and is answered as columns too. Results are in
+# input order; "summary" describes the batch as a whole.
+SYMPTOM_MAX_WINDOW = 90
+
+def parse_symptom_batch(data):
+    # (SymptomBatch, window, columnar) for a scoring body; raises ValueError
+    if not isinstance(data, dict) or ("entries" in data) == ("columns" in data):
+        raise ValueError("Expected an object with either an entries list or columns")
+    window = data.get("window", 7)
+    if not isinstance(window, int) or isinstance(window, bool) or not 1 <= window <= SYMPTOM_MAX_WINDOW:
+        raise ValueError(f"window must be between 1 and {SYMPTOM_MAX_WINDOW} days")
+    columnar = "columns" in data
+    size = len(data["columns"].get("date") or []) if columnar and isinstance(data["columns"], dict) else None
+    if not columnar and isinstance(data["entries"], list):
+        size = len(data["entries"])
+    if size is not None and size > settings.SYMPTOM_SCORE_MAX_LOGS:
+        raise ValueError(f"At most {settings.SYMPTOM_SCORE_MAX_LOGS} logs per request")
+    if columnar:
+        batch = symptoms.batch_from_columns(data["columns"])
+    else:
+        batch = symptoms.batch_from_rows(data["entries"])
+    return batch, window, columnar
+
+class SymptomScoreAPIView(APIView):
+    def post(self, request):
+        if int(request.META.get("CONTENT_LENGTH") or 0) > settings.SYMPTOM_SCORE_MAX_BYTES:
+            return Response({'error': f'Body larger than {settings.SYMPTOM_SCORE_MAX_BYTES} bytes'},
+                            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        try:
+            batch, window, columnar = parse_symptom_batch(request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        with phase("score"):
+            scores = symptoms.score(batch, window)
+            summary = symptoms.summarize(batch, scores)
+        body = {"count": len(batch), "window": window, "summary": summary}
+        if columnar:
+            body["columns"] = symptoms.columns_payload(scores)
+        else:
+            body["results"] = symptoms.rows_payload(scores)
+        return Response(body)
+
+# Prometheus scrape target for the request histograms in metrics.py, plus the
+# inference batcher's and the event buffer's counters and backlogs at scrape
+# time
+def inference_metrics():
+    stats = batcher.stats()
+    return [
+        *metrics.sample("envapp_inference_batches_total", "Micro-batches evaluated.", "counter", stats["batches"]),
+        *metrics.sample("envapp_inference_batched_requests_total", "Predictions merged into batches.", "counter",
+                        stats["requests"]),
+        *metrics.sample("envapp_inference_batched_rows_total", "Rows scored in batches.", "counter", stats["rows"]),
+        *metrics.sample("envapp_inference_batch_wait_seconds_total", "Time predictions waited for their batch.",
+                        "counter", stats["wait_seconds"]),
+        *metrics.sample("envapp_inference_queue_depth", "Predictions waiting for a batch.", "gauge",
+                        stats["queue_depth"]),
+        *metrics.sample("envapp_inference_max_batch_rows", "Largest batch so far.", "gauge", stats["max_batch_rows"]),
+    ]
+
+metrics.register_collector(inference_metrics)
+
+def event_metrics():
+    stats = event_buffer.stats()
+    return [
+        *metrics.sample("envapp_events_received_total", "Card events accepted into the buffer.", "counter",
+                        stats["received"]),
+        *metrics.sample("envapp_events_written_total", "Card events written to the database.", "counter",
+                        stats["written"]),
+        *metrics.sample("envapp_events_rejected_total", "Card events refused because the buffer was full.",
+                        "counter", stats["rejected"]),
+        *metrics.sample("envapp_events_dropped_total", "Card events dropped because the database refused them.",
+                        "counter", stats["dropped"]),
+        *metrics.sample("envapp_event_flush_failures_total", "Batched event writes that failed and will be retried.",
+                        "counter", stats["failures"]),
+        *metrics.sample("envapp_event_flush_seconds_total", "Time spent writing event batches.", "counter",
+                        stats["flush_seconds"]),
+        *metrics.sample("envapp_events_pending", "Card events waiting to be written.", "gauge", stats["pending"]),
+    ]
+
+metrics.register_collector(event_metrics)
+
+class MetricsView(View):
+    def get(self, request):
+        token = settings.METRICS_TOKEN
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            return HttpResponse(status=403)
+        return HttpResponse(metrics.render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
 # Hello API (unchanged)
 class HelloAPI(APIView):
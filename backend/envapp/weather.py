@@ -0,0 +1,191 @@
+"""Caching proxy for the OpenWeatherMap endpoints the frontend uses.
+
+Upstream calls go through one pooled requests.Session with the server's API
+key. Responses are cached in the 'weather' cache alias, keyed on coordinates
+rounded to COORDINATE_PRECISION decimals and on normalised place names, so
+nearby points and differently typed names share an entry.
+
+Each entry is fresh for the endpoint's ``fresh`` seconds and then kept for
+``stale`` seconds more. A stale entry is served at once while one background
+refresh replaces it; if upstream is down, the stale copy keeps being served.
+Concurrent misses for the same key in a process share one upstream call.
+"""
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import requests
+from django.conf import settings
+from django.core.cache import caches
+from requests.adapters import HTTPAdapter
+
+from .metrics import phase, record_cache
+
+WEATHER_CACHE = "weather"
+COORDINATE_PRECISION = 2  # about 1 km, finer than OpenWeatherMap's own grid
+UPSTREAM_TIMEOUT = (3.05, 10)  # connect, read
+POOL_SIZE = 16
+REFRESH_WORKERS = 4
+REFRESH_BACKOFF = 60  # seconds between refresh attempts while upstream fails
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# Place names and coordinates do not move, weather does; air pollution is
+# updated hourly upstream
+ENDPOINTS = {
+    "geocode": {"path": "/geo/1.0/direct", "fresh": 7 * DAY, "stale": 30 * DAY},
+    "reverse": {"path": "/geo/1.0/reverse", "fresh": 7 * DAY, "stale": 30 * DAY},
+    "weather": {"path": "/data/2.5/weather", "fresh": 10 * 60, "stale": 3 * HOUR},
+    "air_pollution": {"path": "/data/2.5/air_pollution", "fresh": 30 * 60, "stale": 6 * HOUR},
+}
+
+
+class UpstreamError(Exception):
+    pass
+
+
+class SingleFlight:
+    """Run one call per key at a time; callers arriving meanwhile share its outcome."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event(), "result": None, "error": None}
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+
+_flight = SingleFlight()
+_refresher = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix="weather-refresh")
+_refreshing = {}  # cache key -> Future of its queued refresh
+_refreshing_lock = threading.Lock()
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+
+def round_coordinate(value, limit):
+    value = float(value)
+    if not -limit <= value <= limit:
+        raise ValueError(f"Coordinate {value} is out of range")
+    return round(value, COORDINATE_PRECISION) + 0.0  # + 0.0 folds -0.0 into 0.0
+
+
+def normalize_place(name):
+    # "  Melbourne ,  AU" and "melbourne,au" are the same lookup
+    parts = (" ".join(part.split()) for part in name.casefold().split(","))
+    return ",".join(part for part in parts if part)
+
+
+def cache_key(name, params):
+    digest = hashlib.sha256(urlencode(sorted(params.items())).encode()).hexdigest()
+    return f"envapp:weather:{name}:{digest}"
+
+
+def request_upstream(path, params):
+    url = settings.OPENWEATHER_BASE_URL.rstrip("/") + path
+    try:
+        response = get_session().get(
+            url, params={**params, "appid": settings.OPENWEATHER_API_KEY}, timeout=UPSTREAM_TIMEOUT,
+        )
+        response.raise_for_status()
+        return response.json()
+    except requests.HTTPError as e:
+        # The request URL carries the API key, so keep it out of the message
+        raise UpstreamError(f"{path} returned {e.response.status_code}") from None
+    except (requests.RequestException, ValueError) as e:
+        raise UpstreamError(f"{path} failed: {type(e).__name__}") from None
+
+
+def _load(name, key, params):
+    endpoint = ENDPOINTS[name]
+    data = request_upstream(endpoint["path"], params)
+    caches[WEATHER_CACHE].set(key, {"data": data, "fetched": time.time()}, endpoint["fresh"] + endpoint["stale"])
+    return data
+
+
+def _refresh(name, key, params, entry):
+    try:
+        _flight.do(key, lambda: _load(name, key, params))
+    except UpstreamError as e:
+        print(f"Weather refresh failed, serving stale data: {e}")
+        endpoint = ENDPOINTS[name]
+        remaining = entry["fetched"] + endpoint["fresh"] + endpoint["stale"] - time.time()
+        if remaining > 0:
+            caches[WEATHER_CACHE].set(key, {**entry, "retry_at": time.time() + REFRESH_BACKOFF}, remaining)
+
+
+def fetch(name, params):
+    """Return ``(data, state, max_age)`` for an endpoint in ENDPOINTS.
+
+    ``state`` is "hit", "stale" or "miss"; ``max_age`` is how many more
+    seconds the data counts as fresh. Raises UpstreamError when there is
+    nothing cached and upstream fails.
+    """
+    endpoint = ENDPOINTS[name]
+    key = cache_key(name, params)
+    entry = caches[WEATHER_CACHE].get(key)
+    now = time.time()
+    if entry is not None:
+        age = now - entry["fetched"]
+        if age < endpoint["fresh"]:
+            record_cache(WEATHER_CACHE, "hit")
+            return entry["data"], "hit", int(endpoint["fresh"] - age)
+        if entry.get("retry_at", 0) <= now:
+            refresh_in_background(name, key, params, entry)
+        record_cache(WEATHER_CACHE, "stale")
+        return entry["data"], "stale", 0
+    record_cache(WEATHER_CACHE, "miss")
+    with phase("upstream"):
+        data = _flight.do(key, lambda: _load(name, key, params))
+    return data, "miss", endpoint["fresh"]
+
+
+def refresh_in_background(name, key, params, entry):
+    """Queue a refresh of ``key`` and return its future (the pending one if already queued)."""
+
+    def run():
+        try:
+            _refresh(name, key, params, entry)
+        finally:
+            with _refreshing_lock:
+                del _refreshing[key]
+
+    with _refreshing_lock:
+        # Submitting under the lock means run() cannot remove the key before it is added
+        if key not in _refreshing:
+            _refreshing[key] = _refresher.submit(run)
+        return _refreshing[key]
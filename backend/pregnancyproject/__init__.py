@@ -1,2 +1,10 @@
-import pymysql
-pymysql.install_as_MySQLdb()
+import os
+
+# Only the MySQL setup needs PyMySQL; the same DB_ENGINE check as settings.py
+if os.getenv("DB_ENGINE", "sqlite").lower() == "mysql":
+    import pymysql
+
+    # Django's MySQL backend checks the mysqlclient version it expects; PyMySQL
+    # implements the same interface
+    pymysql.version_info = (2, 2, 1, "final", 0)
+    pymysql.install_as_MySQLdb()
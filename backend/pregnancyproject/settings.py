@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.envapp.middleware.ServerTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -79,16 +80,147 @@ TEMPLATES = [
 WSGI_APPLICATION = 'backend.pregnancyproject.wsgi.application'
 
 
-# Databasepip 
+# Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# DB_ENGINE picks SQLite (the default) or MySQL through PyMySQL. Connections
+# are kept open for DB_CONN_MAX_AGE seconds instead of reconnecting on every
+# request, and checked before reuse. With DB_REPLICA_HOST set, reads go to
+# the replica and writes to the primary (see backend/envapp/db.py).
+
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite').lower()
+
+if DB_ENGINE == 'mysql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.mysql',
+            'NAME': os.getenv('DB_NAME', 'maternalshield'),
+            'USER': os.getenv('DB_USER', ''),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', '127.0.0.1'),
+            'PORT': os.getenv('DB_PORT', '3306'),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '300')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'charset': 'utf8mb4',
+                'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '5')),
+                'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+            },
+        }
+    }
+    if os.getenv('DB_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.getenv('DB_REPLICA_HOST'),
+            'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+            'USER': os.getenv('DB_REPLICA_USER', DATABASES['default']['USER']),
+            'PASSWORD': os.getenv('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+            'TEST': {'MIRROR': 'default'},
+        }
+        DATABASE_ROUTERS = ['backend.envapp.db.PrimaryReplicaRouter']
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Seconds a writer waits for the lock before "database is locked"
+                'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', '20')),
+                # Take the write lock when the transaction starts, so two
+                # read-then-write transactions cannot deadlock on the upgrade
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+
+# Applied to every new SQLite connection by backend/envapp/db.py. WAL lets
+# readers run alongside the writer; synchronous=NORMAL is durable across
+# crashes of the process (not of the OS) and skips most fsyncs in WAL mode.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+    'cache_size': -int(os.getenv('SQLITE_CACHE_SIZE_KB', str(64 * 1024))),  # negative means KiB
+    'temp_store': 'MEMORY',
+}
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# 'info_cards' holds personalised /api/info-cards/ responses. Entries expire
+# after INFO_CARD_CACHE_TIMEOUT seconds. Past INFO_CARD_CACHE_MAX_ENTRIES the
+# local-memory backend culls the least recently used entries, while the file
+# and database backends cull arbitrary ones, so eviction order depends on the
+# backend. Point INFO_CARD_CACHE_BACKEND at
+# django.core.cache.backends.redis.RedisCache (and LOCATION at redis://...) to
+# share it between workers.
 
-DATABASES = {
+INFO_CARD_CACHE_BACKEND = os.getenv('INFO_CARD_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'info_cards': {
+        'BACKEND': INFO_CARD_CACHE_BACKEND,
+        'LOCATION': os.getenv('INFO_CARD_CACHE_LOCATION', 'info-cards'),
+        'TIMEOUT': int(os.getenv('INFO_CARD_CACHE_TIMEOUT', '300')),
+    },
+    # OpenWeatherMap responses proxied by envapp/weather.py, which sets
+    # per-endpoint timeouts itself
+    'weather': {
+        'BACKEND': os.getenv('WEATHER_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('WEATHER_CACHE_LOCATION', 'weather'),
+    },
 }
 
+if 'redis' not in INFO_CARD_CACHE_BACKEND:
+    CACHES['info_cards']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('INFO_CARD_CACHE_MAX_ENTRIES', '5000')),
+        'CULL_FREQUENCY': 10,
+    }
+if 'redis' not in CACHES['weather']['BACKEND']:
+    CACHES['weather']['OPTIONS'] = {'MAX_ENTRIES': 20000, 'CULL_FREQUENCY': 10}
+
+# Threads that run relevance scoring for the async views, and how many calls
+# may queue for them before requests are turned away with a 503
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', '2'))
+INFERENCE_MAX_PENDING = int(os.getenv('INFERENCE_MAX_PENDING', '1024'))
+# Micro-batching of live relevance predictions: a batch goes out once it has
+# this many rows or its oldest request has waited this long
+INFERENCE_BATCH_MAX_ROWS = int(os.getenv('INFERENCE_BATCH_MAX_ROWS', '256'))
+INFERENCE_BATCH_MAX_WAIT_MS = float(os.getenv('INFERENCE_BATCH_MAX_WAIT_MS', '2'))
+
+# InfoCard impression/click events (POST /api/events/) are buffered in each
+# process and written in batches of EVENT_FLUSH_BATCH, or after
+# EVENT_FLUSH_INTERVAL_MS. With EVENT_BUFFER_MAX_EVENTS waiting, a request
+# waits up to EVENT_BUFFER_BLOCK_MS for room and is then refused with a 503.
+EVENT_BUFFER_MAX_EVENTS = int(os.getenv('EVENT_BUFFER_MAX_EVENTS', '20000'))
+EVENT_FLUSH_BATCH = int(os.getenv('EVENT_FLUSH_BATCH', '1000'))
+EVENT_FLUSH_INTERVAL_MS = float(os.getenv('EVENT_FLUSH_INTERVAL_MS', '1000'))
+EVENT_BUFFER_BLOCK_MS = float(os.getenv('EVENT_BUFFER_BLOCK_MS', '100'))
+EVENT_MAX_PER_REQUEST = int(os.getenv('EVENT_MAX_PER_REQUEST', '200'))
+
+# How often each process looks for a new related-cards snapshot and for
+# InfoCards saved since it (see related.py)
+RELATED_INDEX_POLL_SECONDS = float(os.getenv('RELATED_INDEX_POLL_SECONDS', '5'))
+
+# Batch symptom risk scoring (POST /api/symptoms/score/): the most logs and
+# the largest body one request may send
+SYMPTOM_SCORE_MAX_LOGS = int(os.getenv('SYMPTOM_SCORE_MAX_LOGS', '200000'))
+SYMPTOM_SCORE_MAX_BYTES = int(os.getenv('SYMPTOM_SCORE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+# Per-request phase timings (Server-Timing header) and the /api/metrics/
+# Prometheus endpoint. With METRICS_TOKEN set, scrapes must send it as a
+# bearer token.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', 'true').lower() in ('1', 'true', 'yes')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# OpenWeatherMap, proxied under /api/weather/ so the key stays server-side
+OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY', '')
+OPENWEATHER_BASE_URL = os.getenv('OPENWEATHER_BASE_URL', 'https://api.openweathermap.org')
 
 
 # Password validation
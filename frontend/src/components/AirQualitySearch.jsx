@@ -2,21 +2,19 @@ import React, { useState } from "react";
 import axios from "axios";
 import "../styles/AirPollutionImpact.css";
 
-const API_KEY = "7b7861c260a1275a0e35bedcd3c8ebd9";
-
 export default function AirQualitySearch({ setLocation, setPm }) {
   const [input, setInput] = useState("");
 
   const fetchAQIByCity = async (city) => {
     try {
       const geoRes = await axios.get(
-        `https://api.openweathermap.org/geo/1.0/direct?q=${city}&limit=1&appid=${API_KEY}`
+        `https://iteration3.maternalshield.me/api/weather/geocode/?q=${city}&limit=1`
       );
       const { lat, lon, name, state, country } = geoRes.data[0];
       setLocation(`${name}, ${state || country}`);
 
       const aqiRes = await axios.get(
-        `https://api.openweathermap.org/data/2.5/air_pollution?lat=${lat}&lon=${lon}&appid=${API_KEY}`
+        `https://iteration3.maternalshield.me/api/weather/air-pollution/?lat=${lat}&lon=${lon}`
       );
       const pm25 = aqiRes.data.list[0].components.pm2_5;
       setPm(Math.round(pm25));
@@ -38,7 +36,7 @@ export default function AirQualitySearch({ setLocation, setPm }) {
       setLocation(name);
 
       const aqiRes = await axios.get(
-        `https://api.openweathermap.org/data/2.5/air_pollution?lat=${lat}&lon=${lon}&appid=${API_KEY}`
+        `https://iteration3.maternalshield.me/api/weather/air-pollution/?lat=${lat}&lon=${lon}`
       );
       const pm25 = aqiRes.data.list[0].components.pm2_5;
       setPm(Math.round(pm25));
@@ -5,7 +5,17 @@ import {
   AreaChart
 } from 'recharts';
 import { X } from 'lucide-react';
-import Papa from 'papaparse';
+
+const INDICATOR_API = 'https://iteration3.maternalshield.me/api/indicators';
+
+// Rebuild the { Year, State/Territory, Percent } rows the charts use from a
+// { years, series: { state: [percent per year] } } response
+const seriesToRows = ({ years, series }) =>
+  Object.entries(series).flatMap(([state, values]) =>
+    years
+      .map((year, i) => ({ Year: year, "State/Territory": state, Percent: values[i] }))
+      .filter(row => row.Percent !== null)
+  );
 
 const PregnancyHealthDataChart = ({ isOpen, onClose }) => {
   const [diabetesData, setDiabetesData] = useState([]);
@@ -19,21 +29,13 @@ const PregnancyHealthDataChart = ({ isOpen, onClose }) => {
   useEffect(() => {
     const loadData = async () => {
       try {
-        // Load diabetes data
-        const diabetesResponse = await fetch('/gestational_diabetes_corrected.csv').then(response => response.text());
-        const parsedDiabetes = Papa.parse(diabetesResponse, {
-          header: true,
-          dynamicTyping: true,
-          skipEmptyLines: true
-        });
-        
-        // Load hypertension data
-        const hypertensionResponse = await fetch('/gestational_hypertension_processed.csv').then(response => response.text());
-        const parsedHypertension = Papa.parse(hypertensionResponse, {
-          header: true,
-          dynamicTyping: true,
-          skipEmptyLines: true
-        });
+        // Load both indicators from the backend's compact series
+        const [diabetesSeries, hypertensionSeries] = await Promise.all([
+          fetch(`${INDICATOR_API}/gestational_diabetes/`).then(response => response.json()),
+          fetch(`${INDICATOR_API}/gestational_hypertension/`).then(response => response.json())
+        ]);
+        const parsedDiabetes = { data: seriesToRows(diabetesSeries) };
+        const parsedHypertension = { data: seriesToRows(hypertensionSeries) };
 
         setDiabetesData(parsedDiabetes.data);
         setHypertensionData(parsedHypertension.data);
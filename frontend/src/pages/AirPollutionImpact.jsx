@@ -3,9 +3,6 @@ import { ChevronDown, ChevronRight, AlertTriangle, Info, MapPin, X, ThermometerS
 import "../styles/AirPollutionImpact.css";
 
 export default function AirPollutionImpact() {
-  // Get API key from environment variables
-  const API_KEY = process.env.REACT_APP_AIR_API_KEY;
-
   // State for PM2.5 and location
   const [pmValue, setPmValue] = useState(15);
   const [currentLocation, setCurrentLocation] = useState("Melbourne, VIC");
@@ -218,7 +215,7 @@ export default function AirPollutionImpact() {
     try {
       // First, geocode the location to get coordinates
       const geocodeResponse = await fetch(
-        `https://api.openweathermap.org/geo/1.0/direct?q=${currentLocation},AU&limit=1&appid=${API_KEY}`
+        `https://iteration3.maternalshield.me/api/weather/geocode/?q=${currentLocation},AU&limit=1`
       );
       const geocodeData = await geocodeResponse.json();
 
@@ -233,7 +230,7 @@ export default function AirPollutionImpact() {
 
       // Get current air pollution data
       const pollutionResponse = await fetch(
-        `https://api.openweathermap.org/data/2.5/air_pollution?lat=${lat}&lon=${lon}&appid=${API_KEY}`
+        `https://iteration3.maternalshield.me/api/weather/air-pollution/?lat=${lat}&lon=${lon}`
       );
       const pollutionData = await pollutionResponse.json();
 
@@ -481,7 +478,7 @@ export default function AirPollutionImpact() {
           try {
             // Reverse geocode to get location name
             const response = await fetch(
-              `https://api.openweathermap.org/geo/1.0/reverse?lat=${lat}&lon=${lon}&limit=1&appid=${API_KEY}`
+              `https://iteration3.maternalshield.me/api/weather/reverse/?lat=${lat}&lon=${lon}&limit=1`
             );
             const data = await response.json();
             
@@ -529,48 +526,16 @@ export default function AirPollutionImpact() {
     setShowSuggestions(false);
   };
 
-  // Fetch location suggestions from API
+  // Fetch location suggestions from the backend's locality index
   const fetchLocationSuggestions = async (input) => {
     try {
       const response = await fetch(
-        `https://api.openweathermap.org/geo/1.0/direct?q=${input},Australia&limit=10&appid=${API_KEY}`
+        `https://iteration3.maternalshield.me/api/localities/?q=${encodeURIComponent(input)}&limit=10`
       );
       const data = await response.json();
-      
-      // Filter to only Australian locations
-      const ausLocations = data.filter(loc => 
-        loc.country === "AU" || loc.country === "Australia"
-      );
 
-      const uniqueLocations = [];
-      const seenLocations = new Set();
-      
-      // Create better suburb display format
-      ausLocations.forEach(loc => {
-        // Get name and state
-        const name = loc.name;
-        const state = loc.state || "";
-        
-        // Create display format
-        let display = name;
-        if (state) {
-          display = `${name}, ${state}`;
-        }
-        
-        // Add to uniqueLocations only if we haven't seen this display name before
-        if (!seenLocations.has(display)) {
-          seenLocations.add(display);
-          uniqueLocations.push({
-            name: name,
-            state: state,
-            display: display,
-            lat: loc.lat,
-            lon: loc.lon
-          });
-        }
-      });
-      
-      setSuggestions(uniqueLocations);
+      // Suggestions already carry name, state, display, lat and lon
+      setSuggestions(data);
     } catch (error) {
       console.error("Error fetching location suggestions:", error);
     }
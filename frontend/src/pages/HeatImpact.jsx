@@ -4,9 +4,6 @@ import "../styles/HeatImpact.css";
 import PregnancyHealthDataChart from "../components/PregnancyHealthDataChart";
 
 const HeatImpact = () => {
-  // Get API key from environment variables
-  const API_KEY = process.env.REACT_APP_HEAT_API_KEY;
-
   // State for temperature and location
   const [temperature, setTemperature] = useState(25); // Starting at 25°C
   const [currentLocation, setCurrentLocation] = useState("Melbourne, VIC");
@@ -228,7 +225,7 @@ const HeatImpact = () => {
     try {
       // First, geocode the location to get coordinates
       const geocodeResponse = await fetch(
-        `https://api.openweathermap.org/geo/1.0/direct?q=${currentLocation},AU&limit=1&appid=${API_KEY}`
+        `https://iteration3.maternalshield.me/api/weather/geocode/?q=${currentLocation},AU&limit=1`
       );
       const geocodeData = await geocodeResponse.json();
 
@@ -243,7 +240,7 @@ const HeatImpact = () => {
 
       // Get current weather data
       const weatherResponse = await fetch(
-        `https://api.openweathermap.org/data/2.5/weather?lat=${lat}&lon=${lon}&units=metric&appid=${API_KEY}`
+        `https://iteration3.maternalshield.me/api/weather/current/?lat=${lat}&lon=${lon}&units=metric`
       );
       const weatherData = await weatherResponse.json();
 
@@ -387,7 +384,7 @@ const HeatImpact = () => {
           try {
             // Reverse geocode to get location name
             const response = await fetch(
-              `https://api.openweathermap.org/geo/1.0/reverse?lat=${lat}&lon=${lon}&limit=1&appid=${API_KEY}`
+              `https://iteration3.maternalshield.me/api/weather/reverse/?lat=${lat}&lon=${lon}&limit=1`
             );
             const data = await response.json();
             
@@ -436,48 +433,16 @@ const HeatImpact = () => {
     setShowSuggestions(false);
   };
 
-  // Fetch location suggestions from API
+  // Fetch location suggestions from the backend's locality index
   const fetchLocationSuggestions = async (input) => {
     try {
       const response = await fetch(
-        `https://api.openweathermap.org/geo/1.0/direct?q=${input},Australia&limit=10&appid=${API_KEY}`
+        `https://iteration3.maternalshield.me/api/localities/?q=${encodeURIComponent(input)}&limit=10`
       );
       const data = await response.json();
-      
-      // Filter to only Australian locations
-      const ausLocations = data.filter(loc => 
-        loc.country === "AU" || loc.country === "Australia"
-      );
 
-      const uniqueLocations = [];
-      const seenLocations = new Set();
-      
-      // Create better suburb display format
-      ausLocations.forEach(loc => {
-        // Get name and state
-        const name = loc.name;
-        const state = loc.state || "";
-        
-        // Create display format
-        let display = name;
-        if (state) {
-          display = `${name}, ${state}`;
-        }
-        
-        // Add to uniqueLocations only if we haven't seen this display name before
-        if (!seenLocations.has(display)) {
-          seenLocations.add(display);
-          uniqueLocations.push({
-            name: name,
-            state: state,
-            display: display,
-            lat: loc.lat,
-            lon: loc.lon
-          });
-        }
-      });
-      
-      setSuggestions(uniqueLocations);
+      // Suggestions already carry name, state, display, lat and lon
+      setSuggestions(data);
     } catch (error) {
       console.error("Error fetching location suggestions:", error);
     }
@@ -244,10 +244,6 @@ const SymptomSummary = ({ symptoms, onEdit, onSave, onReset }) => {
 };
 
 const SymptomTracker = () => {
-  // Get API keys from environment variables
-  const WEATHER_API_KEY = process.env.REACT_APP_HEAT_API_KEY;
-  const AIR_API_KEY = process.env.REACT_APP_AIR_API_KEY;
-  
   // State for flow control
   const [currentStep, setCurrentStep] = useState('location');
   const [activeView, setActiveView] = useState('logger');
@@ -372,7 +368,7 @@ const SymptomTracker = () => {
     try {
       // First, geocode the location to get coordinates
       const geocodeResponse = await fetch(
-        `https://api.openweathermap.org/geo/1.0/direct?q=${location},AU&limit=1&appid=${WEATHER_API_KEY}`
+        `https://iteration3.maternalshield.me/api/weather/geocode/?q=${location},AU&limit=1`
       );
       const geocodeData = await geocodeResponse.json();
 
@@ -387,13 +383,13 @@ const SymptomTracker = () => {
 
       // Get current weather data
       const weatherResponse = await fetch(
-        `https://api.openweathermap.org/data/2.5/weather?lat=${lat}&lon=${lon}&units=metric&appid=${WEATHER_API_KEY}`
+        `https://iteration3.maternalshield.me/api/weather/current/?lat=${lat}&lon=${lon}&units=metric`
       );
       const weatherData = await weatherResponse.json();
       
       // Get air quality data
       const airQualityResponse = await fetch(
-        `https://api.openweathermap.org/data/2.5/air_pollution?lat=${lat}&lon=${lon}&appid=${AIR_API_KEY}`
+        `https://iteration3.maternalshield.me/api/weather/air-pollution/?lat=${lat}&lon=${lon}`
       );
       const airQualityData = await airQualityResponse.json();
 
@@ -428,7 +424,7 @@ const SymptomTracker = () => {
           try {
             // Reverse geocode to get location name
             const response = await fetch(
-              `https://api.openweathermap.org/geo/1.0/reverse?lat=${lat}&lon=${lon}&limit=1&appid=${WEATHER_API_KEY}`
+              `https://iteration3.maternalshield.me/api/weather/reverse/?lat=${lat}&lon=${lon}&limit=1`
             );
             const data = await response.json();
             
@@ -489,48 +485,16 @@ const SymptomTracker = () => {
     setShowSuggestions(false);
   };
 
-  // Fetch location suggestions from API
+  // Fetch location suggestions from the backend's locality index
   const fetchLocationSuggestions = async (input) => {
     try {
       const response = await fetch(
-        `https://api.openweathermap.org/geo/1.0/direct?q=${input},Australia&limit=10&appid=${WEATHER_API_KEY}`
+        `https://iteration3.maternalshield.me/api/localities/?q=${encodeURIComponent(input)}&limit=10`
       );
       const data = await response.json();
-      
-      // Filter to only Australian locations
-      const ausLocations = data.filter(loc => 
-        loc.country === "AU" || loc.country === "Australia"
-      );
 
-      const uniqueLocations = [];
-      const seenLocations = new Set();
-      
-      // Create better suburb display format
-      ausLocations.forEach(loc => {
-        // Get name and state
-        const name = loc.name;
-        const state = loc.state || "";
-        
-        // Create display format
-        let display = name;
-        if (state) {
-          display = `${name}, ${state}`;
-        }
-        
-        // Add to uniqueLocations only if we haven't seen this display name before
-        if (!seenLocations.has(display)) {
-          seenLocations.add(display);
-          uniqueLocations.push({
-            name: name,
-            state: state,
-            display: display,
-            lat: loc.lat,
-            lon: loc.lon
-          });
-        }
-      });
-      
-      setSuggestions(uniqueLocations);
+      // Suggestions already carry name, state, display, lat and lon
+      setSuggestions(data);
     } catch (error) {
       console.error("Error fetching location suggestions:", error);
     }